@@ -0,0 +1,197 @@
+# -*- coding: utf-8 -*-
+"""
+Banc d'essai de bout en bout de l'application sur bracelet simulé
+
+Pour chaque vitesse de simulation (1, 10 et 100 fois le temps réel par
+défaut), la fenêtre principale tourne avec sa vraie boucle Qt pendant
+duration secondes : hub, MyListener, ingestion (read_imu_paquet,
+gestion_data), tracés (maj_plot), enregistrement HDF5 optionnel puis export
+CSV. Sont mesurés :
+
+    a) les échantillons produits et ingérés par seconde, les pertes
+    b) la durée de chaque appel à timerEvent (percentiles), avec et sans
+       le temps passé dans hub.run
+    c) la mémoire résidente (psutil) et sa croissance en Mo par minute
+    d) la durée de l'export CSV et la taille de l'enregistrement
+
+Les résultats sont enregistrés au format JSON pour comparer les versions ::
+
+    python benchmark_myo_arm_band.py --duration 20 --record
+"""
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import tempfile
+import time
+from time import perf_counter
+import numpy as np
+import psutil
+from pyqtgraph.Qt import QtCore
+import main_myo_arm_band as app_myo
+
+SPEEDS = (1.0, 10.0, 100.0)
+
+
+class BenchWindow(app_myo.MainWindow):
+    """
+    fenêtre principale instrumentée sur bracelet simulé
+    """
+    def __init__(self, speed=1.0, record=False, history_minutes=None):
+        super(BenchWindow, self).__init__(record=record, simulate=True,
+                                          speed=speed,
+                                          history_minutes=history_minutes)
+        self.tick_durations = []  # durée de chaque appel à timerEvent (s)
+        self.hub_durations = []  # dont le temps passé dans hub.run (s)
+        hub_run = self.hub.run
+
+        def run(handler, duration_ms):
+            debut = perf_counter()
+            hub_run(handler, duration_ms)
+            self.hub_durations.append(perf_counter() - debut)
+        self.hub.run = run
+
+    def timerEvent(self, event):
+        debut = perf_counter()
+        super(BenchWindow, self).timerEvent(event)
+        self.tick_durations.append(perf_counter() - debut)
+
+
+def _percentiles(durees):
+    durees = np.asarray(durees) * 1e3
+    if not len(durees):
+        return None
+    return {'p50': float(np.percentile(durees, 50)),
+            'p95': float(np.percentile(durees, 95)),
+            'p99': float(np.percentile(durees, 99)),
+            'max': float(durees.max())}
+
+
+def _git_version():
+    try:
+        return subprocess.check_output(
+            ['git', 'describe', '--always', '--dirty'],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_case(speed, duration, record=False, history_minutes=None):
+    """
+    une exécution de la fenêtre principale à speed fois le temps réel
+    """
+    processus = psutil.Process()
+    repertoire = os.getcwd()
+    with tempfile.TemporaryDirectory() as dossier:
+        os.chdir(dossier)  # enregistrements dans un dossier temporaire
+        try:
+            memoire_debut = processus.memory_info().rss
+            fenetre = BenchWindow(speed=speed, record=record,
+                                  history_minutes=history_minutes)
+            memoire = []
+
+            def mesure_memoire():
+                memoire.append((perf_counter(), processus.memory_info().rss))
+            horloge = QtCore.QTimer()
+            horloge.timeout.connect(mesure_memoire)
+            horloge.start(500)
+            QtCore.QTimer.singleShot(int(duration * 1000), app_myo.APP.quit)
+            debut = perf_counter()
+            app_myo.APP.exec_()
+            ecoule = perf_counter() - debut
+            horloge.stop()
+            fenetre.stop_acquisition()
+            debut_export = perf_counter()
+            fenetre.export_csv(os.path.join(dossier, 'export.csv'))
+            duree_export = perf_counter() - debut_export
+            taille = sum(os.path.getsize(os.path.join(racine, nom))
+                         for racine, _, noms in os.walk(dossier)
+                         for nom in noms)
+            fenetre.hide()
+            fenetre.deleteLater()
+        finally:
+            os.chdir(repertoire)
+    stats = fenetre.listener.get_stream_stats()
+    # lignes encore en mémoire et lignes retirées de l'historique
+    ingeres = {flux: len(getattr(fenetre, f'data_{flux}'))
+               + fenetre.history.trimmed.get(flux, 0)
+               for flux in ('emg', 'ori')}
+    nb_tick = min(len(fenetre.tick_durations), len(fenetre.hub_durations))
+    traitement = (np.array(fenetre.tick_durations[:nb_tick])
+                  - np.array(fenetre.hub_durations[:nb_tick]))
+    if len(memoire) > 1:
+        instants, rss = np.array(memoire).T
+        croissance = np.polyfit(instants, rss, 1)[0] * 60 / 2 ** 20
+    else:
+        croissance = None
+    return {'speed': speed,
+            'duration_s': ecoule,
+            'record': record,
+            'history_minutes': history_minutes,
+            'ticks': len(fenetre.tick_durations),
+            'ticks_per_s': len(fenetre.tick_durations) / ecoule,
+            'emg_produced_per_s': fenetre.hub.nb_emg / ecoule,
+            'emg_ingested_per_s': ingeres['emg'] / ecoule,
+            'imu_ingested_per_s': ingeres['ori'] / ecoule,
+            # trous de timestamps et échantillons écrasés avant lecture
+            'emg_lost': stats['emg']['dropped'],
+            'emg_overflow': stats['emg']['overflow'],
+            'emg_overflow_percent': (100.0 * stats['emg']['overflow']
+                                     / max(1, fenetre.hub.nb_emg)),
+            'tick_ms': _percentiles(fenetre.tick_durations),
+            'processing_ms': _percentiles(traitement),
+            'rss_start_mb': memoire_debut / 2 ** 20,
+            'rss_end_mb': (memoire[-1][1] if memoire
+                           else memoire_debut) / 2 ** 20,
+            'rss_growth_mb_per_min': croissance,
+            'export_s': duree_export,
+            'files_mb': taille / 2 ** 20}
+
+
+def main(speeds=SPEEDS, duration=10.0, record=False, output=None,
+         history_minutes=None):
+    """
+    exécution de toutes les vitesses et enregistrement JSON
+    """
+    resultats = {'date': time.strftime('%Y-%m-%d %H:%M:%S'),
+                 'version': app_myo.__version__,
+                 'git': _git_version(),
+                 'python': platform.python_version(),
+                 'platform': platform.platform(),
+                 'cpu_count': os.cpu_count(),
+                 'cases': [run_case(speed, duration, record,
+                                    history_minutes)
+                           for speed in speeds]}
+    if output is None:
+        output = time.strftime('benchmark_%Y%m%d_%H%M%S.json')
+    with open(output, 'w') as fichier:
+        json.dump(resultats, fichier, indent=2)
+    return resultats, output
+
+
+if __name__ == '__main__':
+    PARSER = argparse.ArgumentParser(
+        description="banc d'essai de bout en bout sur bracelet simulé")
+    PARSER.add_argument('--speeds', type=float, nargs='+', default=SPEEDS)
+    PARSER.add_argument('--duration', type=float, default=10.0,
+                        help='durée de chaque exécution (s)')
+    PARSER.add_argument('--record', action='store_true',
+                        help='enregistrement HDF5 pendant les mesures')
+    PARSER.add_argument('--output', default=None,
+                        help='fichier JSON des résultats')
+    PARSER.add_argument('--history-minutes', type=float, default=None,
+                        help="historique de l'interface borné (min)")
+    ARGS = PARSER.parse_args()
+    RESULTATS, FICHIER = main(ARGS.speeds, ARGS.duration, ARGS.record,
+                              ARGS.output, ARGS.history_minutes)
+    for CAS in RESULTATS['cases']:
+        print(f"x{CAS['speed']:<5g} EMG {CAS['emg_produced_per_s']:7.0f}/s "
+              f"produits {CAS['emg_ingested_per_s']:7.0f}/s ingérés  "
+              f"écrasés {CAS['emg_overflow_percent']:5.1f} %  "
+              f"tick p50 {CAS['tick_ms']['p50']:6.1f} ms "
+              f"p99 {CAS['tick_ms']['p99']:6.1f} ms  "
+              f"mémoire {CAS['rss_growth_mb_per_min'] or 0.0:+.1f} Mo/min")
+    print(f'résultats : {FICHIER}')
@@ -19,19 +19,28 @@ __status__ = "Stable"
 
 
 import os
+import time
+from time import perf_counter
+import numpy as np
 import pandas as pd
 import qdarkstyle
 import pyqtgraph as pg
 from pyqtgraph.Qt import QtCore, QtGui, QtWidgets
 import myo
-from module_myo import my_myo_arm_band
+from module_myo import (acquisition_process, commands, envelope, history,
+                        hud, metrics, multi_listener, net_server,
+                        orientation_view, osc_output, profiling, recorder,
+                        review, shm_publisher, simulation, spectrogram,
+                        stream_stats, web_dashboard)
+from module_myo.emg_heatmap import EmgHeatmap
+from module_myo.emg_plot import StackedEmgCurve
+from module_myo.timeline import MYO_STREAMS
 from ui_src import ui_diagnostics_myo as ihm
 
-# pour rendre l'application en fond noir
+# modes d'affichage des EMG (F7 : mode suivant)
+EMG_VIEWS = ('raw', 'envelope', 'heatmap')
+
 os.environ['PYQTGRAPH_QT_LIB'] = 'PyQt5'
-APP = pg.mkQApp()
-QDARK = qdarkstyle.load_stylesheet_from_environment(is_pyqtgraph=True)
-APP.setStyleSheet(QDARK)
 
 
 class MainWindow(QtGui.QMainWindow, ihm.Ui_MainWindow):
@@ -55,11 +64,164 @@ class MainWindow(QtGui.QMainWindow, ihm.Ui_MainWindow):
         b) gyroscope
         c) accéléromètre
 
+    avec plusieurs bracelets (nb_myo > 1), un onglet supplémentaire affiche
+    les EMG de tous les bracelets ; les trois onglets ci-dessus concernent
+    le premier bracelet appareillé
+
+    record : enregistrement de la session (tous les bracelets) au format HDF5
+
+    segment_minutes, segment_mb : durée (min) et taille (Mo) maximales d'un
+    fichier de l'enregistrement ; la session est alors découpée en segments
+    listés par un manifeste data/session_*.json (cf. recorder), None pour un
+    seul fichier
+
+    process : l'acquisition (un seul bracelet) tourne dans un processus séparé
+    et partage ses données par mémoire partagée
+
+    serve : port TCP de diffusion des flux du premier bracelet sur le poste
+    local (cf. net_server), None pour ne pas les diffuser
+
+    shm : préfixe des tampons en mémoire partagée où sont publiés les flux
+    du premier bracelet (cf. shm_publisher), None pour ne pas les publier
+
+    web : port du tableau de bord WebSocket de tous les bracelets (cf.
+    web_dashboard, paquet websockets requis), None pour ne pas le lancer
+
+    web_host : interface d'écoute du tableau de bord, le poste local seul
+    par défaut ('0.0.0.0' pour le suivre depuis les tablettes du réseau)
+
+    use_gl : vue 3D de l'orientation en OpenGL si un contexte peut être
+    créé, False pour imposer la vue en fil de fer (cf. orientation_view)
+
+    osc : (hôte, port) destinataire des flux de tous les bracelets en OSC
+    (cf. osc_output), None pour ne pas les envoyer
+
+    command_port : port TCP local par lequel des scripts envoient des
+    commandes aux bracelets (cf. commands), None pour ne pas l'ouvrir
+
+    simulate : bracelets simulés (cf. simulation) au lieu du SDK, à speed
+    fois le temps réel
+
+    profile : mesure de la durée de chaque étape de timerEvent dès le
+    lancement (cf. profiling), activable ensuite avec F9
+
+    show_hud : affiche dès le lancement le panneau de performances (fps,
+    durée des rafraîchissements, débits, pertes, remplissage des tampons),
+    affichable ensuite avec F8
+
+    metrics_port : port HTTP local exposant les métriques au format
+    Prometheus (GET /metrics), None sinon
+
+    metrics_file : fichier réécrit toutes les 10 s avec ces mêmes métriques
+    (cf. metrics), None sinon
+
+    history_minutes : durée (min) des données conservées en mémoire par
+    l'interface, None pour tout conserver ; les données plus anciennes sont
+    écrites sur le disque (enregistrement de la session avec record, fichier
+    data/history_*.h5 sinon, cf. history)
+
+    max_memory_mb : plafond (Mo) de la mémoire occupée par ces données, None
+    pour aucun plafond
+
+    emg_view : tracé des EMG, 'raw' pour le signal brut à 200 Hz,
+    'envelope' pour l'enveloppe RMS de chaque voie à 20 Hz (cf. envelope) ou
+    'heatmap' pour la carte d'activité des électrodes autour du bracelet
+    (cf. emg_heatmap), modifiable ensuite avec F7
+
+    review : chemin d'une session enregistrée (fichier HDF5, ou manifeste
+    .json d'une session segmentée) à relire au lieu de l'acquisition :
+    curseur temporel, lecture à vitesse variable, seule la fenêtre affichée
+    est lue sur le disque (cf. review)
     """
 
-    def __init__(self):
+    def __init__(self, nb_myo=1, record=False, process=False, serve=None,
+                 shm=None, web=None, osc=None, command_port=None,
+                 simulate=False, speed=1.0, profile=False, show_hud=False,
+                 metrics_port=None, metrics_file=None, history_minutes=None,
+                 max_memory_mb=None, emg_view='raw', review=None,
+                 segment_minutes=None, segment_mb=None,
+                 web_host='127.0.0.1', use_gl=True):
         super(MainWindow, self).__init__()
+        if review is not None and (process or record or simulate):
+            raise ValueError("la relecture d'une session n'utilise pas de "
+                             "bracelet : ni acquisition, ni enregistrement")
+        if process and (nb_myo > 1 or record or serve is not None
+                        or shm is not None or web is not None
+                        or osc is not None):
+            raise ValueError("l'acquisition dans un processus séparé ne gère "
+                             "qu'un bracelet, sans enregistrement HDF5 ni "
+                             "diffusion des flux")
         # définition de tous les attributs
+        self.nb_myo = nb_myo
+        self.record = record
+        self.segment_minutes = segment_minutes
+        self.segment_mb = segment_mb
+        self.process = process
+        self.serve = serve
+        self.shm = shm
+        self.web = web
+        self.web_host = web_host
+        self.use_gl = use_gl
+        self.osc = osc
+        self.command_port = command_port
+        self.simulate = simulate
+        self.speed = speed
+        self.acquisition = None
+        self.server = None
+        self.publisher = None
+        self.dashboard = None
+        self.osc_sender = None
+        # durée de chaque étape de timerEvent (F9 : activer / désactiver,
+        # F10 : afficher dans la console)
+        self.profiler = profiling.StageProfiler(enabled=profile)
+        self.show_hud = show_hud
+        self.metrics_port = metrics_port
+        self.metrics_file = metrics_file
+        self.metrics = None
+        self.metrics_exporter = None
+        # historique en mémoire borné en durée et en taille
+        self.history = history.HistoryPolicy(history_minutes, max_memory_mb)
+        self.history_recorder = None
+        # enveloppe des EMG, calculée dans le callback du listener ou, avec
+        # le processus d'acquisition, sur les blocs lus par l'interface
+        if emg_view not in EMG_VIEWS:
+            raise ValueError(f'tracé EMG inconnu : {emg_view}')
+        self.emg_view = emg_view
+        self.envelope = envelope.EmgEnvelope()
+        self.envelope_stream = None
+        self.nb_envelope = 200  # valeurs d'enveloppe sur le graph (10 s)
+        self.envelope_data = np.zeros((8, self.nb_envelope))
+        self.envelope_modified = False
+        self.emg_heatmap = None
+        # spectrogramme des EMG (onglet 'Spectre')
+        self.stft = spectrogram.IncrementalStft()
+        self.spectrogram_view = None
+        self.tab_spectre = None
+        # vue 3D de l'orientation (onglet IMU), dernier quaternion reçu
+        self.orientation_view = None
+        self.last_quaternion = None
+        # relecture d'une session enregistrée (premier bracelet)
+        self.review = review
+        self.reader = None
+        self.review_caches = {}
+        self.review_start = None
+        self.review_end = None
+        self.review_position = None
+        self.review_drawn = None  # position du dernier tracé
+        self.review_playing = False
+        self.review_last = None
+        self.review_window = 5.0  # durée affichée (s)
+        self.pb_review_play = None
+        self.sl_review = None
+        self.sb_review_speed = None
+        self.lab_review = None
+        # commandes des bracelets, exécutées avant chaque appel à hub.run
+        self.commands = commands.CommandQueue(nb_device=nb_myo)
+        self.command_server = None
+        self.hub = None
+        self.multi_listener = None
+        self.recorder = None
+        self.emg_stack = None
         self.p_gyro1 = None
         self.p_gyro2 = None
         self.p_gyro3 = None
@@ -84,6 +246,9 @@ class MainWindow(QtGui.QMainWindow, ihm.Ui_MainWindow):
         self.data_ori = None
         self.data = None
         self.data_tot = None
+        self.lab_stream_stats = None
+        self.hud = None
+        self.nb_tick = 0  # nombre d'appels à timerEvent
         # Create the main window
         self.setupUi(self)  # lance le montage des objets graphiques
         self.nb_value = 1000  # nombre de valeurs EMG sur le graph
@@ -94,7 +259,10 @@ class MainWindow(QtGui.QMainWindow, ihm.Ui_MainWindow):
         self.init_connection()  # lance le timer Qt pour visualiser les données
         # change le titre de la fenêtre en fonction du nom du myo arm
         # nom modifiable dans l'application 'Myo Connect'
-        self.setWindowTitle(f'Myo : {self.listener.device_name}')
+        if self.reader is not None:
+            self.setWindowTitle(f'Myo : {os.path.basename(self.review)}')
+        else:
+            self.setWindowTitle(f'Myo : {self.listener.device_name}')
 
     def on_init(self):
         """
@@ -116,41 +284,346 @@ class MainWindow(QtGui.QMainWindow, ihm.Ui_MainWindow):
                         'spread_on': racine + "spread_on.png);"}
         self.init_data()  # méthode de création des DataFrame
         self.init_plot()  # méthode de préparation des tracés
+        # panneau des compteurs de pertes à côté du tracé bluetooth
+        self.lab_stream_stats = QtWidgets.QLabel(self.tab_2)
+        self.lab_stream_stats.setFont(QtGui.QFont('Courier New', 9))
+        self.lab_stream_stats.setObjectName("lab_stream_stats")
+        self.horizontalLayout_6.addWidget(self.lab_stream_stats)
+        # panneau de performances superposé aux onglets (F8)
+        self.hud = hud.PerformanceHud(self, self.tw_myo_arm)
+        if self.show_hud:
+            self.hud.toggle()
+        # vue 3D de l'orientation à la place de gv_cube (fil de fer dans
+        # gv_cube sans OpenGL)
+        self.orientation_view = orientation_view.create_orientation_view(
+            self.horizontalLayout_2, self.gv_cube, use_gl=self.use_gl)
+        self.pb_set_origin.clicked.connect(self.orientation_view.set_origin)
+        # carte d'activité des électrodes, à la place des tracés EMG
+        self.emg_heatmap = EmgHeatmap(self.tab)
+        self.gridLayout.addWidget(self.emg_heatmap, 0, 0, 3, 3)
+        self.emg_heatmap.hide()
+        self.init_spectrogram()
+        if self.nb_myo > 1:
+            self.init_multi_plot()
         # signal/slot pour faire vibrer le myo arm
         self.pb_vib_long.clicked.connect(self.vibration_long)
         self.pb_vib_medium.clicked.connect(self.vibration_medium)
         self.pb_vib_short.clicked.connect(self.vibration_short)
+        # raccourcis du profilage de timerEvent
+        QtWidgets.QShortcut(QtGui.QKeySequence('F9'), self,
+                            self.toggle_profiling)
+        QtWidgets.QShortcut(QtGui.QKeySequence('F10'), self,
+                            self.dump_profiling)
+        QtWidgets.QShortcut(QtGui.QKeySequence('F8'), self, self.hud.toggle)
+        QtWidgets.QShortcut(QtGui.QKeySequence('F7'), self,
+                            self.toggle_emg_view)
+
+    def toggle_emg_view(self):
+        """
+        passage au mode d'affichage des EMG suivant : signal brut,
+        enveloppe, carte d'activité
+        """
+        self.emg_view = EMG_VIEWS[(EMG_VIEWS.index(self.emg_view) + 1)
+                                  % len(EMG_VIEWS)]
+        self.envelope_modified = True
+        self.apply_emg_view()
+
+    def apply_emg_view(self):
+        """
+        tracés ou carte d'activité et échelle des ordonnées selon le mode
+        d'affichage des EMG
+        """
+        carte = self.emg_view == 'heatmap'
+        self.emg_heatmap.setVisible(carte)
+        self.lab_myo_arm_emg.setVisible(not carte)
+        bas = 0 if self.emg_view == 'envelope' else -128
+        for graphe in (self.gv_emg_1, self.gv_emg_2, self.gv_emg_3,
+                       self.gv_emg_4, self.gv_emg_5, self.gv_emg_6,
+                       self.gv_emg_7, self.gv_emg_8):
+            graphe.setVisible(not carte)
+            graphe.setYRange(bas, 128)
+
+    def toggle_profiling(self):
+        """
+        activation / désactivation du profilage de timerEvent
+        """
+        if self.profiler.toggle():
+            self.profiler.reset()
+
+    def dump_profiling(self):
+        """
+        affichage dans la console de la durée des étapes de timerEvent
+        """
+        print(profiling.format_profile(self.profiler.snapshot()))
+
+    def send_command(self, name, *args, target=0):
+        """
+        demande d'une commande au bracelet target, exécutée par le thread
+        d'acquisition (cf. commands)
+        """
+        if self.acquisition is not None:
+            # transmise au processus d'acquisition (un seul bracelet)
+            if target != 0:
+                raise ValueError(f'numéro de bracelet invalide : {target} '
+                                 f'(un seul bracelet en mode processus)')
+            getattr(self.listener.device, name)(*args)
+        else:
+            self.commands.put(name, *args, target=target)
 
     def vibration_long(self):
         """
         méthode qui génère une vibration longue
         """
-        self.listener.device.vibrate(myo.VibrationType.long)
+        self.send_command('vibrate', myo.VibrationType.long)
 
     def vibration_medium(self):
         """
         méthode qui génère une vibration moyenne
         """
-        self.listener.device.vibrate(myo.VibrationType.medium)
+        self.send_command('vibrate', myo.VibrationType.medium)
 
     def vibration_short(self):
         """
         méthode qui génère une vibration courte
         """
-        self.listener.device.vibrate(myo.VibrationType.short)
+        self.send_command('vibrate', myo.VibrationType.short)
 
     def init_connection(self):
         """
         lance un timer toutes les 20ms pour récupérer les données
         """
-        # permet de charger la librairie du myo
-        myo.init(sdk_path=os.path.join(os.getcwd(),
-                                       'myo-sdk-win-0.9.0'))
-        # connection à un myo
-        self.hub = myo.Hub()
-        # connection à une classe en écoute du myo
-        self.listener = my_myo_arm_band.MyListener()
-        self.startTimer(0.02)
+        if self.review is not None:
+            self.listener = None  # pas de bracelet en relecture
+            self.init_review()
+            self.startTimer(20)
+            return
+        sdk_path = os.path.join(os.getcwd(), 'myo-sdk-win-0.9.0')
+        if self.process:
+            # hub et listener dans un processus séparé, lecture des
+            # tampons partagés par un RemoteListener
+            self.acquisition = acquisition_process.AcquisitionProcess(
+                sdk_path=sdk_path, simulate=self.simulate, speed=self.speed)
+            self.acquisition.start()
+            self.listener = self.acquisition.listener
+            self.init_history()
+            self.apply_emg_view()
+            self.start_command_server()
+            self.start_metrics([self.listener])
+            self.startTimer(20)
+            return
+        if self.simulate:
+            self.hub = simulation.SimulatedHub(speed=self.speed,
+                                               nb_myo=self.nb_myo)
+        else:
+            # permet de charger la librairie du myo
+            myo.init(sdk_path=sdk_path)
+            # connection à un myo
+            self.hub = myo.Hub()
+        # connection à une classe en écoute des myo (un listener par myo)
+        self.multi_listener = multi_listener.MultiListener(self.nb_myo)
+        # les onglets de diagnostic suivent le premier myo appareillé
+        self.listener = self.multi_listener.primary
+        if self.record:
+            os.makedirs(self.path_doc, exist_ok=True)
+            nom = time.strftime('session_%Y%m%d_%H%M%S.h5')
+            self.recorder = recorder.SessionRecorder(
+                os.path.join(self.path_doc, nom),
+                segment_duration=(None if self.segment_minutes is None
+                                  else self.segment_minutes * 60),
+                segment_size=self.segment_mb)
+        if self.serve is not None:
+            self.server = net_server.StreamServer(self.listener,
+                                                  port=self.serve)
+            self.server.start()
+        if self.shm is not None:
+            self.publisher = shm_publisher.ShmPublisher(self.listener,
+                                                        self.shm)
+            self.publisher.start()
+        if self.web is not None:
+            self.dashboard = web_dashboard.WebDashboard(
+                self.multi_listener.listeners, host=self.web_host,
+                port=self.web)
+            self.dashboard.start()
+        if self.osc is not None:
+            self.osc_sender = osc_output.OscSender(
+                self.multi_listener.listeners, *self.osc)
+        self.init_history()
+        self.envelope_stream = envelope.EnvelopeStream(self.listener,
+                                                       self.envelope)
+        self.envelope_stream.start()
+        self.apply_emg_view()
+        self.start_command_server()
+        self.start_metrics(self.multi_listener.listeners)
+        self.startTimer(20)
+
+    def init_review(self):
+        """
+        ouverture paresseuse de la session et barre de relecture : lecture /
+        pause, curseur temporel, vitesse
+        """
+        self.reader = review.open_session(self.review)
+        barre = QtWidgets.QWidget()
+        layout = QtWidgets.QHBoxLayout(barre)
+        self.pb_review_play = QtWidgets.QPushButton('Lecture', barre)
+        self.pb_review_play.clicked.connect(self.toggle_playback)
+        self.sl_review = QtWidgets.QSlider(QtCore.Qt.Horizontal, barre)
+        self.sl_review.valueChanged.connect(self.seek_review)
+        self.sb_review_speed = QtWidgets.QDoubleSpinBox(barre)
+        self.sb_review_speed.setRange(0.1, 50.0)
+        self.sb_review_speed.setValue(1.0)
+        self.sb_review_speed.setSuffix(' x')
+        self.lab_review = QtWidgets.QLabel(barre)
+        for widget in (self.pb_review_play, self.sl_review,
+                       self.sb_review_speed, self.lab_review):
+            layout.addWidget(widget)
+        dock = QtWidgets.QDockWidget('Relecture', self)
+        dock.setWidget(barre)
+        self.addDockWidget(QtCore.Qt.BottomDockWidgetArea, dock)
+        appareils = self.reader.devices()
+        bornes = self.reader.time_range(appareils[0]) if appareils else None
+        if bornes is None:
+            # session enregistrée sans aucun échantillon : rien à relire
+            for widget in (self.pb_review_play, self.sl_review,
+                           self.sb_review_speed):
+                widget.setEnabled(False)
+            self.lab_review.setText('session vide')
+            return
+        self.review_caches = {
+            flux: review.WindowCache(self.reader,
+                                     recorder.stream_key(appareils[0], flux))
+            for flux in self.reader.streams(appareils[0])}
+        self.review_start, self.review_end = bornes
+        self.review_position = min(self.review_end, self.review_start
+                                   + self.review_window * 1e6)
+        # curseur au dixième de seconde
+        self.sl_review.setRange(
+            0, int((self.review_end - self.review_start) / 1e5))
+
+    def toggle_playback(self):
+        """
+        lecture / pause de la session relue
+        """
+        self.review_playing = not self.review_playing
+        if self.review_playing and self.review_position >= self.review_end:
+            self.review_position = self.review_start  # reprise au début
+        self.review_last = perf_counter()
+        self.pb_review_play.setText('Pause' if self.review_playing
+                                    else 'Lecture')
+
+    def seek_review(self, value):
+        """
+        déplacement du curseur temporel (dixièmes de seconde)
+        """
+        self.review_position = self.review_start + value * 1e5
+
+    def maj_review(self):
+        """
+        avancée de la lecture et tracé de la fenêtre se terminant à la
+        position courante, lue dans les blocs préchargés
+        """
+        if self.review_start is None:
+            return  # session vide
+        maintenant = perf_counter()
+        if self.review_playing:
+            self.review_position += ((maintenant - self.review_last) * 1e6
+                                     * self.sb_review_speed.value())
+            if self.review_position >= self.review_end:
+                self.review_position = self.review_end
+                self.toggle_playback()
+        self.review_last = maintenant
+        if self.review_position == self.review_drawn:
+            return
+        self.review_drawn = fin = self.review_position
+        debut = fin - self.review_window * 1e6
+        courbes = {'emg': (self.p_emg1, self.p_emg2, self.p_emg3,
+                           self.p_emg4, self.p_emg5, self.p_emg6,
+                           self.p_emg7, self.p_emg8),
+                   'acc': (self.p_acc1, self.p_acc2, self.p_acc3),
+                   'gyro': (self.p_gyro1, self.p_gyro2, self.p_gyro3),
+                   'ori': (self.p_orix, self.p_oriy, self.p_oriz)}
+        for flux, cache in self.review_caches.items():
+            fenetre = cache.get(debut, fin)
+            temps = (fenetre['timestamp'].values - self.review_start) / 1e6
+            for courbe, colonne in zip(courbes[flux], MYO_STREAMS[flux]):
+                courbe.setData(temps, fenetre[colonne].values)
+            if flux == 'ori' and len(fenetre):
+                self.last_quaternion = fenetre[
+                    list(MYO_STREAMS['ori'])].values[-1]
+        self.sl_review.blockSignals(True)
+        self.sl_review.setValue(int((fin - self.review_start) / 1e5))
+        self.sl_review.blockSignals(False)
+        self.lab_review.setText(
+            f'{(fin - self.review_start) / 1e6:8.1f} / '
+            f'{(self.review_end - self.review_start) / 1e6:.1f} s')
+
+    def start_command_server(self):
+        """
+        ouverture du port de commandes si demandé
+        """
+        if self.command_port is not None:
+            self.command_server = commands.CommandServer(
+                self.send_command, port=self.command_port)
+            self.command_server.start()
+
+    def init_history(self):
+        """
+        destination des données retirées de l'historique en mémoire
+        """
+        if not self.history.bounded or self.recorder is not None:
+            return  # rien à retirer, ou déjà enregistré par self.recorder
+        os.makedirs(self.path_doc, exist_ok=True)
+        nom = time.strftime('history_%Y%m%d_%H%M%S.h5')
+        self.history_recorder = recorder.SessionRecorder(
+            os.path.join(self.path_doc, nom))
+        self.history.spill = self.history_recorder
+
+    def start_metrics(self, listeners):
+        """
+        publication des métriques si demandée (thread séparé)
+        """
+        if self.metrics_port is None and self.metrics_file is None:
+            return
+        self.metrics = metrics.MetricsCollector(listeners, window=self)
+        self.metrics_exporter = metrics.MetricsExporter(
+            self.metrics, port=self.metrics_port, path=self.metrics_file)
+        self.metrics_exporter.start()
+
+    def init_spectrogram(self):
+        """
+        ajoute un onglet affichant le spectrogramme et la densité spectrale
+        des 8 voies EMG (contact des électrodes, bruit du secteur)
+        """
+        self.tab_spectre = QtWidgets.QWidget()
+        layout = QtWidgets.QVBoxLayout(self.tab_spectre)
+        gv_spectrogram = pg.PlotWidget(self.tab_spectre)
+        gv_psd = pg.PlotWidget(self.tab_spectre)
+        layout.addWidget(gv_spectrogram, 3)
+        layout.addWidget(gv_psd, 1)
+        self.tw_myo_arm.addTab(self.tab_spectre, 'Spectre')
+        self.spectrogram_view = spectrogram.SpectrogramView(
+            self.stft, gv_spectrogram, gv_psd)
+
+    def init_multi_plot(self):
+        """
+        ajoute un onglet affichant les EMG de tous les bracelets
+        dans une seule courbe
+        """
+        tab_multi = QtWidgets.QWidget()
+        layout = QtWidgets.QVBoxLayout(tab_multi)
+        gv_multi = pg.PlotWidget(tab_multi)
+        layout.addWidget(gv_multi)
+        self.tw_myo_arm.addTab(tab_multi, f'EMG {self.nb_myo} myo')
+        self.emg_stack = StackedEmgCurve(gv_multi, 8 * self.nb_myo,
+                                         self.nb_value)
+
+    def maj_multi_plot(self):
+        """
+        mise à jour du tracé des EMG de tous les bracelets
+        """
+        for indice, _ in self.multi_listener.connected_listeners():
+            _, emg = self.multi_listener.get_new_emg_data(indice)
+            self.emg_stack.push(8 * indice, emg)
+        self.emg_stack.refresh()
 
     def init_plot(self):
         """
@@ -273,14 +746,29 @@ class MainWindow(QtGui.QMainWindow, ihm.Ui_MainWindow):
         self.p_oriy.setData(self.data_ori['oriy'].values[-self.nb_value:])
         self.p_oriz.setData(self.data_ori['oriz'].values[-self.nb_value:])
 
-        self.p_emg1.setData(self.data_emg['emg1'].values[-self.nb_value:])
-        self.p_emg2.setData(self.data_emg['emg2'].values[-self.nb_value:])
-        self.p_emg3.setData(self.data_emg['emg3'].values[-self.nb_value:])
-        self.p_emg4.setData(self.data_emg['emg4'].values[-self.nb_value:])
-        self.p_emg5.setData(self.data_emg['emg5'].values[-self.nb_value:])
-        self.p_emg6.setData(self.data_emg['emg6'].values[-self.nb_value:])
-        self.p_emg7.setData(self.data_emg['emg7'].values[-self.nb_value:])
-        self.p_emg8.setData(self.data_emg['emg8'].values[-self.nb_value:])
+        if self.emg_view == 'heatmap':
+            # dernière valeur de l'enveloppe de chaque voie
+            if self.envelope_modified:
+                self.emg_heatmap.set_values(self.envelope_data[:, -1])
+                self.envelope_modified = False
+        elif self.emg_view == 'envelope':
+            # 20 valeurs par seconde, retracées seulement si nouvelles
+            if self.envelope_modified:
+                for courbe, valeurs in zip(
+                        (self.p_emg1, self.p_emg2, self.p_emg3, self.p_emg4,
+                         self.p_emg5, self.p_emg6, self.p_emg7, self.p_emg8),
+                        self.envelope_data):
+                    courbe.setData(valeurs)
+                self.envelope_modified = False
+        else:
+            self.p_emg1.setData(self.data_emg['emg1'].values[-self.nb_value:])
+            self.p_emg2.setData(self.data_emg['emg2'].values[-self.nb_value:])
+            self.p_emg3.setData(self.data_emg['emg3'].values[-self.nb_value:])
+            self.p_emg4.setData(self.data_emg['emg4'].values[-self.nb_value:])
+            self.p_emg5.setData(self.data_emg['emg5'].values[-self.nb_value:])
+            self.p_emg6.setData(self.data_emg['emg6'].values[-self.nb_value:])
+            self.p_emg7.setData(self.data_emg['emg7'].values[-self.nb_value:])
+            self.p_emg8.setData(self.data_emg['emg8'].values[-self.nb_value:])
 
         self.p_bluetooth.setData(self.listener.rssi_data_queue)
 
@@ -288,22 +776,140 @@ class MainWindow(QtGui.QMainWindow, ihm.Ui_MainWindow):
         """
         lecture des données dernièrement acquises
         """
-        data_acc = self.listener.get_acceleration_data()
-        data_gyro = self.listener.get_gyroscope_data()
-        data_ori = self.listener.get_orientation_data()
-        data_emg = self.listener.get_emg_data()
+        with self.profiler.stage('read'):
+            data_acc = self.listener.get_acceleration_data()
+            data_gyro = self.listener.get_gyroscope_data()
+            data_ori = self.listener.get_orientation_data()
+            data_emg = self.listener.get_emg_data()
+
+        with self.profiler.stage('gestion_data'):
+            self.gestion_data(data_acc, data_gyro, data_ori, data_emg)
+        if data_ori:
+            self.last_quaternion = data_ori[-1][1]
+
+        with self.profiler.stage('history'):
+            self.apply_history()
 
-        self.gestion_data(data_acc, data_gyro, data_ori, data_emg)
+        with self.profiler.stage('envelope'):
+            self.read_envelope(data_emg)
+
+        if data_emg:
+            with self.profiler.stage('stft'):
+                self.stft.update([tuple(emg) for _, emg in data_emg])
+
+    def read_envelope(self, data_emg):
+        """
+        ajout des nouvelles valeurs de l'enveloppe EMG au tracé
+        """
+        if self.envelope_stream is not None:
+            valeurs = [enveloppe for _, enveloppe
+                       in self.envelope_stream.read()]
+        elif data_emg:  # processus séparé : calcul sur les blocs lus
+            _, valeurs = self.envelope.update(
+                [timestamp for timestamp, _ in data_emg],
+                [tuple(emg) for _, emg in data_emg])
+        else:
+            valeurs = []
+        nombre = min(len(valeurs), self.nb_envelope)
+        if nombre == 0:
+            return
+        self.envelope_data[:, :-nombre] = self.envelope_data[:, nombre:]
+        self.envelope_data[:, -nombre:] = np.asarray(valeurs)[-nombre:].T
+        self.envelope_modified = True
+
+    def apply_history(self):
+        """
+        application des limites de l'historique en mémoire (cf. history)
+        """
+        donnees = self.history.apply({'emg': self.data_emg,
+                                      'acc': self.data_acc,
+                                      'gyro': self.data_gyro,
+                                      'ori': self.data_ori})
+        self.data_emg = donnees['emg']
+        self.data_acc = donnees['acc']
+        self.data_gyro = donnees['gyro']
+        self.data_ori = donnees['ori']
+
+    def maj_orientation(self):
+        """
+        une rotation de la vue 3D par rafraîchissement, au dernier
+        quaternion reçu, si l'onglet IMU est affiché
+        """
+        if (self.tw_myo_arm.currentWidget() is not self.tab_3
+                or self.last_quaternion is None):
+            return
+        self.orientation_view.set_quaternion(self.last_quaternion)
+        for label, nom, valeur in zip(
+                (self.lab_x_value, self.lab_y_value, self.lab_z_value,
+                 self.lab_w_value), 'xyzw', self.last_quaternion):
+            label.setText(f'{nom} : {valeur:.4f}')
+        self.last_quaternion = None
 
     def timerEvent(self, _):
         """
         méthode appelée toutes les 20ms
         pour récupérer les données et quelques informations
+
+        chaque étape est mesurée quand le profilage est actif (F9)
         """
-        self.hub.run(self.listener.on_event, 20)
-        self.listener.device.request_rssi()  # force du signal bluetooth
+        debut = perf_counter()
+        profiler = self.profiler
+        if self.reader is not None:
+            with profiler.stage('review'):
+                self.maj_review()
+                self.maj_orientation()
+            return
+        if self.acquisition is None:
+            with profiler.stage('commands'):
+                self.commands.execute([listener.device for listener
+                                       in self.multi_listener.listeners])
+            with profiler.stage('hub.run'):
+                self.hub.run(self.multi_listener.on_event, 20)
+            with profiler.stage('request_rssi'):
+                # force du signal bluetooth
+                self.multi_listener.request_rssi()
         self.read_imu_paquet()  # dernières données acquises
-        self.maj_plot()  # mise à jour des tracés
+        with profiler.stage('maj_plot'):
+            self.maj_plot()  # mise à jour des tracés
+        with profiler.stage('orientation'):
+            self.maj_orientation()
+        if self.tw_myo_arm.currentWidget() is self.tab_spectre:
+            with profiler.stage('spectrogram'):
+                self.spectrogram_view.refresh()
+        if self.emg_stack is not None:
+            with profiler.stage('maj_multi_plot'):
+                self.maj_multi_plot()
+        if self.recorder is not None:
+            with profiler.stage('recorder'):
+                for indice, listener in (
+                        self.multi_listener.connected_listeners()):
+                    self.recorder.add_listener(f'myo{indice}', listener)
+        if self.osc_sender is not None:
+            with profiler.stage('osc'):
+                self.osc_sender.tick()  # limité à osc_sender.rate envois/s
+        # mise à jour des compteurs de pertes (toutes les 25 itérations)
+        self.nb_tick += 1
+        if self.nb_tick % 25 == 0:
+            texte = stream_stats.format_stats(self.listener.get_stream_stats())
+            texte += '\n\n' + history.format_history(self.history.stats())
+            if profiler.enabled:
+                texte += '\n\n' + profiling.format_profile(
+                    profiler.snapshot())
+            self.lab_stream_stats.setText(texte)
+        with profiler.stage('status'):
+            self.maj_status()
+        duree = perf_counter() - debut
+        self.hud.on_tick(duree)
+        if self.metrics is not None:
+            self.metrics.observe_tick(duree)
+        if profiler.enabled:
+            profiler.add('tick', duree)
+
+    def maj_status(self):
+        """
+        mise à jour de l'état du bracelet : batterie, connexion,
+        verrouillage et pose
+        """
         # mise à jour de la bar de progression informant du niveau de batterie
         self.pb_battery.setValue(self.listener.battery_level)
         # modification du label "connect" pour informer si un myo arm l'est
@@ -345,13 +951,8 @@ class MainWindow(QtGui.QMainWindow, ihm.Ui_MainWindow):
                                                       filepath,
                                                       'CSV(*.csv)')
         if oki:
-            self.data = self.data.append({'data_acc': self.data_acc,
-                                          'data_gyro': self.data_gyro,
-                                          'data_ori': self.data_ori,
-                                          'data_emg': self.data_emg},
-                                         ignore_index=True)
             try:
-                self.data_tot = self.data.to_csv(path, mode='w', header=None)
+                self.export_csv(path)
             except PermissionError:
                 QtWidgets.QMessageBox.warning(QtWidgets.QWidget(),
                                               "Enregistrement annulé",
@@ -366,6 +967,46 @@ class MainWindow(QtGui.QMainWindow, ihm.Ui_MainWindow):
                                            "enregistrées."),
                                           QtWidgets.QMessageBox.Ok)
 
+    def export_csv(self, path):
+        """
+        écriture des données de la session dans le fichier path
+        """
+        self.data = self.data.append({'data_acc': self.data_acc,
+                                      'data_gyro': self.data_gyro,
+                                      'data_ori': self.data_ori,
+                                      'data_emg': self.data_emg},
+                                     ignore_index=True)
+        self.data_tot = self.data.to_csv(path, mode='w', header=None)
+
+    def stop_acquisition(self):
+        """
+        arrêt de l'acquisition et de tous les services associés
+        """
+        if self.acquisition is not None:
+            self.acquisition.stop()
+        elif self.hub is not None:
+            self.hub.stop()
+        if self.reader is not None:
+            self.reader.close()
+        if self.server is not None:
+            self.server.stop()
+        if self.publisher is not None:
+            self.publisher.close()
+        if self.dashboard is not None:
+            self.dashboard.stop()
+        if self.osc_sender is not None:
+            self.osc_sender.close()
+        if self.command_server is not None:
+            self.command_server.stop()
+        if self.metrics_exporter is not None:
+            self.metrics_exporter.stop()
+        if self.envelope_stream is not None:
+            self.envelope_stream.close()
+        if self.recorder is not None:
+            self.recorder.close()
+        if self.history_recorder is not None:
+            self.history_recorder.close()
+
     def closeEvent(self, event):
         """
         ajoute une boite de dialogue pour confirmation de fermeture
@@ -377,8 +1018,9 @@ class MainWindow(QtGui.QMainWindow, ihm.Ui_MainWindow):
                                              QtGui.QMessageBox.No))
         if result == QtGui.QMessageBox.Yes:
             # permet d'ajouter du code pour fermer proprement
-            self.hub.stop()
-            self.enregistrement()
+            self.stop_acquisition()
+            if self.reader is None:  # rien à enregistrer en relecture
+                self.enregistrement()
             event.accept()
 
         else:
@@ -388,7 +1030,96 @@ class MainWindow(QtGui.QMainWindow, ihm.Ui_MainWindow):
 # Start Qt event loop unless running in interactive mode or using pyside.
 if __name__ == '__main__':
     import sys
-    WIN = MainWindow()
+    import argparse
+    PARSER = argparse.ArgumentParser(description='Myo arm band demo')
+    PARSER.add_argument('--nb-myo', type=int, default=1,
+                        help='nombre de bracelets utilisés simultanément')
+    PARSER.add_argument('--record', action='store_true',
+                        help='enregistre la session au format HDF5')
+    PARSER.add_argument('--process', action='store_true',
+                        help=("acquisition dans un processus séparé "
+                              "(un seul bracelet)"))
+    PARSER.add_argument('--serve', type=int, default=None, metavar='PORT',
+                        help=("diffuse les flux du premier bracelet sur ce "
+                              "port TCP local"))
+    PARSER.add_argument('--shm', default=None, metavar='PREFIX',
+                        help=("publie les flux du premier bracelet en "
+                              "mémoire partagée (tampons PREFIX_emg...)"))
+    PARSER.add_argument('--web', type=int, default=None, metavar='PORT',
+                        help=("tableau de bord WebSocket sur ce port "
+                              "(module_myo/dashboard.html)"))
+    PARSER.add_argument('--web-host', default='127.0.0.1', metavar='HOST',
+                        help=("interface d'écoute du tableau de bord "
+                              "(0.0.0.0 : tout le réseau local)"))
+    PARSER.add_argument('--osc', default=None, metavar='HOST:PORT',
+                        help="envoie les flux en OSC vers HOST:PORT (UDP)")
+    PARSER.add_argument('--command-port', type=int, default=None,
+                        metavar='PORT',
+                        help=("accepte des commandes (vibrate short...) "
+                              "sur ce port TCP local"))
+    PARSER.add_argument('--simulate', action='store_true',
+                        help='bracelets simulés (sans le SDK myo)')
+    PARSER.add_argument('--speed', type=float, default=1.0,
+                        help="facteur d'accélération de la simulation")
+    PARSER.add_argument('--profile', action='store_true',
+                        help=("mesure la durée des étapes de timerEvent "
+                              "(F9 : activer / désactiver, F10 : afficher)"))
+    PARSER.add_argument('--metrics-port', type=int, default=None,
+                        metavar='PORT',
+                        help=("métriques au format Prometheus sur ce port "
+                              "HTTP local (/metrics)"))
+    PARSER.add_argument('--metrics-file', default=None, metavar='PATH',
+                        help="métriques réécrites toutes les 10 s dans ce "
+                             "fichier")
+    PARSER.add_argument('--history-minutes', type=float, default=None,
+                        help=("durée des données conservées en mémoire "
+                              "(les plus anciennes sont écrites sur le "
+                              "disque)"))
+    PARSER.add_argument('--max-memory', type=float, default=None,
+                        metavar='MB',
+                        help="plafond de la mémoire occupée par ces données")
+    PARSER.add_argument('--emg-view', choices=EMG_VIEWS, default='raw',
+                        help="tracé des EMG : signal brut, enveloppe RMS ou "
+                             "carte d'activité (F7 : mode suivant)")
+    PARSER.add_argument('--review', default=None, metavar='PATH',
+                        help="relecture d'une session enregistrée (HDF5, "
+                             "ou manifeste .json d'une session segmentée)")
+    PARSER.add_argument('--segment-minutes', type=float, default=None,
+                        help="durée maximale d'un fichier de l'enregistrement")
+    PARSER.add_argument('--segment-size', type=float, default=None,
+                        metavar='MB',
+                        help="taille maximale d'un fichier de "
+                             "l'enregistrement")
+    PARSER.add_argument('--no-gl', action='store_true',
+                        help="vue de l'orientation en fil de fer, sans "
+                             "OpenGL")
+    PARSER.add_argument('--hud', action='store_true',
+                        help="panneau de performances (F8 : afficher / "
+                             "masquer)")
+    ARGS = PARSER.parse_args()
+    if ARGS.osc is not None:
+        HOTE, PORT = ARGS.osc.rsplit(':', 1)
+        ARGS.osc = (HOTE, int(PORT))
+    # application créée ici seulement : le processus d'acquisition lancé en
+    # spawn (--process) réimporte ce module sans construire d'interface
+    APP = pg.mkQApp()
+    # pour rendre l'application en fond noir
+    QDARK = qdarkstyle.load_stylesheet_from_environment(is_pyqtgraph=True)
+    APP.setStyleSheet(QDARK)
+    WIN = MainWindow(nb_myo=ARGS.nb_myo, record=ARGS.record,
+                     process=ARGS.process, serve=ARGS.serve, shm=ARGS.shm,
+                     web=ARGS.web, osc=ARGS.osc,
+                     command_port=ARGS.command_port,
+                     simulate=ARGS.simulate, speed=ARGS.speed,
+                     profile=ARGS.profile, show_hud=ARGS.hud,
+                     metrics_port=ARGS.metrics_port,
+                     metrics_file=ARGS.metrics_file,
+                     history_minutes=ARGS.history_minutes,
+                     max_memory_mb=ARGS.max_memory,
+                     emg_view=ARGS.emg_view, review=ARGS.review,
+                     segment_minutes=ARGS.segment_minutes,
+                     segment_mb=ARGS.segment_size,
+                     web_host=ARGS.web_host, use_gl=not ARGS.no_gl)
     if (sys.flags.interactive != 1) or not hasattr(QtCore, 'PYQT_VERSION'):
         QtGui.QApplication.instance().exec_()
     # attention, l'utilisation de la méthode hub.run oblige un appel à chaque
@@ -1,4 +1,85 @@
 """
 .. automodule:: module_myo.my_myo_arm_band
    :members:
+
+.. automodule:: module_myo.imu_fusion
+   :members:
+
+.. automodule:: module_myo.timeline
+   :members:
+
+.. automodule:: module_myo.clock
+   :members:
+
+.. automodule:: module_myo.stream_stats
+   :members:
+
+.. automodule:: module_myo.multi_listener
+   :members:
+
+.. automodule:: module_myo.recorder
+   :members:
+
+.. automodule:: module_myo.emg_plot
+   :members:
+
+.. automodule:: module_myo.simulation
+   :members:
+
+.. automodule:: module_myo.shm_ring
+   :members:
+
+.. automodule:: module_myo.acquisition_process
+   :members:
+
+.. automodule:: module_myo.spsc
+   :members:
+
+.. automodule:: module_myo.fanout
+   :members:
+
+.. automodule:: module_myo.aio_stream
+   :members:
+
+.. automodule:: module_myo.net_server
+   :members:
+
+.. automodule:: module_myo.shm_publisher
+   :members:
+
+.. automodule:: module_myo.web_dashboard
+   :members:
+
+.. automodule:: module_myo.osc_output
+   :members:
+
+.. automodule:: module_myo.commands
+   :members:
+
+.. automodule:: module_myo.profiling
+   :members:
+
+.. automodule:: module_myo.hud
+   :members:
+
+.. automodule:: module_myo.metrics
+   :members:
+
+.. automodule:: module_myo.history
+   :members:
+
+.. automodule:: module_myo.envelope
+   :members:
+
+.. automodule:: module_myo.spectrogram
+   :members:
+
+.. automodule:: module_myo.emg_heatmap
+   :members:
+
+.. automodule:: module_myo.orientation_view
+   :members:
+
+.. automodule:: module_myo.review
+   :members:
 """
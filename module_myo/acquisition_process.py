@@ -0,0 +1,365 @@
+# -*- coding: utf-8 -*-
+"""
+Acquisition du myo arm dans un processus séparé
+
+Les tracés et les traitements de l'interface monopolisent le GIL et
+retardent les callbacks de MyListener, ce qui provoque des pertes côté
+bluetooth. Ici le hub et le listener tournent dans un processus fils qui
+écrit chaque échantillon dans des tampons circulaires en mémoire partagée
+(``SharedRing``) ; l'interface y accède en lecture seule au travers d'un
+``RemoteListener`` qui présente la même interface que MyListener.
+
+Les commandes destinées au bracelet (vibrations...) sont transmises au
+processus fils par une file ``multiprocessing.Queue`` puis exécutées par
+une ``CommandQueue`` (cf. commands) entre deux appels à ``hub.run``.
+
+Lancé directement, ce module compare la latence des callbacks EMG d'un
+bracelet simulé quand l'interface (simulée par un calcul intensif) partage
+le processus d'acquisition ou non.
+"""
+
+from collections import deque
+import multiprocessing as mp
+import os
+import queue
+from time import perf_counter
+import numpy as np
+import myo
+from module_myo import my_myo_arm_band, stream_stats
+from module_myo.commands import CommandQueue
+from module_myo.shm_ring import SharedRing
+from module_myo.timeline import MYO_STREAMS
+
+# nombre de valeurs de chaque flux (hors colonnes timestamp et host_time)
+STREAMS = {'emg': 8, 'ori': 4, 'acc': 3, 'gyro': 3, 'rssi': 1}
+# fréquence de chaque flux pour dimensionner les tampons
+FREQS = {'emg': 200.0, 'ori': 50.0, 'acc': 50.0, 'gyro': 50.0, 'rssi': 50.0}
+# nom des compteurs de pertes de MyListener pour chaque flux
+COUNTERS = {'emg': 'emg', 'ori': 'orientation', 'acc': 'acceleration',
+            'gyro': 'gyroscope'}
+# champs de l'état du bracelet (tableau partagé de flottants)
+STATUS = ('connected', 'locked', 'battery_level', 'pose', 'emg_enabled')
+NAME_SIZE = 64  # octets réservés au nom du bracelet
+
+
+class SharedStatus(object):
+    """
+    état du bracelet en mémoire partagée : flottants de STATUS puis nom
+    """
+    def __init__(self, ring):
+        self.ring = ring  # SharedRing d'une seule ligne
+
+    @classmethod
+    def create(cls):
+        return cls(SharedRing.create(1, len(STATUS) + NAME_SIZE // 8))
+
+    @classmethod
+    def attach(cls, name, readonly=True):
+        return cls(SharedRing.attach(name, readonly))
+
+    def write(self, listener):
+        """
+        recopie de l'état d'un MyListener (processus d'acquisition)
+        """
+        ligne = self.ring.data[0]
+        ligne[0] = listener.connected
+        ligne[1] = listener.locked
+        ligne[2] = listener.battery_level
+        ligne[3] = listener.pose.value
+        ligne[4] = listener.emg_enabled
+        if listener.device_name:
+            nom = listener.device_name.encode('utf-8')[:NAME_SIZE]
+            octets = ligne[len(STATUS):].view(np.uint8)
+            octets[:] = 0
+            octets[:len(nom)] = np.frombuffer(nom, dtype=np.uint8)
+
+    def read(self):
+        """
+        lecture de l'état (processus de l'interface)
+        """
+        ligne = self.ring.data[0].copy()
+        etat = dict(zip(STATUS, ligne[:len(STATUS)].tolist()))
+        nom = ligne[len(STATUS):].view(np.uint8).tobytes().rstrip(b'\0')
+        etat['device_name'] = nom.decode('utf-8', 'replace') or None
+        return etat
+
+
+class ShmListener(my_myo_arm_band.MyListener):
+    """
+    listener du processus d'acquisition : les flux sont écrits dans les
+    tampons partagés au lieu des files
+    """
+    def __init__(self, rings):
+        super(ShmListener, self).__init__()
+        self.rings = rings
+
+    def on_orientation(self, event):
+        reception = perf_counter()
+        timestamp = event.timestamp
+        self.rings['ori'].write_row((timestamp, reception,
+                                     *event.orientation))
+        self.rings['acc'].write_row((timestamp, reception,
+                                     *event.acceleration))
+        self.rings['gyro'].write_row((timestamp, reception,
+                                      *event.gyroscope))
+
+    def on_emg(self, event):
+        self.rings['emg'].write_row((event.timestamp, perf_counter(),
+                                     *event.emg))
+
+    def on_rssi(self, event):
+        self.rings['rssi'].write_row((event.timestamp, perf_counter(),
+                                      -event.rssi))
+
+
+def _execute_commands(commands, file_commandes, device):
+    """
+    transfert des commandes reçues de l'interface dans la file de commandes
+    (regroupement et limitation) puis exécution de celles autorisées
+    """
+    while True:
+        try:
+            nom, arguments = commands.get_nowait()
+        except queue.Empty:
+            break
+        file_commandes.put(nom, *arguments)
+    file_commandes.execute([device])
+
+
+def acquisition_main(ring_names, status_name, commands, stop_event,
+                     sdk_path=None, simulate=False, speed=1.0):
+    """
+    boucle du processus d'acquisition
+    """
+    rings = {stream: SharedRing.attach(nom, readonly=False)
+             for stream, nom in ring_names.items()}
+    status = SharedStatus.attach(status_name, readonly=False)
+    listener = ShmListener(rings)
+    file_commandes = CommandQueue(nb_device=1)
+    if simulate:
+        from module_myo.simulation import SimulatedHub
+        hub = SimulatedHub(speed=speed)
+    else:
+        myo.init(sdk_path=sdk_path)
+        hub = myo.Hub()
+    try:
+        while not stop_event.is_set():
+            _execute_commands(commands, file_commandes, listener.device)
+            hub.run(listener.on_event, 20)
+            if listener.device is not None:
+                listener.device.request_rssi()  # force du signal bluetooth
+            status.write(listener)
+    finally:
+        hub.stop()
+        for ring in rings.values():
+            ring.close()
+        status.ring.close()
+
+
+class _DeviceProxy(object):
+    """
+    représentant du bracelet côté interface : chaque appel de méthode
+    (vibrate, lock...) est transmis au processus d'acquisition
+    """
+    def __init__(self, commands):
+        self._commands = commands
+
+    def __getattr__(self, nom):
+        def commande(*arguments):
+            self._commands.put((nom, arguments))
+        return commande
+
+    def request_rssi(self):
+        """
+        déjà demandé périodiquement par le processus d'acquisition
+        """
+
+
+class RemoteListener(object):
+    """
+    lecture des tampons partagés avec la même interface que MyListener
+
+    chaque lecture renvoie les échantillons arrivés depuis la précédente
+    """
+    def __init__(self, rings, status, commands):
+        self.rings = rings
+        self.status = status
+        self.cursors = dict.fromkeys(rings, 0)
+        self.device = _DeviceProxy(commands)
+        self._rssi = deque(maxlen=100)
+        self.counters = {nom: stream_stats.StreamCounter(FREQS[stream])
+                         for stream, nom in COUNTERS.items()}
+        self.myo_firmware = None
+
+    def read_rows(self, stream):
+        """
+        lignes (timestamp, host_time, valeurs...) arrivées depuis la
+        dernière lecture du flux
+        """
+        lignes, self.cursors[stream], perdues = self.rings[stream].read(
+            self.cursors[stream])
+        if stream in COUNTERS:
+            compteur = self.counters[COUNTERS[stream]]
+            if perdues:
+                compteur.on_overflow(perdues)
+            for timestamp in lignes[:, 0].tolist():
+                compteur.on_sample(timestamp)
+        return lignes
+
+    def _get(self, stream):
+        lignes = self.read_rows(stream)
+        return [(timestamp, tuple(valeurs)) for timestamp, valeurs
+                in zip(lignes[:, 0].tolist(), lignes[:, 2:].tolist())]
+
+    def get_emg_data(self):
+        return self._get('emg')
+
+    def get_orientation_data(self):
+        return self._get('ori')
+
+    def get_acceleration_data(self):
+        return self._get('acc')
+
+    def get_gyroscope_data(self):
+        return self._get('gyro')
+
+    def get_stream_stats(self):
+        return {nom: compteur.snapshot()
+                for nom, compteur in self.counters.items()}
+
+    @property
+    def rssi_data_queue(self):
+        """
+        100 dernières valeurs de la force du signal bluetooth
+        """
+        self._rssi.extend(self.read_rows('rssi')[:, 2].tolist())
+        return self._rssi
+
+    @property
+    def connected(self):
+        return bool(self.status.read()['connected'])
+
+    @property
+    def locked(self):
+        return bool(self.status.read()['locked'])
+
+    @property
+    def battery_level(self):
+        return int(self.status.read()['battery_level'])
+
+    @property
+    def emg_enabled(self):
+        return bool(self.status.read()['emg_enabled'])
+
+    @property
+    def pose(self):
+        return myo.Pose(int(self.status.read()['pose']))
+
+    @property
+    def device_name(self):
+        return self.status.read()['device_name']
+
+
+class AcquisitionProcess(object):
+    """
+    processus d'acquisition et tampons partagés associés
+
+    sdk_path : chemin du SDK myo
+    simulate : utilise un bracelet simulé (cf. simulation)
+    duration : durée (s) conservée dans chaque tampon
+    """
+    def __init__(self, sdk_path=None, simulate=False, speed=1.0,
+                 duration=60.0):
+        self.rings = {}
+        for stream, nb_value in STREAMS.items():
+            colonnes = (('timestamp', 'host_time')
+                        + MYO_STREAMS.get(stream, (stream,)))
+            self.rings[stream] = SharedRing.create(
+                int(FREQS[stream] * duration), 2 + nb_value,
+                sample_rate=FREQS[stream], layout={'columns': colonnes})
+        self.status = SharedStatus.create()
+        self.commands = mp.Queue()
+        self.stop_event = mp.Event()
+        self.process = mp.Process(
+            target=acquisition_main,
+            args=({stream: ring.name for stream, ring in self.rings.items()},
+                  self.status.ring.name, self.commands, self.stop_event,
+                  sdk_path, simulate, speed),
+            daemon=True)
+        self.listener = RemoteListener(self.rings, self.status, self.commands)
+
+    def start(self):
+        """
+        lancement du processus d'acquisition
+        """
+        self.process.start()
+
+    def stop(self, timeout=2.0):
+        """
+        arrêt du processus et libération des tampons
+        """
+        self.stop_event.set()
+        self.process.join(timeout)
+        if self.process.is_alive():
+            self.process.terminate()
+        for ring in self.rings.values():
+            ring.close()
+        self.status.ring.close()
+
+
+def _charge_interface(duree):
+    """
+    travail intensif qui garde le GIL (tracés, DataFrame...) pendant duree
+    """
+    liste = list(range(300000, 0, -1))
+    fin = perf_counter() + duree
+    while perf_counter() < fin:
+        sorted(liste)  # long appel C sans relâcher le GIL
+        sum(i * i for i in range(20000))
+
+
+def _stats(latences):
+    latences = np.asarray(latences) * 1e3
+    return (f'p50 {np.percentile(latences, 50):6.2f} ms  '
+            f'p99 {np.percentile(latences, 99):6.2f} ms  '
+            f'max {latences.max():6.2f} ms  ({len(latences)} échantillons)')
+
+
+def benchmark(duree=5.0):
+    """
+    latence des callbacks EMG (instant du callback - instant théorique)
+    avec une interface chargée, acquisition dans un thread ou un processus
+    """
+    from threading import Thread
+    from module_myo.simulation import SimulatedHub
+    resultats = {}
+    # 1) acquisition dans un thread du processus de l'interface
+    latences = []
+    listener = my_myo_arm_band.MyListener()
+    on_emg = listener.on_emg
+
+    def mesure(event):
+        latences.append(perf_counter() - event.timestamp * 1e-6)
+        on_emg(event)
+    listener.on_emg = mesure
+    hub = SimulatedHub()
+    thread = Thread(target=hub.run_forever, args=(listener.on_event, 20))
+    thread.start()
+    _charge_interface(duree)
+    hub.stop()
+    thread.join()
+    resultats['thread'] = _stats(latences)
+    # 2) acquisition dans un processus séparé
+    acquisition = AcquisitionProcess(simulate=True)
+    acquisition.start()
+    _charge_interface(duree)
+    lignes = acquisition.listener.read_rows('emg')
+    acquisition.stop()
+    resultats['process'] = _stats(lignes[:, 1] - lignes[:, 0] * 1e-6)
+    return resultats
+
+
+if __name__ == '__main__':
+    for MODE, RESULTAT in benchmark().items():
+        print(f'{MODE:<8} : {RESULTAT}')
+    print(f'(processeurs : {os.cpu_count()})')
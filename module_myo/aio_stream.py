@@ -0,0 +1,185 @@
+# -*- coding: utf-8 -*-
+"""
+Accès asyncio aux flux d'un MyListener
+
+Exemple ::
+
+    stream = AsyncMyoStream(listener)
+    async for batch in stream.emg():
+        ...  # batch : liste de (timestamp, emg) arrivés depuis le précédent
+
+Le callback du SDK (autre thread) ne fait que programmer un réveil dans la
+boucle asyncio avec ``loop.call_soon_threadsafe`` ; les réveils sont
+regroupés tant que le précédent n'a pas été traité. À son réveil, chaque
+consommateur lit tous les échantillons disponibles dans son abonnement
+(cf. fanout) et les range par paquet dans sa propre file bornée : quand la
+file est pleine, le paquet le plus ancien est abandonné. Si la boucle est
+fermée, le callback se détache du listener au lieu de la réveiller.
+"""
+
+import asyncio
+from module_myo.fanout import ListenerFanout
+
+
+class _AsyncConsumer(object):
+    """
+    consommateur asynchrone d'un flux : itérateur de paquets
+    """
+    def __init__(self, stream, subscription, max_queue):
+        self.stream = stream
+        self.subscription = subscription
+        self.queue = asyncio.Queue(maxsize=max_queue)
+        self.wake_pending = False  # réveil déjà programmé
+        self.dropped_batches = 0  # paquets abandonnés (file pleine)
+        self.closed = False
+
+    def wake(self):
+        """
+        appelée dans la boucle asyncio : transfert des nouveaux
+        échantillons dans la file
+        """
+        # remis à zéro avant la lecture pour ne rater aucune notification
+        self.wake_pending = False
+        if self.closed:
+            return
+        paquet = self.subscription.read()
+        if not paquet:
+            return
+        if self.queue.full():
+            self.queue.get_nowait()
+            self.dropped_batches += 1
+        self.queue.put_nowait(paquet)
+
+    def close(self):
+        """
+        fin de l'itération pour ce consommateur
+        """
+        if self.closed:
+            return
+        self.closed = True
+        self.subscription.close()
+        if self.queue.full():
+            self.queue.get_nowait()
+        self.queue.put_nowait(None)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        paquet = await self.queue.get()
+        if paquet is None:
+            raise StopAsyncIteration
+        return paquet
+
+
+class AsyncMyoStream(object):
+    """
+    flux asynchrones d'un MyListener
+
+    loop : boucle asyncio des consommateurs (boucle courante par défaut)
+    """
+    def __init__(self, listener, loop=None):
+        self.listener = listener
+        self.fanout = ListenerFanout(listener)
+        self.loop = loop or asyncio.get_event_loop()
+        self.consumers = ()  # tuple remplacé à chaque modification
+        listener.data_callbacks.append(self._on_data)
+
+    def _on_data(self, streams):
+        """
+        appelée par le callback du SDK après chaque écriture
+        """
+        if self.loop.is_closed():
+            self._detach()
+            return
+        for consumer in self.consumers:
+            if consumer.stream in streams and not consumer.wake_pending:
+                consumer.wake_pending = True
+                try:
+                    self.loop.call_soon_threadsafe(consumer.wake)
+                except RuntimeError:
+                    # boucle fermée entre le test et l'appel
+                    self._detach()
+                    return
+
+    def _detach(self):
+        """
+        retrait du callback ; la liste est remplacée et non modifiée sur
+        place car le thread du SDK peut être en train de la parcourir
+        """
+        self.listener.data_callbacks = [
+            callback for callback in self.listener.data_callbacks
+            if callback != self._on_data]
+
+    def subscribe(self, stream, max_queue=64):
+        """
+        nouveau consommateur du flux stream : itérateur asynchrone de paquets
+        """
+        consumer = _AsyncConsumer(stream, self.fanout.subscribe(stream),
+                                  max_queue)
+        self.consumers = self.consumers + (consumer,)
+        return consumer
+
+    def emg(self, max_queue=64):
+        return self.subscribe('emg', max_queue)
+
+    def orientation(self, max_queue=64):
+        return self.subscribe('orientation', max_queue)
+
+    def acceleration(self, max_queue=64):
+        return self.subscribe('acceleration', max_queue)
+
+    def gyroscope(self, max_queue=64):
+        return self.subscribe('gyroscope', max_queue)
+
+    def unsubscribe(self, consumer):
+        """
+        arrêt d'un consommateur (son itération se termine)
+        """
+        self.consumers = tuple(autre for autre in self.consumers
+                               if autre is not consumer)
+        consumer.close()
+
+    def close(self):
+        """
+        arrêt de tous les consommateurs et détachement du listener
+        """
+        self._detach()
+        for consumer in self.consumers:
+            consumer.close()
+        self.consumers = ()
+
+
+async def _demo(duree=2.0):
+    """
+    deux consommateurs EMG et un IMU sur un bracelet simulé
+    """
+    from threading import Thread
+    from module_myo.my_myo_arm_band import MyListener
+    from module_myo.simulation import SimulatedHub
+    listener = MyListener()
+    stream = AsyncMyoStream(listener, asyncio.get_event_loop())
+    hub = SimulatedHub()
+    thread = Thread(target=hub.run_forever, args=(listener.on_event, 20))
+    thread.start()
+
+    async def consomme(nom, consumer):
+        nb_paquet = nb_echantillon = 0
+        async for paquet in consumer:
+            nb_paquet += 1
+            nb_echantillon += len(paquet)
+        print(f'{nom} : {nb_echantillon} échantillons en {nb_paquet} paquets')
+
+    taches = [asyncio.ensure_future(consomme(nom, consumer))
+              for nom, consumer in (('emg 1', stream.emg()),
+                                    ('emg 2', stream.emg()),
+                                    ('imu', stream.orientation()))]
+    await asyncio.sleep(duree)
+    hub.stop()
+    thread.join()
+    stream.close()
+    await asyncio.gather(*taches)
+
+
+if __name__ == '__main__':
+    asyncio.get_event_loop().run_until_complete(_demo())
@@ -0,0 +1,160 @@
+# -*- coding: utf-8 -*-
+"""
+Correspondance entre l'horloge du myo arm et l'horloge de l'ordinateur
+
+Les timestamps ``event.timestamp`` sont en microsecondes dans l'horloge du
+bracelet et le bluetooth livre les EMG par rafales : l'instant de réception
+ne reflète donc pas l'instant d'acquisition. Le ``ClockMapper`` estime en
+ligne le modèle ``hote = origine + decalage + derive * appareil`` :
+
+    a) la dérive (rapport des fréquences d'horloge) par régression linéaire
+       récursive avec facteur d'oubli
+    b) le décalage par le minimum glissant des résidus : le transport ne
+       peut qu'ajouter du retard, l'enveloppe basse correspond donc au
+       délai minimal
+
+Il reconstruit également des instants d'échantillonnage réguliers et fournit
+des statistiques de gigue.
+"""
+
+from collections import deque
+from time import perf_counter
+import numpy as np
+
+
+class ClockMapper(object):
+    """
+    estimation en ligne du passage horloge myo (µs) -> horloge hôte (s)
+
+    freq : fréquence nominale du flux (Hz)
+    window : durée (s) du minimum glissant des résidus
+    forgetting : facteur d'oubli de l'estimation de la dérive
+    history : nombre d'échantillons conservés pour les statistiques
+    """
+    def __init__(self, freq, window=2.0, forgetting=0.9999, history=1000):
+        self.freq = freq
+        self.window = window
+        self.forgetting = forgetting
+        self.device_origin = None  # premier timestamp myo (µs)
+        self.host_origin = None  # instant hôte correspondant (s)
+        self.drift = 1.0  # rapport horloge hôte / horloge myo
+        self.offset = 0.0  # décalage estimé (s)
+        self.count = 0  # nombre d'échantillons reçus
+        # sommes pondérées de la régression récursive
+        self._sommes = [0.0] * 5  # poids, d, h, d * d, d * h
+        # minimum glissant des résidus : (instant myo, résidu) croissants
+        self._minimum = deque()
+        # instants réguliers reconstruits
+        self._regular_anchor = None
+        self._regular_index = 0
+        self._last_device = None
+        self._last_host = None
+        # historiques pour les statistiques de gigue
+        self.device_intervals = deque(maxlen=history)
+        self.host_intervals = deque(maxlen=history)
+        self.residuals = deque(maxlen=history)
+
+    def update(self, device_timestamp, host_time=None):
+        """
+        prise en compte d'un échantillon reçu à l'instant hôte host_time
+        (perf_counter par défaut)
+        """
+        if host_time is None:
+            host_time = perf_counter()
+        if self.device_origin is None:
+            self.device_origin = device_timestamp
+            self.host_origin = host_time
+        appareil = (device_timestamp - self.device_origin) * 1e-6
+        hote = host_time - self.host_origin
+        if self._last_device is not None:
+            self.device_intervals.append(
+                (device_timestamp - self._last_device) * 1e-6)
+            self.host_intervals.append(host_time - self._last_host)
+        self._last_device = device_timestamp
+        self._last_host = host_time
+        self.count += 1
+        # dérive : pente de la régression avec facteur d'oubli
+        # (l'ordonnée à l'origine absorbe le retard moyen de transport)
+        oubli = self.forgetting
+        sommes = self._sommes
+        for i, valeur in enumerate((1.0, appareil, hote,
+                                    appareil * appareil, appareil * hote)):
+            sommes[i] = oubli * sommes[i] + valeur
+        poids, s_d, s_h, s_dd, s_dh = sommes
+        variance = poids * s_dd - s_d * s_d
+        if variance > 0.0:
+            self.drift = (poids * s_dh - s_d * s_h) / variance
+        # décalage : minimum glissant des résidus
+        residu = hote - self.drift * appareil
+        minimum = self._minimum
+        while minimum and minimum[-1][1] >= residu:
+            minimum.pop()
+        minimum.append((appareil, residu))
+        while minimum[0][0] < appareil - self.window:
+            minimum.popleft()
+        self.offset = minimum[0][1]
+        # retard de transport au-delà du délai minimal
+        self.residuals.append(residu - self.offset)
+
+    def to_host(self, device_timestamps):
+        """
+        conversion vectorisée de timestamps myo (µs) en instants hôte (s)
+        """
+        if self.device_origin is None:
+            raise RuntimeError("aucun échantillon reçu : horloge non calée")
+        appareil = (np.asarray(device_timestamps, dtype=np.float64)
+                    - self.device_origin) * 1e-6
+        return self.host_origin + self.offset + self.drift * appareil
+
+    def regularize(self, device_timestamps):
+        """
+        reconstruction d'instants myo réguliers (µs) pour une suite
+        d'échantillons consécutifs
+
+        chaque échantillon reçoit ancre + k / freq ; un trou de plus
+        d'une période et demie recale l'ancre sur le timestamp observé
+        """
+        timestamps = np.asarray(device_timestamps, dtype=np.float64)
+        sortie = np.empty_like(timestamps)
+        if len(timestamps) == 0:
+            return sortie
+        periode = 1e6 / self.freq
+        if self._regular_anchor is None:
+            self._regular_anchor = timestamps[0]
+            self._regular_index = 0
+        debut = 0
+        while debut < len(timestamps):
+            attendu = self._regular_anchor + periode * (
+                self._regular_index + np.arange(len(timestamps) - debut))
+            # premier trou (en avance sur l'horloge régulière)
+            trous = np.flatnonzero(timestamps[debut:] - attendu
+                                   > 1.5 * periode)
+            fin = len(timestamps) if len(trous) == 0 else debut + trous[0]
+            sortie[debut:fin] = attendu[:fin - debut]
+            self._regular_index += fin - debut
+            if fin < len(timestamps):
+                # nouvelle ancre sur le timestamp observé
+                self._regular_anchor = timestamps[fin]
+                self._regular_index = 0
+            debut = fin
+        return sortie
+
+    def jitter_stats(self):
+        """
+        statistiques de gigue (en ms) sur les derniers échantillons
+        """
+        stats = {'count': self.count,
+                 'drift_ppm': (self.drift - 1.0) * 1e6,
+                 'offset_s': self.offset}
+        for nom, valeurs in (('device_interval', self.device_intervals),
+                             ('host_interval', self.host_intervals),
+                             ('latency', self.residuals)):
+            if valeurs:
+                # copie atomique : le callback peut écrire en même temps
+                tableau = np.array(list(valeurs)) * 1e3
+                stats[nom] = {'mean': float(tableau.mean()),
+                              'std': float(tableau.std()),
+                              'p50': float(np.percentile(tableau, 50)),
+                              'p99': float(np.percentile(tableau, 99)),
+                              'max': float(tableau.max())}
+        return stats
@@ -0,0 +1,192 @@
+# -*- coding: utf-8 -*-
+"""
+File des commandes destinées aux bracelets
+
+Les commandes (vibrate, lock, unlock, stream_emg, request_rssi) peuvent
+être demandées depuis n'importe quel thread (boutons de l'interface,
+scripts via ``CommandServer``...) mais ne sont exécutées que par le thread
+d'acquisition, celui qui appelle ``hub.run``, avec ``CommandQueue.execute``
+juste avant chaque appel :
+
+    a) regroupement : une seule commande en attente par bracelet et par
+       famille (COALESCE), la dernière demandée l'emporte (lock puis unlock
+       donne unlock)
+    b) limitation : deux commandes d'une même famille sont espacées d'au
+       moins MIN_INTERVAL secondes, la commande reste en attente sinon
+    c) au plus max_per_call commandes par appel à execute : une rafale de
+       demandes ne retarde jamais l'acquisition
+
+``CommandServer`` expose la file aux scripts locaux par un protocole texte
+sur TCP, une commande par ligne (réponse 'ok' ou 'error: ...') ::
+
+    vibrate short|medium|long [bracelet]
+    lock [bracelet]
+    unlock [bracelet]
+    stream_emg on|off [bracelet]
+    request_rssi [bracelet]
+"""
+
+from collections import OrderedDict
+import socketserver
+from threading import Lock, Thread
+from time import perf_counter
+import myo
+
+# famille de chaque commande (regroupement et limitation)
+COALESCE = {'vibrate': 'vibrate', 'lock': 'lock', 'unlock': 'lock',
+            'stream_emg': 'stream_emg', 'request_rssi': 'request_rssi'}
+# intervalle minimal (s) entre deux commandes d'une même famille
+MIN_INTERVAL = {'vibrate': 0.5, 'lock': 0.2, 'stream_emg': 0.2,
+                'request_rssi': 0.0}
+
+
+class CommandQueue(object):
+    """
+    commandes en attente, regroupées par (bracelet, famille)
+
+    max_per_call : nombre maximal de commandes exécutées par appel à execute
+    nb_device : nombre d'emplacements de bracelets, les commandes destinées
+    à un emplacement inexistant sont refusées (elles resteraient en attente
+    indéfiniment) ; None pour ne pas vérifier
+    """
+    def __init__(self, max_per_call=4, nb_device=None):
+        self.max_per_call = max_per_call
+        self.nb_device = nb_device
+        self.lock = Lock()  # put est appelé depuis plusieurs threads
+        self.pending = OrderedDict()  # (bracelet, famille) -> (nom, args)
+        self.last_run = {}  # (bracelet, famille) -> instant d'exécution
+        self.nb_put = 0
+        self.nb_coalesced = 0  # commandes remplacées avant exécution
+        self.nb_executed = 0
+        self.nb_error = 0
+
+    def put(self, name, *args, target=0):
+        """
+        demande d'une commande pour le bracelet target (depuis tout thread)
+        """
+        if name not in COALESCE:
+            raise ValueError(f'commande inconnue : {name} '
+                             f'(choix : {tuple(COALESCE)})')
+        if target < 0 or (self.nb_device is not None
+                           and target >= self.nb_device):
+            # devices[-1] serait le dernier bracelet ; au-delà du dernier
+            # emplacement, la commande ne serait jamais exécutée
+            raise ValueError(f'numéro de bracelet invalide : {target}')
+        cle = (target, COALESCE[name])
+        with self.lock:
+            self.nb_put += 1
+            if cle in self.pending:
+                self.nb_coalesced += 1
+            self.pending[cle] = (name, args)
+
+    def __len__(self):
+        return len(self.pending)
+
+    def execute(self, devices):
+        """
+        exécution des commandes autorisées (thread d'acquisition)
+
+        devices : bracelet de chaque emplacement (None si non connecté) ;
+        les commandes d'un bracelet absent restent en attente
+        """
+        maintenant = perf_counter()
+        with self.lock:
+            prets = []
+            for cle, commande in self.pending.items():
+                target, famille = cle
+                if target >= len(devices) or devices[target] is None:
+                    continue
+                dernier = self.last_run.get(cle)
+                if (dernier is not None
+                        and maintenant - dernier < MIN_INTERVAL[famille]):
+                    continue
+                prets.append((cle, commande))
+                if len(prets) >= self.max_per_call:
+                    break
+            for cle, _ in prets:
+                del self.pending[cle]
+                self.last_run[cle] = maintenant
+        # appels au SDK hors du verrou
+        for (target, _), (name, args) in prets:
+            try:
+                getattr(devices[target], name)(*args)
+                self.nb_executed += 1
+            except Exception:  # une commande refusée n'arrête pas la boucle
+                self.nb_error += 1
+        return len(prets)
+
+    def stats(self):
+        return {'pending': len(self.pending), 'put': self.nb_put,
+                'coalesced': self.nb_coalesced,
+                'executed': self.nb_executed, 'errors': self.nb_error}
+
+
+def parse_command(line):
+    """
+    traduction d'une ligne du protocole texte en (nom, arguments, bracelet)
+    """
+    mots = line.split()
+    if not mots or mots[0] not in COALESCE:
+        raise ValueError(f'commande inconnue (choix : {tuple(COALESCE)})')
+    nom, mots = mots[0], mots[1:]
+    arguments = ()
+    if nom == 'vibrate':
+        if not mots or mots[0] not in ('short', 'medium', 'long'):
+            raise ValueError('vibrate short|medium|long [bracelet]')
+        arguments = (myo.VibrationType[mots[0]],)
+        mots = mots[1:]
+    elif nom == 'stream_emg':
+        if not mots or mots[0] not in ('on', 'off'):
+            raise ValueError('stream_emg on|off [bracelet]')
+        arguments = (mots[0] == 'on',)
+        mots = mots[1:]
+    if len(mots) > 1:
+        raise ValueError('trop d\'arguments')
+    return nom, arguments, int(mots[0]) if mots else 0
+
+
+class _CommandHandler(socketserver.StreamRequestHandler):
+    """
+    une connexion : une commande par ligne, une réponse par ligne
+    """
+    def handle(self):
+        for ligne in self.rfile:
+            ligne = ligne.decode('utf-8', 'replace').strip()
+            if not ligne:
+                continue
+            try:
+                nom, arguments, target = parse_command(ligne)
+                self.server.put(nom, *arguments, target=target)
+                reponse = 'ok'
+            except ValueError as erreur:
+                reponse = f'error: {erreur}'
+            self.wfile.write(reponse.encode('utf-8') + b'\n')
+
+
+class _ThreadingServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+class CommandServer(object):
+    """
+    accès local à une file de commandes par TCP, dans son propre thread
+
+    put : fonction (nom, *arguments, target=bracelet) qui enregistre une
+    commande, par exemple CommandQueue.put
+    """
+    def __init__(self, put, host='127.0.0.1', port=5556):
+        self.server = _ThreadingServer((host, port), _CommandHandler)
+        self.server.put = put
+        self.thread = Thread(target=self.server.serve_forever, daemon=True)
+
+    @property
+    def address(self):
+        return self.server.server_address
+
+    def start(self):
+        self.thread.start()
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
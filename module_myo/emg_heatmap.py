@@ -0,0 +1,80 @@
+# -*- coding: utf-8 -*-
+"""
+Carte d'activité des 8 électrodes disposées autour du bracelet
+
+Chaque électrode est un secteur d'une couronne, à la même place que son
+tracé dans l'onglet EMG (emg1 en bas à droite, puis dans le sens inverse
+des aiguilles d'une montre), coloré selon son activité : la dernière
+valeur de l'enveloppe RMS (cf. envelope). Un seul widget remplace les huit
+tracés pour vérifier d'un coup d'œil la pose des électrodes ; il n'est
+redessiné que lorsqu'une nouvelle valeur arrive et qu'il est visible, et le
+dessin se limite à huit secteurs.
+"""
+
+import numpy as np
+import pyqtgraph as pg
+from pyqtgraph.Qt import QtCore, QtGui, QtWidgets
+from module_myo.spectrogram import COLORS
+
+
+class EmgHeatmap(QtWidgets.QWidget):
+    """
+    couronne de nb_channel secteurs colorés selon l'activité
+
+    vmax : activité correspondant à la couleur la plus claire
+    first_angle : direction (degrés, sens trigonométrique depuis 3 h) du
+    secteur de la première électrode
+    """
+    def __init__(self, parent=None, nb_channel=8, vmax=64.0,
+                 first_angle=-45.0):
+        super(EmgHeatmap, self).__init__(parent)
+        self.nb_channel = nb_channel
+        self.vmax = vmax
+        self.first_angle = first_angle
+        self.values = np.zeros(nb_channel)
+        positions = np.linspace(0.0, 1.0, len(COLORS))
+        self.lut = [QtGui.QColor(*couleur) for couleur in pg.ColorMap(
+            positions, np.array(COLORS, dtype=np.ubyte)).getLookupTable(
+                0.0, 1.0, 256, alpha=False)]
+        self.setMinimumSize(200, 200)
+
+    def set_values(self, values):
+        """
+        nouvelle activité de chaque électrode, redessin si visible
+        """
+        self.values = np.asarray(values, dtype=np.float64)
+        if self.isVisible():
+            self.update()
+
+    def paintEvent(self, _):
+        peintre = QtGui.QPainter(self)
+        peintre.setRenderHint(QtGui.QPainter.Antialiasing)
+        cote = min(self.width(), self.height()) - 20
+        exterieur = QtCore.QRectF((self.width() - cote) / 2,
+                                  (self.height() - cote) / 2, cote, cote)
+        ouverture = 360.0 / self.nb_channel
+        indices = np.clip(self.values / self.vmax * 255, 0, 255).astype(int)
+        peintre.setPen(QtGui.QPen(QtGui.QColor(80, 80, 80), 2))
+        for voie in range(self.nb_channel):
+            centre = self.first_angle + voie * ouverture
+            peintre.setBrush(self.lut[indices[voie]])
+            # angles Qt en seizièmes de degré
+            peintre.drawPie(exterieur, int((centre - ouverture / 2) * 16),
+                            int(ouverture * 16))
+        # évidement central et étiquettes
+        interieur = cote * 0.4
+        peintre.setBrush(self.palette().window())
+        peintre.drawEllipse(exterieur.center(), interieur / 2, interieur / 2)
+        rayon = cote * 0.35
+        for voie in range(self.nb_channel):
+            # texte sombre sur les couleurs claires
+            peintre.setPen(QtGui.QColor(*((0, 0, 0) if indices[voie] > 160
+                                          else (255, 255, 255))))
+            angle = np.radians(self.first_angle + voie * ouverture)
+            position = exterieur.center() + QtCore.QPointF(
+                rayon * np.cos(angle), -rayon * np.sin(angle))
+            cadre = QtCore.QRectF(position.x() - 30, position.y() - 15, 60,
+                                  30)
+            peintre.drawText(cadre, QtCore.Qt.AlignCenter,
+                             f'emg{voie + 1}\n{self.values[voie]:.0f}')
+        peintre.end()
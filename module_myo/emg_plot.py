@@ -0,0 +1,60 @@
+# -*- coding: utf-8 -*-
+"""
+Tracé empilé de nombreuses voies EMG dans un seul objet pyqtgraph
+
+Avec plusieurs bracelets (16 à 32 voies), une courbe par voie multiplie les
+appels à ``setData`` et les objets graphiques à chaque rafraîchissement.
+Ici toutes les voies sont décalées verticalement et concaténées dans une
+seule courbe ; un tableau ``connect`` coupe le trait entre deux voies. Le
+coût python d'un rafraîchissement ne dépend donc pas du nombre de voies.
+"""
+
+import numpy as np
+
+
+class StackedEmgCurve(object):
+    """
+    courbe unique affichant nb_channel voies de nb_value points
+
+    plot_widget : PlotWidget pyqtgraph hôte
+    spacing : décalage vertical entre deux voies (les EMG vont de -128 à 127)
+    """
+    def __init__(self, plot_widget, nb_channel, nb_value=1000, spacing=256):
+        self.nb_channel = nb_channel
+        self.nb_value = nb_value
+        self.buffer = np.zeros((nb_channel, nb_value))
+        # abscisses et décalages calculés une fois pour toutes
+        self.x = np.tile(np.arange(nb_value, dtype=np.float64), nb_channel)
+        self.offsets = (np.arange(nb_channel, dtype=np.float64)
+                        * spacing)[:, None]
+        self.connect = np.ones(nb_channel * nb_value, dtype=bool)
+        self.connect[nb_value - 1::nb_value] = False  # coupure entre voies
+        self.curve = plot_widget.plot()
+        plot_widget.setYRange(-spacing / 2, (nb_channel - 0.5) * spacing)
+        plot_widget.getAxis('left').setTicks(
+            [[(i * spacing, f'emg{i + 1}') for i in range(nb_channel)]])
+        self.modified = False
+
+    def push(self, first_channel, block):
+        """
+        ajout d'un bloc (n, k) de nouveaux échantillons pour les voies
+        first_channel à first_channel + k - 1
+        """
+        block = np.asarray(block, dtype=np.float64)
+        nb_sample = min(len(block), self.nb_value)
+        if nb_sample == 0:
+            return
+        voies = slice(first_channel, first_channel + block.shape[1])
+        self.buffer[voies, :-nb_sample] = self.buffer[voies, nb_sample:]
+        self.buffer[voies, -nb_sample:] = block[-nb_sample:].T
+        self.modified = True
+
+    def refresh(self):
+        """
+        mise à jour du tracé en un seul appel, seulement si nécessaire
+        """
+        if not self.modified:
+            return
+        self.curve.setData(self.x, (self.buffer + self.offsets).ravel(),
+                           connect=self.connect)
+        self.modified = False
@@ -0,0 +1,149 @@
+# -*- coding: utf-8 -*-
+"""
+Enveloppe des voies EMG calculée au fil de l'acquisition
+
+Deux méthodes, appliquées aux 8 voies à la fois sur chaque nouveau bloc :
+
+    a) 'rms' : moyenne quadratique glissante sur window échantillons ; la
+       somme glissante est obtenue par différence de sommes cumulées sur
+       le bloc précédé des window derniers carrés du bloc précédent
+    b) 'linear' : enveloppe linéaire, redressement double alternance puis
+       passe-bas de Butterworth d'ordre 2 (cutoff Hz) dont l'état est
+       conservé d'un bloc à l'autre (``scipy.signal.lfilter``, dépendance
+       optionnelle)
+
+Une valeur d'enveloppe n'est produite que tous les decimation échantillons
+(20 Hz par défaut au lieu de 200 Hz) : c'est elle que l'interface trace.
+
+``EnvelopeStream`` fait ce calcul côté acquisition, dans le callback du
+listener, par blocs de batch échantillons ; l'interface ne lit que les
+valeurs déjà calculées.
+"""
+
+import numpy as np
+from module_myo.fanout import ListenerFanout
+from module_myo.spsc import SpscRing
+
+try:
+    from scipy import signal
+except ImportError:  # dépendance optionnelle (méthode 'linear')
+    signal = None
+
+METHODS = ('rms', 'linear')
+
+
+class EmgEnvelope(object):
+    """
+    enveloppe incrémentale de nb_channel voies
+
+    window : nombre d'échantillons de la moyenne quadratique ('rms')
+    cutoff : fréquence de coupure du passe-bas (Hz, 'linear')
+    decimation : une valeur d'enveloppe tous les decimation échantillons
+    freq : fréquence d'échantillonnage (Hz)
+    """
+    def __init__(self, nb_channel=8, method='rms', window=40, cutoff=5.0,
+                 decimation=10, freq=200.0):
+        if method not in METHODS:
+            raise ValueError(f'méthode inconnue : {method} '
+                             f'(choix : {METHODS})')
+        self.nb_channel = nb_channel
+        self.method = method
+        self.window = window
+        self.cutoff = cutoff
+        self.freq = freq
+        self.decimation = decimation
+        self.nb_sample = 0  # échantillons traités
+        # window derniers carrés ('rms')
+        self.squares = np.zeros((window, nb_channel))
+        if method == 'linear':
+            if signal is None:
+                raise ImportError("l'enveloppe linéaire nécessite le paquet "
+                                  "'scipy'")
+            self.b, self.a = signal.butter(2, cutoff / (freq / 2))
+            self.state = np.zeros((max(len(self.a), len(self.b)) - 1,
+                                   nb_channel))
+
+    def update(self, timestamps, values):
+        """
+        nouveaux échantillons : timestamps (n,), values (n, nb_channel)
+
+        retourne (timestamps, enveloppes) des valeurs décimées produites
+        par ce bloc
+        """
+        values = np.asarray(values, dtype=np.float64).reshape(
+            -1, self.nb_channel)
+        nombre = len(values)
+        if self.method == 'rms':
+            carres = values ** 2
+            cumul = np.cumsum(np.vstack((self.squares, carres)), axis=0)
+            # somme des window derniers carrés à chaque nouvel échantillon
+            sommes = cumul[self.window:] - cumul[:nombre]
+            self.squares = np.vstack((self.squares, carres))[-self.window:]
+            enveloppe = np.sqrt(np.maximum(sommes, 0.0) / self.window)
+        else:
+            enveloppe, self.state = signal.lfilter(
+                self.b, self.a, np.abs(values), axis=0, zi=self.state)
+        # indices des échantillons retenus (multiples de decimation)
+        retenus = (np.arange(self.nb_sample + 1, self.nb_sample + nombre + 1)
+                   % self.decimation == 0)
+        self.nb_sample += nombre
+        return np.asarray(timestamps)[retenus], enveloppe[retenus]
+
+    def reset(self):
+        self.__init__(self.nb_channel, self.method, self.window,
+                      self.cutoff, self.decimation, self.freq)
+
+
+class EnvelopeStream(object):
+    """
+    enveloppe des EMG d'un MyListener calculée dans le callback du SDK
+
+    batch : nombre d'échantillons EMG regroupés par calcul
+    capacity : nombre de valeurs d'enveloppe conservées pour la lecture
+    """
+    def __init__(self, listener, envelope=None, batch=10, capacity=1000):
+        self.listener = listener
+        self.envelope = envelope if envelope is not None else EmgEnvelope()
+        self.batch = batch
+        self.fanout = ListenerFanout(listener)
+        self.subscription = self.fanout.subscribe('emg')
+        self.ring = SpscRing(capacity)
+        self.cursor = 0
+        self.nb_call = 0
+        self.lost = 0  # valeurs d'enveloppe écrasées avant lecture
+
+    def start(self):
+        self.listener.data_callbacks.append(self._on_data)
+
+    def _on_data(self, streams):
+        """
+        appelée par le callback du SDK, calcul tous les batch échantillons
+        """
+        if 'emg' not in streams:
+            return
+        self.nb_call += 1
+        if self.nb_call % self.batch:
+            return
+        donnees = self.subscription.read()
+        if not donnees:
+            return
+        timestamps, enveloppes = self.envelope.update(
+            [timestamp for timestamp, _ in donnees],
+            [tuple(valeurs) for _, valeurs in donnees])
+        for timestamp, valeurs in zip(timestamps.tolist(),
+                                      enveloppes.tolist()):
+            self.ring.append((timestamp, valeurs))
+
+    def read(self):
+        """
+        valeurs (timestamp, [8 enveloppes]) calculées depuis la lecture
+        précédente
+        """
+        valeurs, self.cursor, perdus = self.ring.read(self.cursor)
+        self.lost += perdus
+        return valeurs
+
+    def close(self):
+        if self._on_data in self.listener.data_callbacks:
+            self.listener.data_callbacks.remove(self._on_data)
+        self.subscription.close()
@@ -0,0 +1,169 @@
+# -*- coding: utf-8 -*-
+"""
+Diffusion des flux d'un MyListener vers plusieurs consommateurs
+
+Interface, enregistreur, classifieur, serveur réseau... chaque consommateur
+s'abonne à un flux et obtient une ``Subscription`` avec son propre curseur
+dans le tampon ``SpscRing`` du listener : tous partagent le même tampon,
+aucune copie par consommateur n'est faite à l'écriture.
+
+Politiques de contre-pression :
+
+    a) 'drop_oldest' : un consommateur trop lent perd les échantillons les
+       plus anciens (écrasés dans le tampon), ils sont comptés dans lost
+    b) 'block' : le callback du SDK attend (au plus max_wait secondes) que
+       le consommateur ait libéré de la place avant d'écrire
+    c) 'sample' : seul le dernier échantillon disponible est remis
+
+Plusieurs ``ListenerFanout`` peuvent coexister sur un même listener (un par
+consommateur : serveur réseau, mémoire partagée, tableau de bord...) :
+chacun ajoute sa propre fonction d'attente à ``listener.before_append`` tant
+qu'il a des abonnements bloquants.
+
+La politique 'block' est réservée aux consommateurs qui lisent dans un
+autre thread ou un autre processus que celui du SDK. Avec le listener de
+l'interface, les callbacks sont exécutés dans ``hub.run``, sur le thread Qt :
+un abonnement bloquant lu par ce thread ne peut pas libérer de place
+pendant que le callback attend, et chaque échantillon gèle l'interface
+max_wait secondes. Utiliser alors 'drop_oldest', ou l'acquisition dans un
+processus séparé (cf. acquisition_process).
+"""
+
+from time import perf_counter, sleep
+
+POLICIES = ('drop_oldest', 'block', 'sample')
+# flux notifiés après un évènement EMG ou d'orientation
+EMG_STREAMS = ('emg',)
+IMU_STREAMS = ('orientation', 'acceleration', 'gyroscope')
+
+
+class Subscription(object):
+    """
+    abonnement d'un consommateur à un flux
+    """
+    def __init__(self, fanout, stream, policy):
+        self.fanout = fanout
+        self.stream = stream
+        self.policy = policy
+        self.ring = fanout.listener.queues[stream]
+        self.cursor = self.ring.write_index  # on part des données à venir
+        self.lost = 0  # échantillons perdus (écrasés ou sautés)
+        self.delivered = 0  # échantillons remis
+
+    @property
+    def backlog(self):
+        """
+        nombre d'échantillons en attente de lecture
+        """
+        return self.ring.write_index - self.cursor
+
+    def read(self, max_item=None):
+        """
+        échantillons disponibles selon la politique de l'abonnement
+        """
+        if self.policy == 'sample':
+            fin = self.ring.write_index
+            if fin == self.cursor:
+                return []
+            self.lost += fin - self.cursor - 1
+            self.cursor = fin
+            self.delivered += 1
+            return self.ring.latest(1)
+        debut = self.cursor
+        elements, self.cursor, perdus = self.ring.read(debut)
+        self.lost += perdus
+        if max_item is not None and len(elements) > max_item:
+            # le reste sera remis à la prochaine lecture
+            self.cursor -= len(elements) - max_item
+            elements = elements[:max_item]
+        self.delivered += len(elements)
+        return elements
+
+    def close(self):
+        """
+        fin de l'abonnement
+        """
+        self.fanout.unsubscribe(self)
+
+
+class ListenerFanout(object):
+    """
+    couche de diffusion au-dessus d'un MyListener
+
+    max_wait : attente maximale (s) du callback pour la politique 'block'
+    """
+    def __init__(self, listener, max_wait=0.05):
+        self.listener = listener
+        self.max_wait = max_wait
+        self.subscriptions = []
+        self._blocking = {}  # flux -> abonnements bloquants
+        self.blocked_time = 0.0  # temps total d'attente du callback (s)
+
+    def subscribe(self, stream, policy='drop_oldest'):
+        """
+        nouvel abonnement au flux stream ('emg', 'orientation',
+        'acceleration' ou 'gyroscope')
+        """
+        if policy not in POLICIES:
+            raise ValueError(f'politique inconnue : {policy} '
+                             f'(choix : {POLICIES})')
+        abonnement = Subscription(self, stream, policy)
+        self.subscriptions.append(abonnement)
+        if policy == 'block':
+            # nouvelle liste : le callback peut la parcourir en même temps
+            self._blocking = dict(self._blocking)
+            self._blocking[stream] = (self._blocking.get(stream, ())
+                                      + (abonnement,))
+            attentes = self.listener.before_append
+            if self.wait_for_space not in attentes:
+                # nouvelle liste : le callback peut parcourir l'ancienne
+                self.listener.before_append = attentes + [self.wait_for_space]
+        return abonnement
+
+    def unsubscribe(self, abonnement):
+        """
+        suppression d'un abonnement
+        """
+        if abonnement in self.subscriptions:
+            self.subscriptions.remove(abonnement)
+        if abonnement.policy == 'block':
+            bloquants = dict(self._blocking)
+            bloquants[abonnement.stream] = tuple(
+                autre for autre in bloquants[abonnement.stream]
+                if autre is not abonnement)
+            if not bloquants[abonnement.stream]:
+                del bloquants[abonnement.stream]
+            self._blocking = bloquants
+            if not bloquants:
+                # les attentes des autres ListenerFanout sont conservées
+                self.listener.before_append = [
+                    attente for attente in self.listener.before_append
+                    if attente != self.wait_for_space]
+
+    def wait_for_space(self, streams):
+        """
+        appelée par le callback du SDK avant d'écrire dans les flux streams :
+        attend que les abonnements bloquants aient de la place
+        """
+        bloquants = self._blocking
+        for stream in streams:
+            for abonnement in bloquants.get(stream, ()):
+                ring = abonnement.ring
+                if ring.write_index - abonnement.cursor < ring.capacity:
+                    continue
+                debut = perf_counter()
+                while (ring.write_index - abonnement.cursor >= ring.capacity
+                       and perf_counter() - debut < self.max_wait):
+                    sleep(0.0005)
+                self.blocked_time += perf_counter() - debut
+
+    def stats(self):
+        """
+        état de chaque abonnement
+        """
+        return [{'stream': abonnement.stream,
+                 'policy': abonnement.policy,
+                 'backlog': abonnement.backlog,
+                 'delivered': abonnement.delivered,
+                 'lost': abonnement.lost}
+                for abonnement in self.subscriptions]
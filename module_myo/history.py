@@ -0,0 +1,146 @@
+# -*- coding: utf-8 -*-
+"""
+Historique borné des données conservées en mémoire par l'interface
+
+Les DataFrame de ``MainWindow`` (data_emg, data_acc, data_gyro, data_ori)
+grandissent à chaque rafraîchissement. ``HistoryPolicy`` les borne :
+
+    a) en durée : seules les max_minutes dernières minutes sont conservées
+    b) en mémoire : la taille totale des DataFrame reste sous max_memory_mb
+
+Les lignes retirées sont confiées à un enregistreur (``SessionRecorder``,
+cf. recorder) et ne sont donc pas perdues. Pour ne pas recopier les
+DataFrame à chaque rafraîchissement, la vérification a lieu au plus une
+fois par check_interval secondes et la coupe ne se fait qu'au-delà d'une
+marge (10 % de la durée, ou du plafond mémoire) : la mémoire oscille dans
+cette marge au lieu de croître indéfiniment.
+
+Les colonnes créées vides par ``init_data`` sont de type objet (un objet
+Python par valeur) ; elles sont converties en float64 à la première
+vérification, ce qui divise leur encombrement par trois environ.
+"""
+
+from time import perf_counter
+import numpy as np
+import psutil
+from module_myo.timeline import MYO_STREAMS
+
+MARGIN = 0.1  # dépassement toléré avant une coupe
+
+
+def frame_bytes(frames):
+    """
+    encombrement (octets) des DataFrame d'un dictionnaire flux -> DataFrame
+    """
+    return int(sum(frame.memory_usage(index=True).sum()
+                   for frame in frames.values()))
+
+
+class HistoryPolicy(object):
+    """
+    règles de conservation des données en mémoire
+
+    max_minutes : durée conservée (None : illimitée)
+    max_memory_mb : plafond de l'encombrement des DataFrame (None : aucun)
+    spill : enregistreur recevant les lignes retirées (None : abandonnées)
+    device : nom du bracelet dans l'enregistreur
+    """
+    def __init__(self, max_minutes=None, max_memory_mb=None, spill=None,
+                 device='myo0', check_interval=1.0):
+        self.max_age = None if max_minutes is None else max_minutes * 60e6
+        self.max_bytes = (None if max_memory_mb is None
+                          else max_memory_mb * 2 ** 20)
+        self.spill = spill
+        self.device = device
+        self.check_interval = check_interval
+        self.memory_bytes = 0  # encombrement à la dernière vérification
+        self.nb_sample = 0  # lignes en mémoire à la dernière vérification
+        self.trimmed = {}  # flux -> lignes retirées de la mémoire
+        self.nb_trim = 0  # nombre de coupes
+        self._last_check = None
+
+    @property
+    def nb_trimmed(self):
+        return sum(self.trimmed.values())
+
+    @property
+    def bounded(self):
+        return self.max_age is not None or self.max_bytes is not None
+
+    def _spill(self, stream, lignes):
+        self.trimmed[stream] = self.trimmed.get(stream, 0) + len(lignes)
+        if self.spill is not None and len(lignes):
+            self.spill.add(self.device, stream, lignes['timestamp'].values,
+                           lignes[list(MYO_STREAMS[stream])].values)
+
+    def _cut(self, frames, debuts):
+        """
+        retrait des lignes antérieures à debuts[flux] de chaque DataFrame
+        """
+        sortie = {}
+        for stream, frame in frames.items():
+            debut = debuts.get(stream, 0)
+            if debut > 0:
+                self._spill(stream, frame.iloc[:debut])
+                frame = frame.iloc[debut:].reset_index(drop=True)
+            sortie[stream] = frame
+        if debuts:
+            self.nb_trim += 1
+        return sortie
+
+    def apply(self, frames, force=False):
+        """
+        frames : dictionnaire flux (emg, acc, gyro, ori) -> DataFrame
+
+        renvoie le dictionnaire des DataFrame bornés (les mêmes objets si
+        aucune coupe n'est nécessaire)
+        """
+        maintenant = perf_counter()
+        if (not force and self._last_check is not None
+                and maintenant - self._last_check < self.check_interval):
+            return frames
+        self._last_check = maintenant
+        frames = {stream: (frame.infer_objects()
+                           if (frame.dtypes == object).any() else frame)
+                  for stream, frame in frames.items()}
+        if self.max_age is not None:
+            debuts = {}
+            for stream, frame in frames.items():
+                if len(frame) < 2:
+                    continue
+                timestamps = frame['timestamp'].values
+                if (timestamps[-1] - timestamps[0]
+                        > self.max_age * (1 + MARGIN)):
+                    debuts[stream] = int(np.searchsorted(
+                        timestamps, timestamps[-1] - self.max_age))
+            frames = self._cut(frames, debuts)
+        self.memory_bytes = frame_bytes(frames)
+        if self.max_bytes is not None and self.memory_bytes > self.max_bytes:
+            # même proportion retirée de chaque flux, jusqu'à 90 % du plafond
+            garde = (1 - MARGIN) * self.max_bytes / self.memory_bytes
+            frames = self._cut(frames, {
+                stream: len(frame) - int(len(frame) * garde)
+                for stream, frame in frames.items()})
+            self.memory_bytes = frame_bytes(frames)
+        self.nb_sample = sum(len(frame) for frame in frames.values())
+        return frames
+
+    def stats(self):
+        return {'samples': self.nb_sample,
+                'memory_mb': self.memory_bytes / 2 ** 20,
+                'max_memory_mb': (None if self.max_bytes is None
+                                  else self.max_bytes / 2 ** 20),
+                'trimmed': self.nb_trimmed,
+                'rss_mb': psutil.Process().memory_info().rss / 2 ** 20}
+
+
+def format_history(stats):
+    """
+    mise en forme texte de l'état de l'historique pour l'interface
+    """
+    plafond = ('' if stats['max_memory_mb'] is None
+               else f" / {stats['max_memory_mb']:.0f}")
+    return (f"historique {stats['samples']:>9} éch. "
+            f"{stats['memory_mb']:7.1f}{plafond} Mo  "
+            f"retirés {stats['trimmed']:>9}\n"
+            f"mémoire du processus {stats['rss_mb']:7.1f} Mo")
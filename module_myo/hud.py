@@ -0,0 +1,117 @@
+# -*- coding: utf-8 -*-
+"""
+Affichage tête haute des performances de l'interface
+
+Petit panneau semi-transparent superposé à la fenêtre principale :
+
+    a) fréquence des rafraîchissements (appels à timerEvent par seconde)
+    b) percentiles de la durée d'un rafraîchissement
+    c) échantillons reçus par seconde pour chaque flux
+    d) échantillons perdus (trous de timestamps) et écrasés avant lecture
+    e) remplissage des tampons du listener au moment de la mise à jour
+
+``on_tick`` (appelée à chaque rafraîchissement) ne fait qu'ajouter une durée
+à un histogramme glissant ; le texte n'est recalculé que toutes les
+interval millisecondes par le timer du panneau, arrêté quand il est masqué.
+"""
+
+from time import perf_counter
+from pyqtgraph.Qt import QtCore, QtGui, QtWidgets
+from module_myo.acquisition_process import COUNTERS
+from module_myo.profiling import RollingHistogram
+
+
+def buffer_fill(listener):
+    """
+    remplissage (0 à 1) du tampon de chaque flux : échantillons écrits et
+    pas encore lus par l'interface rapportés à la capacité
+
+    les flux sont nommés comme les compteurs de pertes (emg, orientation...)
+    """
+    if hasattr(listener, 'queues'):  # MyListener
+        tampons = {nom: (tampon, nom)
+                   for nom, tampon in listener.queues.items()}
+    else:  # RemoteListener : tampons partagés nommés ori, acc...
+        tampons = {nom: (listener.rings[stream], stream)
+                   for stream, nom in COUNTERS.items()}
+    return {nom: min(1.0, (tampon.write_index - listener.cursors[cle])
+                     / tampon.capacity)
+            for nom, (tampon, cle) in tampons.items()}
+
+
+class PerformanceHud(QtWidgets.QLabel):
+    """
+    panneau de performances superposé au widget parent
+
+    window : fenêtre principale (listener courant)
+    interval : période de mise à jour du texte (ms)
+    """
+    def __init__(self, window, parent, interval=500):
+        super(PerformanceHud, self).__init__(parent)
+        self.window = window
+        self.setFont(QtGui.QFont('Courier New', 9))
+        self.setStyleSheet('background-color: rgba(0, 0, 0, 160); '
+                           'color: #7CFC00; padding: 4px;')
+        self.setAttribute(QtCore.Qt.WA_TransparentForMouseEvents)
+        self.durations = RollingHistogram(window=250)
+        self.nb_tick = 0
+        self.last_update = perf_counter()
+        self.last_tick = 0
+        self.last_received = {}
+        self.timer = QtCore.QTimer(self)
+        self.timer.setInterval(interval)
+        self.timer.timeout.connect(self.refresh)
+        self.hide()
+
+    def on_tick(self, duration):
+        """
+        fin d'un rafraîchissement de durée duration (s)
+        """
+        if self.isVisible():
+            self.nb_tick += 1
+            self.durations.add(duration)
+
+    def toggle(self):
+        if self.isVisible():
+            self.timer.stop()
+            self.hide()
+        else:
+            self.last_update = perf_counter()
+            self.last_tick = self.nb_tick
+            self.last_received = {}
+            self.show()
+            self.raise_()
+            self.timer.start()
+
+    def refresh(self):
+        """
+        recalcul du texte (timer du panneau)
+        """
+        maintenant = perf_counter()
+        ecoule = max(maintenant - self.last_update, 1e-6)
+        listener = self.window.listener
+        # pas de listener en relecture d'une session
+        stats = listener.get_stream_stats() if listener is not None else {}
+        lignes = [f'fps    {(self.nb_tick - self.last_tick) / ecoule:6.1f}']
+        if len(self.durations):
+            lignes.append('tick   p50 {:5.1f}  p99 {:5.1f}  max {:5.1f} ms'
+                          .format(1e3 * self.durations.percentile(50),
+                                  1e3 * self.durations.percentile(99),
+                                  1e3 * self.durations.maximum()))
+        remplissage = buffer_fill(listener) if listener is not None else {}
+        for nom, valeurs in stats.items():
+            debit = ((valeurs['received']
+                      - self.last_received.get(nom, valeurs['received']))
+                     / ecoule)
+            self.last_received[nom] = valeurs['received']
+            tampon = remplissage.get(nom, 0.0)
+            lignes.append(f"{nom[:5]:<6} {debit:6.0f}/s  "
+                          f"perdus {valeurs['dropped']:>5}  "
+                          f"écrasés {valeurs['overflow']:>5}  "
+                          f"tampon {100 * tampon:3.0f} %")
+        self.last_update = maintenant
+        self.last_tick = self.nb_tick
+        self.setText('\n'.join(lignes))
+        self.adjustSize()
+        parent = self.parentWidget()
+        self.move(parent.width() - self.width() - 8, 8)
@@ -0,0 +1,303 @@
+# -*- coding: utf-8 -*-
+"""
+Fusion des données de la centrale inertielle du myo arm
+
+Les filtres de Madgwick et de Mahony estiment une orientation corrigée de la
+dérive du gyroscope à partir des flux gyroscope et accéléromètre reçus dans
+``on_orientation`` (50 Hz). Les échantillons sont traités par blocs : toutes
+les conversions (unités, normalisation, pas de temps, gravité) sont
+vectorisées avec numpy et seule la récurrence du filtre reste en boucle sur
+des flottants python.
+
+Conventions :
+
+    a) quaternions rangés comme dans le myo arm : (x, y, z, w)
+    b) gyroscope en °/s, accéléromètre en g
+    c) timestamps en microsecondes (``event.timestamp``)
+"""
+
+import math
+import numpy as np
+
+# fréquence nominale de la centrale inertielle du myo arm
+FREQ_IMU = 50.0
+
+
+def to_arrays(data):
+    """
+    conversion d'une liste [(timestamp, vecteur), ...] issue de MyListener
+    en deux tableaux numpy (timestamps, valeurs)
+    """
+    if not data:
+        return np.empty(0), np.empty((0, 3))
+    timestamps = np.fromiter((timestamp for timestamp, _ in data),
+                             dtype=np.float64, count=len(data))
+    valeurs = np.array([tuple(valeur) for _, valeur in data],
+                       dtype=np.float64)
+    return timestamps, valeurs
+
+
+def gravity_vector(quat):
+    """
+    direction de la gravité (en g) dans le repère du capteur
+    pour chaque quaternion (x, y, z, w)
+    """
+    quat = np.atleast_2d(quat)
+    qx, qy, qz, qw = quat[:, 0], quat[:, 1], quat[:, 2], quat[:, 3]
+    return np.column_stack((2.0 * (qx * qz - qw * qy),
+                            2.0 * (qw * qx + qy * qz),
+                            qw * qw - qx * qx - qy * qy + qz * qz))
+
+
+def linear_acceleration(quat, acc):
+    """
+    accélération linéaire (en g) débarrassée de la gravité,
+    exprimée dans le repère du capteur
+    """
+    return np.atleast_2d(acc) - gravity_vector(quat)
+
+
+class _ImuFilter(object):
+    """
+    classe de base des filtres de fusion : gestion de l'état entre deux blocs
+    et préparation vectorisée des entrées
+
+    chaque filtre définit ``_boucle(gyro, acc, valide, dt)`` : gyroscope
+    (n, 3) en rad/s, accéléromètre normalisé (n, 3), masque des
+    accélérations non nulles (n,) et pas de temps (n,) en s ; elle prépare
+    avec numpy tout ce qui ne dépend pas de l'état, déroule la récurrence sur
+    des flottants python, met à jour self.quat et retourne la liste à plat
+    des quaternions (w, x, y, z) successifs
+    """
+    def __init__(self, freq=FREQ_IMU):
+        self.freq = freq  # fréquence utilisée si les timestamps manquent
+        self.quat = [0.0, 0.0, 0.0, 1.0]  # orientation courante (x, y, z, w)
+        self.last_timestamp = None  # timestamp du dernier échantillon traité
+
+    def reset(self, quat=None):
+        """
+        remise à zéro de l'orientation (ou initialisation avec quat)
+        """
+        if quat is None:
+            quat = (0.0, 0.0, 0.0, 1.0)
+        self.quat = [float(valeur) for valeur in quat]
+        self.last_timestamp = None
+
+    def _dt(self, timestamps, nb_sample):
+        """
+        calcul vectorisé des pas de temps en secondes
+        """
+        if timestamps is None:
+            return np.full(nb_sample, 1.0 / self.freq)
+        timestamps = np.asarray(timestamps, dtype=np.float64)
+        precedent = (timestamps[0] - 1e6 / self.freq
+                     if self.last_timestamp is None else self.last_timestamp)
+        dt = np.diff(np.concatenate(([precedent], timestamps))) * 1e-6
+        # un trou ou un timestamp incohérent ne doit pas faire diverger
+        # l'intégration : on revient au pas nominal
+        aberrant = (dt <= 0.0) | (dt > 10.0 / self.freq)
+        dt[aberrant] = 1.0 / self.freq
+        self.last_timestamp = timestamps[-1]
+        return dt
+
+    @staticmethod
+    def _acc_normalisee(acc):
+        """
+        normalisation vectorisée de l'accéléromètre,
+        les échantillons nuls sont signalés par un masque
+        """
+        norme = np.sqrt(np.einsum('ij,ij->i', acc, acc))
+        valide = norme > 0.0
+        acc = acc / np.where(valide, norme, 1.0)[:, None]
+        return acc, valide
+
+    def update_block(self, gyro, acc, timestamps=None):
+        """
+        traitement d'un bloc d'échantillons
+
+        gyro : tableau (n, 3) en °/s
+        acc : tableau (n, 3) en g
+        timestamps : tableau (n,) en µs ou None (pas nominal)
+
+        retourne un tableau (n, 4) de quaternions (x, y, z, w)
+        """
+        gyro = np.asarray(gyro, dtype=np.float64).reshape(-1, 3)
+        acc = np.asarray(acc, dtype=np.float64).reshape(-1, 3)
+        nb_sample = gyro.shape[0]
+        if nb_sample == 0:
+            return np.empty((0, 4))
+        dt = self._dt(timestamps, nb_sample)
+        acc, valide = self._acc_normalisee(acc)
+        sortie = self._boucle(np.radians(gyro), acc, valide, dt)
+        quat = np.array(sortie, dtype=np.float64).reshape(-1, 4)
+        # stockage (w, x, y, z) dans la boucle -> (x, y, z, w) en sortie
+        return quat[:, [1, 2, 3, 0]]
+
+    def update_listener_data(self, data_gyro, data_acc):
+        """
+        traitement direct des listes renvoyées par MyListener
+        """
+        timestamps, gyro = to_arrays(data_gyro)
+        _, acc = to_arrays(data_acc)
+        return self.update_block(gyro, acc, timestamps)
+
+
+class MadgwickFilter(_ImuFilter):
+    """
+    filtre de Madgwick (descente de gradient), version IMU sans magnétomètre
+
+    beta règle le compromis entre la confiance dans le gyroscope
+    et la correction par l'accéléromètre
+    """
+    def __init__(self, beta=0.1, freq=FREQ_IMU):
+        super(MadgwickFilter, self).__init__(freq)
+        self.beta = beta
+
+    def _boucle(self, gyro, acc, valide, dt):
+        """
+        récurrence du filtre sur des flottants python
+        """
+        # demi-vitesse angulaire et gain multipliés par le pas en amont :
+        # la boucle ajoute directement l'incrément du quaternion
+        gyro = (gyro * (0.5 * dt)[:, None]).T.tolist()
+        beta_dt = (self.beta * dt).tolist()
+        sqrt = math.sqrt
+        q1, q2, q3, q0 = self.quat
+        sortie = []
+        ajout = sortie.extend
+        for gx, gy, gz, ax, ay, az, ok, gain in zip(*gyro, *acc.T.tolist(),
+                                                    valide.tolist(),
+                                                    beta_dt):
+            # incrément du quaternion d'après le gyroscope
+            d0 = -q1 * gx - q2 * gy - q3 * gz
+            d1 = q0 * gx + q2 * gz - q3 * gy
+            d2 = q0 * gy - q1 * gz + q3 * gx
+            d3 = q0 * gz + q1 * gy - q2 * gx
+            if ok:
+                # correction par descente de gradient
+                f_z = 1.0 - 2.0 * (q1 * q1 + q2 * q2) - az
+                f_x = 2.0 * (q1 * q3 - q0 * q2) - ax
+                f_y = 2.0 * (q0 * q1 + q2 * q3) - ay
+                s0 = q1 * f_y - q2 * f_x
+                s1 = q3 * f_x + q0 * f_y - 2.0 * q1 * f_z
+                s2 = q3 * f_y - q0 * f_x - 2.0 * q2 * f_z
+                s3 = q1 * f_x + q2 * f_y
+                norme = s0 * s0 + s1 * s1 + s2 * s2 + s3 * s3
+                if norme > 0.0:
+                    norme = gain / sqrt(norme)
+                    d0 -= norme * s0
+                    d1 -= norme * s1
+                    d2 -= norme * s2
+                    d3 -= norme * s3
+            q0 += d0
+            q1 += d1
+            q2 += d2
+            q3 += d3
+            norme = 1.0 / sqrt(q0 * q0 + q1 * q1 + q2 * q2 + q3 * q3)
+            q0 *= norme
+            q1 *= norme
+            q2 *= norme
+            q3 *= norme
+            ajout((q0, q1, q2, q3))
+        self.quat = [q1, q2, q3, q0]
+        return sortie
+
+
+class MahonyFilter(_ImuFilter):
+    """
+    filtre complémentaire de Mahony (correcteur proportionnel intégral)
+
+    k_p : gain proportionnel, k_i : gain intégral (compensation du biais
+    du gyroscope)
+    """
+    def __init__(self, k_p=1.0, k_i=0.0, freq=FREQ_IMU):
+        super(MahonyFilter, self).__init__(freq)
+        self.k_p = k_p
+        self.k_i = k_i
+        self.integral = [0.0, 0.0, 0.0]  # terme intégral de la correction
+
+    def reset(self, quat=None):
+        super(MahonyFilter, self).reset(quat)
+        self.integral = [0.0, 0.0, 0.0]
+
+    def _boucle(self, gyro, acc, valide, dt):
+        """
+        récurrence du filtre sur des flottants python
+        """
+        # demi-pas et demi-vitesse angulaire multipliée par le pas calculés
+        # en amont
+        demi_pas = 0.5 * dt
+        gyro = (gyro * demi_pas[:, None]).T.tolist()
+        two_kp = 2.0 * self.k_p
+        two_ki = 2.0 * self.k_i
+        sqrt = math.sqrt
+        q1, q2, q3, q0 = self.quat
+        ix, iy, iz = self.integral
+        sortie = []
+        ajout = sortie.extend
+        for gx, gy, gz, ax, ay, az, ok, pas, demi in zip(
+                *gyro, *acc.T.tolist(), valide.tolist(), dt.tolist(),
+                demi_pas.tolist()):
+            if ok:
+                # direction estimée de la gravité
+                vx = q1 * q3 - q0 * q2
+                vy = q0 * q1 + q2 * q3
+                vz = q0 * q0 - 0.5 + q3 * q3
+                # erreur : produit vectoriel mesure / estimation
+                ex = ay * vz - az * vy
+                ey = az * vx - ax * vz
+                ez = ax * vy - ay * vx
+                if two_ki > 0.0:
+                    ix += two_ki * ex * pas
+                    iy += two_ki * ey * pas
+                    iz += two_ki * ez * pas
+                gx += demi * (two_kp * ex + ix)
+                gy += demi * (two_kp * ey + iy)
+                gz += demi * (two_kp * ez + iz)
+            qa, qb, qc = q0, q1, q2
+            q0 += -qb * gx - qc * gy - q3 * gz
+            q1 += qa * gx + qc * gz - q3 * gy
+            q2 += qa * gy - qb * gz + q3 * gx
+            q3 += qa * gz + qb * gy - qc * gx
+            norme = 1.0 / sqrt(q0 * q0 + q1 * q1 + q2 * q2 + q3 * q3)
+            q0 *= norme
+            q1 *= norme
+            q2 *= norme
+            q3 *= norme
+            ajout((q0, q1, q2, q3))
+        self.quat = [q1, q2, q3, q0]
+        self.integral = [ix, iy, iz]
+        return sortie
+
+
+def benchmark(duree=3600.0, freq=FREQ_IMU):
+    """
+    mesure du temps de traitement de ``duree`` secondes de données IMU
+
+    la récurrence en python fixe l'ordre de grandeur : une heure de données
+    (180 000 échantillons) prend de l'ordre de 0,3 à 0,6 s par filtre selon
+    le poste, Madgwick étant le plus coûteux
+    """
+    from time import perf_counter
+    nb_sample = int(duree * freq)
+    temps = np.arange(nb_sample) / freq
+    gyro = np.column_stack((30.0 * np.sin(temps), 10.0 * np.cos(temps),
+                            np.full(nb_sample, 0.5)))
+    acc = np.column_stack((np.zeros(nb_sample), np.zeros(nb_sample),
+                           np.ones(nb_sample)))
+    timestamps = temps * 1e6
+    resultats = {}
+    for filtre in (MadgwickFilter(), MahonyFilter(k_i=0.1)):
+        debut = perf_counter()
+        quat = filtre.update_block(gyro, acc, timestamps)
+        linear_acceleration(quat, acc)
+        resultats[type(filtre).__name__] = perf_counter() - debut
+    return nb_sample, resultats
+
+
+if __name__ == '__main__':
+    # une heure de données à 50 Hz
+    NB_SAMPLE, RESULTATS = benchmark()
+    for NOM, DUREE in RESULTATS.items():
+        print(f'{NOM} : {NB_SAMPLE} échantillons en {DUREE:.3f} s '
+              f'({NB_SAMPLE / DUREE:.0f} éch/s)')
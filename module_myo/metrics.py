@@ -0,0 +1,251 @@
+# -*- coding: utf-8 -*-
+"""
+Métriques des postes d'acquisition au format texte Prometheus
+
+``MetricsCollector`` rassemble compteurs et jauges de l'application :
+
+    myo_samples_received_total    échantillons reçus (bracelet, flux)
+    myo_samples_dropped_total     échantillons perdus (trous de timestamps)
+    myo_samples_overflow_total    échantillons écrasés avant lecture
+    myo_samples_late_total        échantillons en retard ou en double
+    myo_connected                 bracelet connecté (0 ou 1)
+    myo_battery_percent           niveau de batterie
+    myo_rssi                      dernière force du signal bluetooth
+    myo_tick_seconds              durée d'un rafraîchissement de l'interface
+                                  (quantiles 0.5, 0.9, 0.99, somme, nombre)
+    myo_history_samples           échantillons conservés par l'interface
+    myo_history_bytes             mémoire occupée par ces échantillons
+    myo_history_trimmed_total     échantillons retirés de la mémoire
+    process_resident_memory_bytes mémoire résidente du processus (psutil)
+
+``MetricsExporter`` les publie sans passer par le thread de l'interface :
+sur un port HTTP local (``GET /metrics``, lu à chaque requête) et/ou dans un
+fichier réécrit toutes les interval secondes (écriture dans un fichier
+temporaire puis renommage : un lecteur ne voit jamais un fichier partiel,
+compatible avec le collecteur textfile de node_exporter). Le seul travail
+laissé au thread de l'interface est ``observe_tick``, un ajout en O(1).
+"""
+
+from http.server import BaseHTTPRequestHandler, HTTPServer
+import os
+import socketserver
+from threading import Event, Lock, Thread
+import psutil
+from module_myo.acquisition_process import RemoteListener
+from module_myo.profiling import RollingHistogram
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+QUANTILES = (0.5, 0.9, 0.99)
+# compteurs de pertes exportés : (clé de StreamCounter.snapshot, métrique)
+STREAM_COUNTERS = (('received', 'myo_samples_received_total',
+                    'échantillons reçus'),
+                   ('dropped', 'myo_samples_dropped_total',
+                    'échantillons perdus (trous de timestamps)'),
+                   ('overflow', 'myo_samples_overflow_total',
+                    'échantillons écrasés avant lecture'),
+                   ('late', 'myo_samples_late_total',
+                    'échantillons en retard ou en double'))
+# DataFrame de la fenêtre principale par flux
+HISTORY = {'emg': 'data_emg', 'orientation': 'data_ori',
+           'acceleration': 'data_acc', 'gyroscope': 'data_gyro'}
+
+
+def _last_rssi(listener):
+    if isinstance(listener, RemoteListener):
+        # la propriété rssi_data_queue lit le tampon partagé : réservée au
+        # thread de l'interface
+        rssi = listener._rssi
+    else:
+        rssi = listener.rssi_data_queue
+    return rssi[-1] if rssi else None
+
+
+class MetricsCollector(object):
+    """
+    compteurs et jauges des bracelets et de l'interface
+
+    listeners : liste des listeners (un par bracelet)
+    window : fenêtre principale (historique des données), optionnelle
+    """
+    def __init__(self, listeners, window=None):
+        self.listeners = listeners
+        self.window = window
+        self.process = psutil.Process()
+        self.lock = Lock()  # observe_tick et collect dans deux threads
+        self.ticks = RollingHistogram(window=1000)
+        self.tick_count = 0
+        self.tick_sum = 0.0
+
+    def observe_tick(self, duration):
+        """
+        durée (s) d'un rafraîchissement de l'interface
+        """
+        with self.lock:
+            self.ticks.add(duration)
+            self.tick_count += 1
+            self.tick_sum += duration
+
+    def collect(self):
+        """
+        liste des métriques (nom, type, aide, [(étiquettes, valeur)])
+        """
+        metriques = []
+        stats = [(str(slot), listener.get_stream_stats())
+                 for slot, listener in enumerate(self.listeners)]
+        for cle, nom, aide in STREAM_COUNTERS:
+            metriques.append((nom, 'counter', aide, [
+                ({'slot': slot, 'stream': flux}, valeurs[cle])
+                for slot, flux_stats in stats
+                for flux, valeurs in flux_stats.items()]))
+        for nom, aide, lecture in (
+                ('myo_connected', 'bracelet connecté',
+                 lambda listener: int(bool(listener.connected))),
+                ('myo_battery_percent', 'niveau de batterie',
+                 lambda listener: listener.battery_level),
+                ('myo_rssi', 'dernière force du signal bluetooth',
+                 _last_rssi)):
+            metriques.append((nom, 'gauge', aide, [
+                ({'slot': str(slot)}, lecture(listener))
+                for slot, listener in enumerate(self.listeners)]))
+        with self.lock:
+            quantiles = [({'quantile': str(quantile)},
+                          self.ticks.percentile(100 * quantile))
+                         for quantile in QUANTILES]
+            count, total = self.tick_count, self.tick_sum
+        metriques.append(('myo_tick_seconds', 'summary',
+                          "durée d'un rafraîchissement de l'interface",
+                          quantiles + [({'__suffix': '_sum'}, total),
+                                       ({'__suffix': '_count'}, count)]))
+        if self.window is not None:
+            metriques.append((
+                'myo_history_samples', 'gauge',
+                "échantillons conservés par l'interface",
+                [({'stream': flux}, len(getattr(self.window, attribut)))
+                 for flux, attribut in HISTORY.items()
+                 if getattr(self.window, attribut, None) is not None]))
+            historique = getattr(self.window, 'history', None)
+            if historique is not None:
+                metriques.append(('myo_history_bytes', 'gauge',
+                                  "mémoire occupée par l'historique",
+                                  [({}, historique.memory_bytes)]))
+                metriques.append(('myo_history_trimmed_total', 'counter',
+                                  "échantillons retirés de l'historique",
+                                  [({}, historique.nb_trimmed)]))
+        metriques.append(('process_resident_memory_bytes', 'gauge',
+                          'mémoire résidente du processus',
+                          [({}, self.process.memory_info().rss)]))
+        return metriques
+
+
+def _format_value(value):
+    if value is None:
+        return 'NaN'
+    if isinstance(value, float):
+        return repr(value)
+    return str(int(value))
+
+
+def format_prometheus(metrics):
+    """
+    mise en forme des métriques au format d'exposition texte Prometheus
+    """
+    lignes = []
+    for nom, genre, aide, echantillons in metrics:
+        lignes.append(f'# HELP {nom} {aide}')
+        lignes.append(f'# TYPE {nom} {genre}')
+        for etiquettes, valeur in echantillons:
+            etiquettes = dict(etiquettes)
+            suffixe = etiquettes.pop('__suffix', '')
+            texte = ','.join('{}="{}"'.format(
+                cle, str(val).replace('\\', r'\\').replace('"', r'\"'))
+                             for cle, val in etiquettes.items())
+            lignes.append(f'{nom}{suffixe}'
+                          + (f'{{{texte}}}' if texte else '')
+                          + f' {_format_value(valeur)}')
+    return '\n'.join(lignes) + '\n'
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    """
+    GET /metrics : métriques lues au moment de la requête
+    """
+    def do_GET(self):
+        if self.path.split('?')[0] not in ('/', '/metrics'):
+            self.send_error(404)
+            return
+        corps = format_prometheus(self.server.collector.collect())
+        corps = corps.encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', CONTENT_TYPE)
+        self.send_header('Content-Length', str(len(corps)))
+        self.end_headers()
+        self.wfile.write(corps)
+
+    def log_message(self, *_):  # pas de journal sur la console
+        pass
+
+
+class _ThreadingHTTPServer(socketserver.ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+class MetricsExporter(object):
+    """
+    publication des métriques par HTTP et/ou dans un fichier, chacun dans
+    son propre thread
+
+    port : port HTTP local (None : pas de serveur)
+    path : fichier réécrit toutes les interval secondes (None : pas de
+    fichier)
+    """
+    def __init__(self, collector, port=None, path=None, interval=10.0,
+                 host='127.0.0.1'):
+        self.collector = collector
+        self.path = path
+        self.interval = interval
+        self.server = None
+        self.threads = []
+        self.stop_event = Event()
+        self.nb_write = 0
+        if port is not None:
+            self.server = _ThreadingHTTPServer((host, port), _MetricsHandler)
+            self.server.collector = collector
+            self.threads.append(Thread(target=self.server.serve_forever,
+                                       daemon=True))
+        if path is not None:
+            self.threads.append(Thread(target=self._write_loop, daemon=True))
+
+    @property
+    def address(self):
+        return self.server.server_address if self.server else None
+
+    def write(self):
+        """
+        écriture atomique des métriques dans le fichier path
+        """
+        temporaire = f'{self.path}.{os.getpid()}.tmp'
+        with open(temporaire, 'w', encoding='utf-8') as fichier:
+            fichier.write(format_prometheus(self.collector.collect()))
+        os.replace(temporaire, self.path)
+        self.nb_write += 1
+
+    def _write_loop(self):
+        while True:
+            self.write()
+            if self.stop_event.wait(self.interval):
+                break
+        self.write()  # état à l'arrêt
+
+    def start(self):
+        for thread in self.threads:
+            thread.start()
+
+    def stop(self):
+        self.stop_event.set()
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+        for thread in self.threads:
+            if thread.is_alive():
+                thread.join()
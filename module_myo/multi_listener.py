@@ -0,0 +1,105 @@
+# -*- coding: utf-8 -*-
+"""
+Écoute de plusieurs myo arm simultanément
+
+Comme dans l'exemple ``multiple-myos`` du SDK, chaque bracelet est identifié
+par le pointeur de son device (unique et stable pendant la session). Chaque
+bracelet se voit attribuer un emplacement (0, 1, 2...) dans l'ordre
+d'appareillage et possède son propre ``MyListener`` : files, horloge et
+compteurs de pertes sont donc séparés par bracelet.
+"""
+
+from threading import Lock
+import numpy as np
+import myo
+from module_myo import my_myo_arm_band
+
+
+def device_key(event):
+    """
+    identité du myo associé à un évènement
+
+    le pointeur libmyo d'un myo est unique : deux évènements d'un même
+    bracelet renvoient le même pointeur
+    """
+    return event.device.handle
+
+
+class MultiListener(myo.DeviceListener):
+    """
+    classe en écoute de plusieurs myo, un MyListener par bracelet
+
+    nb_myo : nombre de bracelets attendus (les emplacements sont créés
+    d'avance pour que l'interface puisse s'y référer avant la connexion)
+    """
+    def __init__(self, nb_myo=1, queue_size=256):
+        self.lock = Lock()  # protège l'attribution des emplacements
+        self.listeners = [my_myo_arm_band.MyListener(queue_size)
+                          for _ in range(nb_myo)]
+        self.slots = {}  # identité du myo -> indice de l'emplacement
+        # curseurs de lecture des EMG de get_new_emg_data, par emplacement
+        self.emg_cursors = [0] * nb_myo
+
+    @property
+    def nb_myo(self):
+        """
+        nombre d'emplacements
+        """
+        return len(self.listeners)
+
+    @property
+    def primary(self):
+        """
+        listener du premier bracelet appareillé
+        """
+        return self.listeners[0]
+
+    def slot(self, event):
+        """
+        emplacement du myo associé à l'évènement (attribué à la première
+        rencontre), None si tous les emplacements sont occupés
+        """
+        cle = device_key(event)
+        indice = self.slots.get(cle)
+        if indice is None:
+            with self.lock:
+                if len(self.slots) >= self.nb_myo:
+                    return None
+                indice = self.slots.setdefault(cle, len(self.slots))
+        return indice
+
+    def on_event(self, event):
+        """
+        aiguillage de l'évènement vers le listener du bracelet concerné
+        """
+        indice = self.slot(event)
+        if indice is not None:
+            self.listeners[indice].on_event(event)
+
+    def connected_listeners(self):
+        """
+        liste des (emplacement, listener) des bracelets connectés
+        """
+        return [(indice, listener)
+                for indice, listener in enumerate(self.listeners)
+                if listener.connected]
+
+    def get_new_emg_data(self, indice):
+        """
+        EMG du bracelet indice reçus depuis le dernier appel, sous forme de
+        deux tableaux (timestamps (n,), emg (n, 8))
+        """
+        data, self.emg_cursors[indice], _ = self.listeners[
+            indice].read_stream('emg', self.emg_cursors[indice])
+        if not data:
+            return np.empty(0), np.empty((0, 8))
+        return (np.array([timestamp for timestamp, _ in data],
+                         dtype=np.float64),
+                np.array([tuple(emg) for _, emg in data], dtype=np.float64))
+
+    def request_rssi(self):
+        """
+        demande de la force du signal bluetooth à chaque bracelet connecté
+        """
+        for _, listener in self.connected_listeners():
+            listener.device.request_rssi()
@@ -8,22 +8,49 @@ Ce code permet de récupérer un maximum d'informations issues d'un myo arm
 """
 
 from collections import deque
-from threading import Lock
+from time import perf_counter
 import myo
+from module_myo import clock, spsc, stream_stats
+from module_myo.fanout import EMG_STREAMS, IMU_STREAMS
 
 
 class MyListener(myo.DeviceListener):
     """
     classe en écoute d'un myo
+
+    chaque flux est rangé dans un tampon sans verrou (SpscRing) : le callback
+    du SDK n'est jamais bloqué par la lecture des données. Les méthodes
+    get_*_data renvoient les échantillons arrivés depuis leur dernier appel ;
+    un autre lecteur peut utiliser read_stream avec son propre curseur.
     """
-    def __init__(self, queue_size=8):
-        self.lock = Lock()  # verrouille le thread pour lecture des donnees
-        # création de listes optimisées pour seulement ajouter des éléments
-        self.emg_data_queue = deque(maxlen=queue_size)
-        self.orientation_data_queue = deque(maxlen=queue_size)
-        self.acceleration_data_queue = deque(maxlen=queue_size)
-        self.gyroscope_data_queue = deque(maxlen=queue_size)
+    def __init__(self, queue_size=256):
+        # un tampon par flux, écrit uniquement par le callback du SDK
+        self.emg_data_queue = spsc.SpscRing(queue_size)
+        self.orientation_data_queue = spsc.SpscRing(queue_size)
+        self.acceleration_data_queue = spsc.SpscRing(queue_size)
+        self.gyroscope_data_queue = spsc.SpscRing(queue_size)
+        self.queues = {'emg': self.emg_data_queue,
+                       'orientation': self.orientation_data_queue,
+                       'acceleration': self.acceleration_data_queue,
+                       'gyroscope': self.gyroscope_data_queue}
+        # curseurs de lecture des méthodes get_*_data
+        self.cursors = dict.fromkeys(self.queues, 0)
+        # deque : ajout et copie atomiques, pas besoin de verrou
         self.rssi_data_queue = deque(maxlen=100)
+        # fonctions de contre-pression appelées avec les noms des flux avant
+        # chaque écriture (une par ListenerFanout ayant des abonnements
+        # bloquants, cf. fanout)
+        self.before_append = []
+        # fonctions appelées avec les noms des flux après chaque écriture
+        self.data_callbacks = []
+        # correspondance horloge myo -> horloge hôte pour chaque flux
+        self.emg_clock = clock.ClockMapper(freq=200.0)
+        self.imu_clock = clock.ClockMapper(freq=50.0)
+        # compteurs de pertes (trous de timestamps et débordement des files)
+        self.counters = {'emg': stream_stats.StreamCounter(freq=200.0),
+                         'orientation': stream_stats.StreamCounter(freq=50.0),
+                         'acceleration': stream_stats.StreamCounter(freq=50.0),
+                         'gyroscope': stream_stats.StreamCounter(freq=50.0)}
         # initialisation d'attribut
         self.pose = myo.Pose.rest  # pose quelconque
         self.connected = False  # non connecté
@@ -133,21 +160,25 @@ class MyListener(myo.DeviceListener):
             c) accéléromètre
             d) associé à un timestamp
         """
-        with self.lock:
-            self.orientation_data_queue.append((event.timestamp,
-                                                event.orientation))
-            self.gyroscope_data_queue.append((event.timestamp,
-                                              event.gyroscope))
-            self.acceleration_data_queue.append((event.timestamp,
-                                                 event.acceleration))
+        reception = perf_counter()  # instant de réception côté hôte
+        timestamp = event.timestamp
+        self.imu_clock.update(timestamp, reception)
+        for nom in IMU_STREAMS:
+            self.counters[nom].on_sample(timestamp)
+        for attente in self.before_append:
+            attente(IMU_STREAMS)
+        self.orientation_data_queue.append((timestamp, event.orientation))
+        self.gyroscope_data_queue.append((timestamp, event.gyroscope))
+        self.acceleration_data_queue.append((timestamp, event.acceleration))
+        for callback in self.data_callbacks:
+            callback(IMU_STREAMS)
 
     def on_rssi(self, event):
         """
         méthode appelée suite à la réponse d'une requête "request_rssi()"
         """
-        with self.lock:
-            # mise à jour de la liste
-            self.rssi_data_queue.append(-event.rssi)
+        # mise à jour de la liste
+        self.rssi_data_queue.append(-event.rssi)
 
     def on_battery_level(self, event):
         """
@@ -160,9 +191,14 @@ class MyListener(myo.DeviceListener):
         méthode appelée pour réceptionner les données EMG
         avec son timestamp
         """
-        with self.lock:
-            self.emg_data_queue.append((event.timestamp,
-                                        event.emg))
+        reception = perf_counter()  # instant de réception côté hôte
+        self.emg_clock.update(event.timestamp, reception)
+        self.counters['emg'].on_sample(event.timestamp)
+        for attente in self.before_append:
+            attente(EMG_STREAMS)
+        self.emg_data_queue.append((event.timestamp, event.emg))
+        for callback in self.data_callbacks:
+            callback(EMG_STREAMS)
 
     def on_warmup_completed(self, event):
         """
@@ -176,33 +212,78 @@ class MyListener(myo.DeviceListener):
         event.device.stream_emg(True)  # lancement de l'acquisition EMG
         self.emg_enabled = True  # mise à jour du flag
 
+    def read_stream(self, stream, cursor):
+        """
+        méthode pour lire un flux avec son propre curseur
+
+        retourne (échantillons, nouveau curseur, nombre d'échantillons
+        écrasés avant d'avoir été lus)
+        """
+        return self.queues[stream].read(cursor)
+
+    def _get(self, stream):
+        """
+        lecture d'un flux avec le curseur des méthodes get_*_data
+        """
+        data, self.cursors[stream], perdus = self.queues[stream].read(
+            self.cursors[stream])
+        if perdus:
+            # le tampon a débordé avant lecture
+            self.counters[stream].on_overflow(perdus)
+        return data
+
     def get_emg_data(self):
         """
         méthode pour récupérer les données EMGs
         """
-        with self.lock:
-            return list(self.emg_data_queue)
+        return self._get('emg')
 
     def get_orientation_data(self):
         """
         méthode pour récupérer les données d'orientation
         """
-        with self.lock:
-            return list(self.orientation_data_queue)
+        return self._get('orientation')
 
     def get_gyroscope_data(self):
         """
         méthode pour récupérer les données du gyroscope
         """
-        with self.lock:
-            return list(self.gyroscope_data_queue)
+        return self._get('gyroscope')
 
     def get_acceleration_data(self):
         """
         méthode pour récupérer les données de l'accéléromètre
         """
-        with self.lock:
-            return list(self.acceleration_data_queue)
+        return self._get('acceleration')
+
+    def get_stream_stats(self):
+        """
+        méthode pour récupérer les compteurs de chaque flux
+        (reçus, perdus, en retard, débordés)
+        """
+        return {nom: compteur.snapshot()
+                for nom, compteur in self.counters.items()}
+
+    def reset_stream_stats(self):
+        """
+        remise à zéro des compteurs de chaque flux
+        """
+        for compteur in self.counters.values():
+            compteur.reset()
+
+    def get_clock_stats(self):
+        """
+        méthode pour récupérer le modèle d'horloge et la gigue de chaque flux
+        """
+        return {'emg': self.emg_clock.jitter_stats(),
+                'imu': self.imu_clock.jitter_stats()}
+
+    def to_host_time(self, timestamps, stream='emg'):
+        """
+        conversion de timestamps myo (µs) en instants hôte (perf_counter)
+        """
+        horloge = self.emg_clock if stream == 'emg' else self.imu_clock
+        return horloge.to_host(timestamps)
 
 
 if __name__ == '__main__':
@@ -216,5 +297,5 @@ if __name__ == '__main__':
     LISTENER = MyListener()
     with HUB.run_in_background(LISTENER.on_event):
         while True:
-            print(LISTENER.emg_data_queue)
+            print(LISTENER.get_emg_data())
             sleep(0.02)
@@ -0,0 +1,462 @@
+# -*- coding: utf-8 -*-
+"""
+Diffusion des flux d'un MyListener sur le réseau local (TCP et UDP)
+
+Les autres processus du poste (Unity, MATLAB, pilotage...) reçoivent les
+flux sans se connecter eux-mêmes au bracelet. Chaque trame regroupe les
+échantillons d'un flux arrivés depuis la trame précédente :
+
+    en-tête (12 octets, petit-boutiste, cf. HEADER) :
+        magic b'MY', version, code du flux (indice dans STREAMS),
+        nombre de voies, code du type des valeurs (indice dans DTYPES),
+        nombre d'échantillons, numéro du premier échantillon (modulo 2**32)
+    timestamps : nb_sample entiers int64 (µs, horloge du myo)
+    valeurs : nb_sample x nb_channel (int8 pour les EMG, float32 sinon)
+
+Le numéro du premier échantillon permet au client de détecter les pertes.
+Chaque trame n'est encodée qu'une fois puis copiée dans le tampon d'envoi
+de chaque client TCP ; quand ce tampon dépasse max_buffer, le serveur
+abandonne les trames les plus anciennes ('drop_oldest') ou déconnecte le
+client ('disconnect'). Un client UDP s'inscrit en envoyant un datagramme
+quelconque au port UDP (à renouveler avant udp_timeout, b'bye' pour se
+désinscrire) et reçoit une trame par datagramme.
+
+Lancé directement, ce module mesure le débit et la latence de clients
+locaux sur un bracelet simulé.
+"""
+
+from collections import deque
+import selectors
+import socket
+import struct
+from threading import Thread
+from time import perf_counter
+import numpy as np
+from module_myo.fanout import ListenerFanout
+
+HEADER = struct.Struct('<2sBBBBHI')
+MAGIC = b'MY'
+VERSION = 1
+STREAMS = ('emg', 'orientation', 'acceleration', 'gyroscope')
+NB_CHANNEL = {'emg': 8, 'orientation': 4, 'acceleration': 3, 'gyroscope': 3}
+DTYPES = ('<i1', '<f4')
+STREAM_DTYPE = {'emg': 0, 'orientation': 1, 'acceleration': 1,
+                'gyroscope': 1}
+POLICIES = ('drop_oldest', 'disconnect')
+
+
+def encode_frame(stream, sequence, items):
+    """
+    trame d'un flux à partir d'une liste de (timestamp, valeurs)
+    """
+    code_type = STREAM_DTYPE[stream]
+    nb_channel = NB_CHANNEL[stream]
+    timestamps = np.array([timestamp for timestamp, _ in items], dtype='<i8')
+    valeurs = np.array([tuple(valeur) for _, valeur in items],
+                       dtype=DTYPES[code_type])
+    return (HEADER.pack(MAGIC, VERSION, STREAMS.index(stream), nb_channel,
+                        code_type, len(items), sequence & 0xFFFFFFFF)
+            + timestamps.tobytes() + valeurs.tobytes())
+
+
+def frame_size(header):
+    """
+    taille totale (octets) d'une trame d'après son en-tête
+    """
+    magic, _, _, nb_channel, code_type, nb_sample, _ = HEADER.unpack_from(
+        header)
+    if magic != MAGIC:
+        raise ValueError('trame invalide : en-tête inconnu')
+    taille = np.dtype(DTYPES[code_type]).itemsize
+    return HEADER.size + nb_sample * (8 + nb_channel * taille)
+
+
+def decode_frame(frame):
+    """
+    décodage d'une trame
+
+    retourne (flux, numéro du premier échantillon, timestamps (n,),
+    valeurs (n, nb_channel))
+    """
+    (magic, _, code_flux, nb_channel, code_type, nb_sample,
+     sequence) = HEADER.unpack_from(frame)
+    if magic != MAGIC:
+        raise ValueError('trame invalide : en-tête inconnu')
+    timestamps = np.frombuffer(frame, dtype='<i8', count=nb_sample,
+                               offset=HEADER.size)
+    valeurs = np.frombuffer(frame, dtype=DTYPES[code_type],
+                            count=nb_sample * nb_channel,
+                            offset=HEADER.size + 8 * nb_sample)
+    return (STREAMS[code_flux], sequence, timestamps,
+            valeurs.reshape(nb_sample, nb_channel))
+
+
+class FrameReader(object):
+    """
+    découpage en trames des octets reçus sur une connexion TCP
+    """
+    def __init__(self):
+        self.buffer = bytearray()
+
+    def feed(self, data):
+        """
+        ajout d'octets reçus, retourne la liste des trames complètes décodées
+        """
+        self.buffer += data
+        trames = []
+        while len(self.buffer) >= HEADER.size:
+            taille = frame_size(self.buffer)
+            if len(self.buffer) < taille:
+                break
+            trames.append(decode_frame(bytes(self.buffer[:taille])))
+            del self.buffer[:taille]
+        return trames
+
+
+class _Client(object):
+    """
+    client TCP et son tampon d'envoi
+    """
+    def __init__(self, sock, address, max_buffer, policy):
+        self.sock = sock
+        self.address = address
+        self.max_buffer = max_buffer
+        self.policy = policy
+        self.frames = deque()  # trames en attente d'envoi
+        self.offset = 0  # octets déjà envoyés de la première trame
+        self.size = 0  # octets en attente
+        self.dropped_frames = 0
+        self.sent_bytes = 0
+
+    def push(self, frame):
+        """
+        ajout d'une trame, False si le client doit être déconnecté
+        """
+        self.frames.append(frame)
+        self.size += len(frame)
+        while self.size > self.max_buffer and len(self.frames) > 1:
+            if self.policy == 'disconnect':
+                return False
+            # une trame commencée doit être envoyée en entier
+            indice = 1 if self.offset else 0
+            self.size -= len(self.frames[indice])
+            del self.frames[indice]
+            self.dropped_frames += 1
+        return True
+
+    def flush(self):
+        """
+        envoi non bloquant du tampon, False si la connexion est perdue
+        """
+        while self.frames:
+            trame = self.frames[0]
+            try:
+                envoyes = self.sock.send(memoryview(trame)[self.offset:])
+            except BlockingIOError:
+                return True
+            except OSError:
+                return False
+            self.offset += envoyes
+            self.size -= envoyes
+            self.sent_bytes += envoyes
+            if self.offset < len(trame):
+                return True
+            self.frames.popleft()
+            self.offset = 0
+        return True
+
+
+class StreamServer(object):
+    """
+    serveur de flux d'un MyListener, dans son propre thread
+
+    port : port TCP (0 : choisi par le système, cf. address)
+    udp_port : port UDP (None : pas de diffusion UDP)
+    max_buffer : taille maximale (octets) du tampon d'envoi d'un client TCP
+    policy : comportement quand ce tampon est plein (cf. POLICIES)
+    max_sample : nombre maximal d'échantillons par trame
+    """
+    def __init__(self, listener, host='127.0.0.1', port=5555, udp_port=None,
+                 streams=STREAMS, max_buffer=1 << 20, policy='drop_oldest',
+                 max_sample=256, udp_timeout=10.0):
+        if policy not in POLICIES:
+            raise ValueError(f'politique inconnue : {policy} '
+                             f'(choix : {POLICIES})')
+        self.listener = listener
+        self.max_buffer = max_buffer
+        self.policy = policy
+        self.max_sample = max_sample
+        self.udp_timeout = udp_timeout
+        self.fanout = ListenerFanout(listener)
+        self.subscriptions = {stream: self.fanout.subscribe(stream)
+                              for stream in streams}
+        self.clients = {}  # socket -> _Client
+        self.udp_clients = {}  # adresse -> instant du dernier datagramme
+        self.nb_frame = 0
+        self.nb_byte = 0
+        self.selector = selectors.DefaultSelector()
+        self.tcp = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.tcp.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.tcp.bind((host, port))
+        self.tcp.listen()
+        self.tcp.setblocking(False)
+        self.selector.register(self.tcp, selectors.EVENT_READ, self._accept)
+        self.udp = None
+        if udp_port is not None:
+            self.udp = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            self.udp.bind((host, udp_port))
+            self.udp.setblocking(False)
+            self.selector.register(self.udp, selectors.EVENT_READ,
+                                   self._read_udp)
+        # réveil du thread par le callback du SDK
+        self._wake_r, self._wake_w = socket.socketpair()
+        self._wake_r.setblocking(False)
+        self._wake_w.setblocking(False)
+        self._wake_pending = False
+        self.selector.register(self._wake_r, selectors.EVENT_READ,
+                               self._read_wake)
+        self.running = False
+        self.thread = Thread(target=self._serve, daemon=True)
+
+    @property
+    def address(self):
+        return self.tcp.getsockname()
+
+    @property
+    def udp_address(self):
+        return None if self.udp is None else self.udp.getsockname()
+
+    def start(self):
+        self.running = True
+        self.listener.data_callbacks.append(self._on_data)
+        self.thread.start()
+
+    def stop(self):
+        """
+        arrêt du serveur et fermeture des connexions
+        """
+        if self._on_data in self.listener.data_callbacks:
+            self.listener.data_callbacks.remove(self._on_data)
+        self.running = False
+        self._wake()
+        if self.thread.is_alive():
+            self.thread.join()
+        for client in list(self.clients.values()):
+            self._drop_client(client)
+        for abonnement in self.subscriptions.values():
+            abonnement.close()
+        for sock in (self.tcp, self.udp, self._wake_r, self._wake_w):
+            if sock is not None:
+                sock.close()
+        self.selector.close()
+
+    def _on_data(self, streams):
+        """
+        appelée par le callback du SDK : un seul réveil en attente à la fois
+        """
+        if not self._wake_pending:
+            self._wake_pending = True
+            self._wake()
+
+    def _wake(self):
+        try:
+            self._wake_w.send(b'\0')
+        except OSError:
+            pass  # tampon plein : un réveil est déjà en attente
+
+    def _read_wake(self, sock, _):
+        # remis à zéro avant la lecture des flux pour ne rater aucun réveil
+        self._wake_pending = False
+        try:
+            sock.recv(4096)
+        except OSError:
+            pass
+
+    def _accept(self, sock, _):
+        try:
+            connexion, adresse = sock.accept()
+        except OSError:
+            return
+        connexion.setblocking(False)
+        connexion.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        client = _Client(connexion, adresse, self.max_buffer, self.policy)
+        self.clients[connexion] = client
+        self.selector.register(connexion, selectors.EVENT_READ,
+                               self._client_event)
+
+    def _read_udp(self, sock, _):
+        while True:
+            try:
+                message, adresse = sock.recvfrom(64)
+            except OSError:
+                return
+            if message == b'bye':
+                self.udp_clients.pop(adresse, None)
+            else:
+                self.udp_clients[adresse] = perf_counter()
+
+    def _client_event(self, sock, mask):
+        client = self.clients[sock]
+        if mask & selectors.EVENT_READ:
+            try:
+                message = sock.recv(4096)  # les clients n'envoient rien
+            except BlockingIOError:
+                message = None
+            except OSError:
+                message = b''
+            if message == b'':
+                self._drop_client(client)
+                return
+        if mask & selectors.EVENT_WRITE:
+            self._flush(client)
+
+    def _flush(self, client):
+        """
+        envoi du tampon d'un client, attente de l'écriture s'il en reste
+        """
+        if not client.flush():
+            self._drop_client(client)
+            return
+        evenements = selectors.EVENT_READ
+        if client.frames:
+            evenements |= selectors.EVENT_WRITE
+        self.selector.modify(client.sock, evenements, self._client_event)
+
+    def _drop_client(self, client):
+        del self.clients[client.sock]
+        self.selector.unregister(client.sock)
+        client.sock.close()
+
+    def _publish(self):
+        """
+        encodage des nouveaux échantillons et envoi à tous les clients
+        """
+        trames = []
+        for stream, abonnement in self.subscriptions.items():
+            elements = abonnement.read()
+            premier = abonnement.cursor - len(elements)
+            for debut in range(0, len(elements), self.max_sample):
+                trames.append(encode_frame(
+                    stream, premier + debut,
+                    elements[debut:debut + self.max_sample]))
+        if not trames:
+            return
+        self.nb_frame += len(trames)
+        self.nb_byte += sum(len(trame) for trame in trames)
+        for client in list(self.clients.values()):
+            if all(client.push(trame) for trame in trames):
+                self._flush(client)
+            else:
+                self._drop_client(client)
+        if self.udp_clients:
+            limite = perf_counter() - self.udp_timeout
+            for adresse, instant in list(self.udp_clients.items()):
+                if instant < limite:
+                    del self.udp_clients[adresse]
+                    continue
+                for trame in trames:
+                    try:
+                        self.udp.sendto(trame, adresse)
+                    except OSError:
+                        break  # tampon du système plein : trame perdue
+
+    def _serve(self):
+        while self.running:
+            for cle, masque in self.selector.select(0.1):
+                cle.data(cle.fileobj, masque)
+            self._publish()
+
+    def stats(self):
+        """
+        état du serveur et de chaque client
+        """
+        return {'frames': self.nb_frame, 'bytes': self.nb_byte,
+                'udp_clients': len(self.udp_clients),
+                'clients': [{'address': client.address,
+                             'pending': client.size,
+                             'dropped_frames': client.dropped_frames,
+                             'sent_bytes': client.sent_bytes}
+                            for client in list(self.clients.values())]}
+
+
+def benchmark(duree=5.0, speed=10.0, nb_client=4):
+    """
+    débit et latence (réception - timestamp du dernier échantillon de la
+    trame) de clients TCP et UDP locaux, bracelet simulé à speed fois le
+    temps réel
+    """
+    from module_myo.my_myo_arm_band import MyListener
+    from module_myo.simulation import SimulatedHub
+    listener = MyListener(queue_size=4096)
+    serveur = StreamServer(listener, port=0, udp_port=0)
+    serveur.start()
+    hub = SimulatedHub(speed=speed)
+    mesures = {}
+
+    def latence(timestamp):
+        # instant de livraison théorique du dernier échantillon de la trame
+        livraison = hub.origin + (timestamp * 1e-6 - hub.origin) / speed
+        return perf_counter() - livraison
+
+    def client_tcp(nom):
+        sock = socket.create_connection(serveur.address)
+        sock.settimeout(0.5)
+        lecteur = FrameReader()
+        nb_echantillon, latences = 0, []
+        fin = perf_counter() + duree
+        while perf_counter() < fin:
+            try:
+                donnees = sock.recv(65536)
+            except socket.timeout:
+                continue
+            for stream, _, timestamps, _ in lecteur.feed(donnees):
+                if stream == 'emg':
+                    nb_echantillon += len(timestamps)
+                    latences.append(latence(timestamps[-1]))
+        sock.close()
+        mesures[nom] = (nb_echantillon, latences)
+
+    def client_udp(nom):
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        sock.settimeout(0.5)
+        sock.sendto(b'hello', serveur.udp_address)
+        nb_echantillon, latences = 0, []
+        fin = perf_counter() + duree
+        while perf_counter() < fin:
+            try:
+                trame = sock.recv(65536)
+            except socket.timeout:
+                continue
+            stream, _, timestamps, _ = decode_frame(trame)
+            if stream == 'emg':
+                nb_echantillon += len(timestamps)
+                latences.append(latence(timestamps[-1]))
+        sock.sendto(b'bye', serveur.udp_address)
+        sock.close()
+        mesures[nom] = (nb_echantillon, latences)
+
+    clients = [Thread(target=client_tcp, args=(f'tcp {indice}',))
+               for indice in range(nb_client)]
+    clients.append(Thread(target=client_udp, args=('udp',)))
+    for client in clients:
+        client.start()
+    thread = Thread(target=hub.run_forever, args=(listener.on_event, 20))
+    thread.start()
+    for client in clients:
+        client.join()
+    hub.stop()
+    thread.join()
+    serveur.stop()
+    resultats = {}
+    for nom, (nb_echantillon, latences) in sorted(mesures.items()):
+        latences = np.array(latences or [np.nan]) * 1e3
+        resultats[nom] = {'samples/s': nb_echantillon / duree,
+                          'p50 ms': np.percentile(latences, 50),
+                          'p99 ms': np.percentile(latences, 99)}
+    return resultats
+
+
+if __name__ == '__main__':
+    for NOM, STATS in benchmark().items():
+        print(f"{NOM:<6} : {STATS['samples/s']:9.0f} EMG/s  "
+              f"p50 {STATS['p50 ms']:6.2f} ms  p99 {STATS['p99 ms']:6.2f} ms")
@@ -0,0 +1,186 @@
+# -*- coding: utf-8 -*-
+"""
+Vue 3D de l'orientation du bracelet pilotée par le flux de quaternions
+
+Le bracelet est représenté par un pavé allongé (l'avant-bras) et ses trois
+axes. La géométrie est créée une seule fois ; à chaque rafraîchissement,
+seule la rotation correspondant au dernier quaternion (x, y, z, w) reçu est
+appliquée :
+
+    a) ``GlOrientationView`` : ``pyqtgraph.opengl`` (dépendance optionnelle,
+       PyOpenGL), la transformation des objets est remplacée
+    b) ``WireframeView`` : repli sans OpenGL, les 8 sommets sont tournés
+       avec numpy puis projetés orthographiquement sur un
+       ``QGraphicsView`` ; les segments existants sont simplement déplacés
+
+``create_orientation_view`` choisit la première disponible : PyOpenGL
+installé ne suffit pas, un contexte OpenGL 2 doit pouvoir être créé et
+activé (``gl_available``) car sans pilote les erreurs n'apparaissent qu'au
+premier dessin, trop tard pour se replier. ``set_origin``
+prend l'orientation courante comme référence : la vue affiche ensuite la
+rotation relative à cette orientation.
+"""
+
+import numpy as np
+from pyqtgraph.Qt import QtCore, QtGui, QtWidgets
+
+try:
+    import pyqtgraph.opengl as gl
+except ImportError:  # dépendance optionnelle (PyOpenGL)
+    gl = None
+
+# demi-dimensions du pavé (avant-bras selon x)
+HALF_SIZE = np.array([1.0, 0.35, 0.25])
+# sommets du pavé et arêtes (paires d'indices de sommets)
+VERTICES = np.array([[sx, sy, sz] for sx in (-1, 1) for sy in (-1, 1)
+                     for sz in (-1, 1)], dtype=np.float64) * HALF_SIZE
+EDGES = [(i, j) for i in range(8) for j in range(i + 1, 8)
+         if bin(i ^ j).count('1') == 1]
+AXIS_COLORS = ((255, 0, 0), (0, 255, 0), (0, 128, 255))
+
+
+def quaternion_matrix(quat):
+    """
+    matrice de rotation 3 × 3 d'un quaternion (x, y, z, w)
+    """
+    x, y, z, w = np.asarray(quat, dtype=np.float64) / np.linalg.norm(quat)
+    return np.array([
+        [1 - 2 * (y * y + z * z), 2 * (x * y - z * w), 2 * (x * z + y * w)],
+        [2 * (x * y + z * w), 1 - 2 * (x * x + z * z), 2 * (y * z - x * w)],
+        [2 * (x * z - y * w), 2 * (y * z + x * w), 1 - 2 * (x * x + y * y)]])
+
+
+class _OrientationView(object):
+    """
+    orientation de référence commune aux deux vues
+
+    chaque vue définit ``_draw(rotation)`` qui affiche le pavé et ses axes
+    tournés par la matrice 3 × 3 rotation
+    """
+    def __init__(self):
+        self.reference = np.eye(3)  # inverse de la rotation de référence
+        self.rotation = np.eye(3)  # rotation du dernier quaternion
+
+    def set_origin(self):
+        """
+        l'orientation courante devient la référence
+        """
+        self.reference = self.rotation.T
+        self._draw(np.eye(3))
+
+    def set_quaternion(self, quat):
+        """
+        application du dernier quaternion reçu
+        """
+        self.rotation = quaternion_matrix(quat)
+        self._draw(self.reference @ self.rotation)
+
+
+class WireframeView(_OrientationView):
+    """
+    pavé et axes en fil de fer dessinés dans un QGraphicsView existant
+    """
+    def __init__(self, graphics_view, scale=45.0):
+        super(WireframeView, self).__init__()
+        self.scale = scale
+        self.scene = QtWidgets.QGraphicsScene(graphics_view)
+        graphics_view.setScene(self.scene)
+        graphics_view.setRenderHint(QtGui.QPainter.Antialiasing)
+        for barre in (graphics_view.setHorizontalScrollBarPolicy,
+                      graphics_view.setVerticalScrollBarPolicy):
+            barre(QtCore.Qt.ScrollBarAlwaysOff)
+        stylo = QtGui.QPen(QtGui.QColor(220, 220, 220), 2)
+        self.edges = [self.scene.addLine(0, 0, 0, 0, stylo) for _ in EDGES]
+        self.axes = [self.scene.addLine(0, 0, 0, 0,
+                                        QtGui.QPen(QtGui.QColor(*couleur), 2))
+                     for couleur in AXIS_COLORS]
+        marge = 1.5 * scale
+        self.scene.setSceneRect(-marge, -marge, 2 * marge, 2 * marge)
+        self._draw(np.eye(3))
+
+    def _project(self, points):
+        """
+        projection orthographique vue de face, légèrement de dessus
+        (x vers la droite, z vers le haut de l'écran)
+        """
+        inclinaison = np.radians(20)
+        hauteur = (points[:, 2] * np.cos(inclinaison)
+                   + points[:, 1] * np.sin(inclinaison))
+        return np.column_stack((points[:, 0], -hauteur)) * self.scale
+
+    def _draw(self, rotation):
+        sommets = self._project(VERTICES @ rotation.T)
+        for ligne, (debut, fin) in zip(self.edges, EDGES):
+            ligne.setLine(*sommets[debut], *sommets[fin])
+        extremites = self._project(1.3 * rotation.T)
+        for ligne, (x, y) in zip(self.axes, extremites):
+            ligne.setLine(0.0, 0.0, x, y)
+
+
+class GlOrientationView(_OrientationView):
+    """
+    pavé et axes affichés avec pyqtgraph.opengl
+
+    parent_layout, graphics_view : la vue OpenGL prend la place de
+    graphics_view dans parent_layout
+    """
+    def __init__(self, parent_layout, graphics_view):
+        super(GlOrientationView, self).__init__()
+        self.widget = gl.GLViewWidget()
+        self.widget.setMinimumSize(graphics_view.minimumSize())
+        self.widget.setCameraPosition(distance=5, elevation=20, azimuth=-90)
+        faces = np.array([[0, 1, 3], [0, 3, 2], [4, 6, 7], [4, 7, 5],
+                          [0, 4, 5], [0, 5, 1], [2, 3, 7], [2, 7, 6],
+                          [0, 2, 6], [0, 6, 4], [1, 5, 7], [1, 7, 3]])
+        self.mesh = gl.GLMeshItem(vertexes=VERTICES, faces=faces,
+                                  color=(0.6, 0.6, 0.6, 1.0),
+                                  edgeColor=(1, 1, 1, 1), drawEdges=True,
+                                  smooth=False, shader='shaded')
+        self.axes = gl.GLAxisItem(size=QtGui.QVector3D(1.3, 1.3, 1.3))
+        for objet in (self.mesh, self.axes):
+            self.widget.addItem(objet)
+        indice = parent_layout.indexOf(graphics_view)
+        graphics_view.hide()
+        parent_layout.insertWidget(indice, self.widget)
+
+    def _draw(self, rotation):
+        matrice = np.eye(4)
+        matrice[:3, :3] = rotation
+        transformation = QtGui.QMatrix4x4(*matrice.ravel().tolist())
+        for objet in (self.mesh, self.axes):
+            objet.setTransform(transformation)
+
+
+def gl_available():
+    """
+    un contexte OpenGL 2 (shaders de pyqtgraph.opengl) peut-il être créé et
+    activé sur ce poste
+    """
+    if gl is None:
+        return False
+    contexte = QtGui.QOpenGLContext()
+    if not contexte.create():
+        return False
+    surface = QtGui.QOffscreenSurface()
+    surface.setFormat(contexte.format())
+    surface.create()
+    try:
+        return (surface.isValid() and contexte.makeCurrent(surface)
+                and contexte.format().majorVersion() >= 2)
+    finally:
+        contexte.doneCurrent()
+        surface.destroy()
+
+
+def create_orientation_view(parent_layout, graphics_view, use_gl=True):
+    """
+    vue OpenGL si disponible, fil de fer dans graphics_view sinon
+
+    use_gl : False pour imposer le fil de fer
+    """
+    if use_gl and gl_available():
+        try:
+            return GlOrientationView(parent_layout, graphics_view)
+        except Exception:  # pas de contexte OpenGL sur cette machine
+            pass
+    return WireframeView(graphics_view)
@@ -0,0 +1,171 @@
+# -*- coding: utf-8 -*-
+"""
+Envoi des flux des bracelets en OSC (Open Sound Control) sur UDP
+
+Les messages OSC sont encodés ici (chaîne d'adresse, étiquette de types
+``,iffs...``, arguments grand-boutistes alignés sur 4 octets) : aucune
+dépendance supplémentaire. À chaque appel de ``OscSender.tick`` (au plus
+rate fois par seconde), les messages de tous les bracelets sont regroupés
+dans un ou plusieurs bundles OSC envoyés en un datagramme chacun.
+
+Adresses par défaut (``{slot}`` : emplacement du bracelet, cf. ADDRESSES) :
+
+    /myo/{slot}/emg          8 entiers, un message par échantillon EMG
+    /myo/{slot}/envelope     8 flottants, RMS de chaque voie depuis l'envoi
+                             précédent
+    /myo/{slot}/orientation  quaternion x, y, z, w (dernier reçu)
+    /myo/{slot}/pose         nom de la pose, seulement quand elle change
+
+Une adresse à None désactive le flux correspondant. Au plus max_emg
+échantillons EMG bruts par bracelet sont envoyés à chaque envoi (les plus
+récents) afin de borner le coût d'un envoi.
+"""
+
+import socket
+import struct
+from time import perf_counter
+import numpy as np
+from module_myo.fanout import ListenerFanout
+
+ADDRESSES = {'emg': '/myo/{slot}/emg',
+             'envelope': '/myo/{slot}/envelope',
+             'orientation': '/myo/{slot}/orientation',
+             'pose': '/myo/{slot}/pose'}
+IMMEDIATE = 1  # étiquette temporelle OSC « immédiatement »
+MAX_DATAGRAM = 8192  # taille maximale d'un bundle (octets)
+
+
+def osc_string(texte):
+    """
+    chaîne OSC : ASCII terminé par un zéro, complété à un multiple de 4
+    """
+    octets = texte.encode('ascii') + b'\0'
+    return octets + b'\0' * (-len(octets) % 4)
+
+
+def osc_message(address, *arguments):
+    """
+    message OSC, les arguments sont des entiers, flottants ou chaînes
+    """
+    types = ','
+    donnees = []
+    for argument in arguments:
+        if isinstance(argument, str):
+            types += 's'
+            donnees.append(osc_string(argument))
+        elif isinstance(argument, (int, np.integer)):
+            types += 'i'
+            donnees.append(struct.pack('>i', argument))
+        else:
+            types += 'f'
+            donnees.append(struct.pack('>f', argument))
+    return osc_string(address) + osc_string(types) + b''.join(donnees)
+
+
+def osc_bundle(messages, timetag=IMMEDIATE):
+    """
+    bundle OSC regroupant des messages déjà encodés
+    """
+    return (osc_string('#bundle') + struct.pack('>Q', timetag)
+            + b''.join(struct.pack('>i', len(message)) + message
+                       for message in messages))
+
+
+def _bundles(messages, max_size):
+    """
+    répartition des messages dans des bundles d'au plus max_size octets
+    """
+    entete = 16  # '#bundle' et étiquette temporelle
+    groupe, taille = [], entete
+    for message in messages:
+        if groupe and taille + 4 + len(message) > max_size:
+            yield osc_bundle(groupe)
+            groupe, taille = [], entete
+        groupe.append(message)
+        taille += 4 + len(message)
+    if groupe:
+        yield osc_bundle(groupe)
+
+
+class OscSender(object):
+    """
+    envoi OSC des flux d'une liste de MyListener (un par bracelet)
+
+    addresses : adresses de chaque flux (cf. ADDRESSES), fusionnées avec
+    celles par défaut
+    rate : nombre maximal d'envois par seconde
+    max_emg : nombre maximal d'échantillons EMG bruts par bracelet et envoi
+    """
+    def __init__(self, listeners, host='127.0.0.1', port=9000,
+                 addresses=None, rate=50.0, max_emg=20):
+        self.listeners = listeners
+        self.target = (host, port)
+        self.addresses = dict(ADDRESSES, **(addresses or {}))
+        self.rate = rate
+        self.max_emg = max_emg
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.setblocking(False)
+        self.fanouts = [ListenerFanout(listener) for listener in listeners]
+        self.emg = [fanout.subscribe('emg') for fanout in self.fanouts]
+        self.orientation = [fanout.subscribe('orientation', 'sample')
+                            for fanout in self.fanouts]
+        self.poses = [None] * len(listeners)
+        self.last_send = None
+        self.nb_bundle = 0
+        self.nb_skipped_emg = 0  # EMG bruts non envoyés (max_emg dépassé)
+        self.nb_error = 0  # datagrammes refusés par le système
+
+    def _messages(self, slot):
+        """
+        messages OSC d'un bracelet depuis l'envoi précédent
+        """
+        adresses = {nom: adresse.format(slot=slot)
+                    for nom, adresse in self.addresses.items() if adresse}
+        messages = []
+        emg = self.emg[slot].read()
+        if emg:
+            if 'envelope' in adresses:
+                valeurs = np.array([tuple(v) for _, v in emg], dtype=float)
+                enveloppe = np.sqrt(np.mean(valeurs ** 2, axis=0))
+                messages.append(osc_message(adresses['envelope'],
+                                            *enveloppe.tolist()))
+            if 'emg' in adresses:
+                self.nb_skipped_emg += max(0, len(emg) - self.max_emg)
+                messages.extend(osc_message(adresses['emg'], *valeurs)
+                                for _, valeurs in emg[-self.max_emg:])
+        orientation = self.orientation[slot].read()
+        if orientation and 'orientation' in adresses:
+            messages.append(osc_message(adresses['orientation'],
+                                        *map(float, orientation[-1][1])))
+        pose = self.listeners[slot].pose
+        if pose != self.poses[slot]:
+            self.poses[slot] = pose
+            if 'pose' in adresses:
+                messages.append(osc_message(adresses['pose'],
+                                            getattr(pose, 'name', str(pose))))
+        return messages
+
+    def tick(self):
+        """
+        envoi des nouvelles données si la période minimale est écoulée
+        (à appeler à chaque itération de l'interface)
+        """
+        maintenant = perf_counter()
+        if (self.last_send is not None
+                and maintenant - self.last_send < 1.0 / self.rate):
+            return
+        self.last_send = maintenant
+        messages = []
+        for slot in range(len(self.listeners)):
+            messages.extend(self._messages(slot))
+        for bundle in _bundles(messages, MAX_DATAGRAM):
+            try:
+                self.sock.sendto(bundle, self.target)
+                self.nb_bundle += 1
+            except OSError:
+                self.nb_error += 1
+
+    def close(self):
+        for abonnement in self.emg + self.orientation:
+            abonnement.close()
+        self.sock.close()
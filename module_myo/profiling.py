@@ -0,0 +1,175 @@
+# -*- coding: utf-8 -*-
+"""
+Mesure de la durée de chaque étape de la boucle de l'interface
+
+Chaque étape de ``timerEvent`` (hub.run, lecture, gestion_data, maj_plot,
+mise à jour des widgets...) est entourée de ``with profiler.stage(nom):``.
+Profilage désactivé, ``stage`` renvoie un contexte vide partagé : le coût
+se limite à un appel de méthode. Activé, la durée est rangée dans un
+histogramme glissant par étape (``RollingHistogram``) : bornes
+logarithmiques fixes, seules les window dernières mesures sont comptées
+et l'ajout d'une mesure est en O(1).
+
+Le profilage s'active et se désactive à tout moment (``enabled``) ;
+``format_profile`` met en forme les percentiles pour la console ou un
+panneau de l'interface.
+"""
+
+from bisect import bisect_left
+from time import perf_counter
+import numpy as np
+
+# bornes des classes des histogrammes (s) : 1 µs à 10 s, 10 par décade
+EDGES = tuple(np.logspace(-6, 1, 71).tolist())
+
+
+class RollingHistogram(object):
+    """
+    histogramme des window dernières valeurs
+
+    edges : bornes croissantes des classes (une classe de plus pour les
+    valeurs supérieures à la dernière borne)
+    """
+    def __init__(self, edges=EDGES, window=1000):
+        self.edges = edges
+        self.window = window
+        # listes python : l'accès élément par élément y est plus rapide
+        self.counts = [0] * (len(edges) + 1)
+        self.values = [0.0] * window  # tampon circulaire des valeurs
+        self.index = 0  # nombre total de valeurs ajoutées
+        self.total = 0.0  # somme des valeurs de la fenêtre
+
+    def add(self, value):
+        position = self.index % self.window
+        if self.index >= self.window:
+            ancienne = self.values[position]
+            self.counts[bisect_left(self.edges, ancienne)] -= 1
+            self.total -= ancienne
+        self.values[position] = value
+        self.counts[bisect_left(self.edges, value)] += 1
+        self.total += value
+        self.index += 1
+
+    def __len__(self):
+        return min(self.index, self.window)
+
+    def percentile(self, percent):
+        """
+        borne supérieure de la classe contenant le percentile (au plus le
+        maximum de la fenêtre)
+        """
+        nombre = len(self)
+        if not nombre:
+            return None
+        rang = np.searchsorted(np.cumsum(self.counts),
+                               percent / 100.0 * nombre)
+        if rang >= len(self.edges):
+            return self.maximum()
+        return min(self.edges[rang], self.maximum())
+
+    def mean(self):
+        return self.total / len(self) if len(self) else None
+
+    def maximum(self):
+        return max(self.values[:len(self)]) if len(self) else None
+
+    def reset(self):
+        self.__init__(self.edges, self.window)
+
+
+class StageProfiler(object):
+    """
+    histogrammes de durée de chaque étape nommée
+
+    enabled : profilage actif (modifiable à tout moment)
+    """
+    def __init__(self, enabled=False, window=1000):
+        self.enabled = enabled
+        self.window = window
+        self.histograms = {}  # nom de l'étape -> RollingHistogram
+        self._stages = {}  # nom de l'étape -> contexte de mesure
+        self._null = _NullStage()
+
+    def stage(self, name):
+        """
+        contexte mesurant la durée de l'étape name
+        """
+        if not self.enabled:
+            return self._null
+        contexte = self._stages.get(name)
+        if contexte is None:
+            contexte = self._stages[name] = _Stage(self, name)
+        return contexte
+
+    def add(self, name, duration):
+        """
+        ajout d'une durée (s) mesurée par ailleurs
+        """
+        histogramme = self.histograms.get(name)
+        if histogramme is None:
+            histogramme = self.histograms[name] = RollingHistogram(
+                window=self.window)
+        histogramme.add(duration)
+
+    def toggle(self):
+        self.enabled = not self.enabled
+        return self.enabled
+
+    def reset(self):
+        self.histograms = {}
+
+    def snapshot(self):
+        """
+        percentiles (ms) de chaque étape
+        """
+        return {nom: {'count': len(histogramme),
+                      'mean': 1e3 * histogramme.mean(),
+                      'p50': 1e3 * histogramme.percentile(50),
+                      'p90': 1e3 * histogramme.percentile(90),
+                      'p99': 1e3 * histogramme.percentile(99),
+                      'max': 1e3 * histogramme.maximum()}
+                for nom, histogramme in self.histograms.items()
+                if len(histogramme)}
+
+
+class _Stage(object):
+    """
+    contexte de mesure d'une étape (réutilisé d'un appel à l'autre)
+    """
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+        self.start = 0.0
+
+    def __enter__(self):
+        self.start = perf_counter()
+        return self
+
+    def __exit__(self, *_):
+        self.profiler.add(self.name, perf_counter() - self.start)
+        return False
+
+
+class _NullStage(object):
+    """
+    contexte sans effet (profilage désactivé)
+    """
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_):
+        return False
+
+
+def format_profile(snapshot):
+    """
+    mise en forme texte des percentiles de chaque étape (ms)
+    """
+    lignes = [f"{'étape':<16}{'n':>6}{'moy':>8}{'p50':>8}{'p90':>8}"
+              f"{'p99':>8}{'max':>8}"]
+    for nom, valeurs in snapshot.items():
+        lignes.append(f"{nom:<16}{valeurs['count']:>6}"
+                      f"{valeurs['mean']:>8.2f}{valeurs['p50']:>8.2f}"
+                      f"{valeurs['p90']:>8.2f}{valeurs['p99']:>8.2f}"
+                      f"{valeurs['max']:>8.2f}")
+    return '\n'.join(lignes)
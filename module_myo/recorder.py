@@ -0,0 +1,241 @@
+# -*- coding: utf-8 -*-
+"""
+Enregistrement d'une session d'acquisition dans un fichier HDF5
+
+Tous les bracelets d'une session sont écrits dans un même fichier, un
+tableau par bracelet et par flux (``/myo0/emg``, ``/myo1/acc``...). Chaque
+échantillon garde son timestamp myo (µs) et reçoit un instant hôte
+(``host_time``, en secondes) calculé par le ``ClockMapper`` du bracelet : la
+colonne ``host_time`` est la base de temps commune qui synchronise les
+bracelets entre eux.
+
+Les échantillons sont accumulés en mémoire puis ajoutés au fichier par
+blocs (``flush``) pour que les écritures restent séquentielles et peu
+coûteuses.
+
+Une longue session peut être découpée en segments (``segment_duration``,
+``segment_size``) : après un ``flush``, le fichier courant est fermé dès
+qu'il dépasse la durée ou la taille demandée et l'écriture continue dans le
+suivant (``session_000.h5``, ``session_001.h5``...). Chaque segment est un
+fichier de session complet, lisible seul. Le manifeste ``session.json``,
+réécrit à chaque changement de segment, donne pour chacun les bornes de
+timestamps et le nombre de lignes de chaque tableau : un lecteur n'ouvre que
+les segments qui couvrent l'intervalle voulu (cf. review). Une session
+arrêtée sans aucun échantillon garde un manifeste sans segment, que review
+ouvre comme une session vide.
+"""
+
+import json
+import os
+from time import perf_counter
+import numpy as np
+import pandas as pd
+from module_myo.timeline import MYO_STREAMS
+
+# flux enregistrés et nom du flux correspondant dans MyListener
+LISTENER_STREAMS = {'emg': 'emg',
+                    'acc': 'acceleration',
+                    'gyro': 'gyroscope',
+                    'ori': 'orientation'}
+
+
+def stream_key(device, stream):
+    """
+    chemin du tableau d'un flux dans le fichier
+    """
+    return f'/{device}/{stream}'
+
+
+def manifest_path(path):
+    """
+    chemin du manifeste d'une session segmentée (session.h5 -> session.json)
+    """
+    return os.path.splitext(path)[0] + '.json'
+
+
+def read_manifest(path):
+    """
+    contenu du manifeste d'une session segmentée
+    """
+    with open(path, encoding='utf-8') as fichier:
+        return json.load(fichier)
+
+
+class SessionRecorder(object):
+    """
+    enregistreur d'une session multi-bracelets
+
+    path : chemin du fichier HDF5 (préfixe des segments et du manifeste si
+    la session est segmentée)
+    flush_interval : durée (s) entre deux écritures sur le disque
+    segment_duration : durée (s) maximale d'un segment
+    segment_size : taille (Mo) maximale d'un segment
+    """
+    def __init__(self, path, flush_interval=1.0, segment_duration=None,
+                 segment_size=None):
+        self.path = path
+        self.flush_interval = flush_interval
+        self.segment_duration = segment_duration
+        self.segment_size = segment_size
+        self.segmented = (segment_duration is not None
+                          or segment_size is not None)
+        self.segments = []  # segments terminés (entrées du manifeste)
+        self.segment = None  # entrée du manifeste du segment courant
+        self.store = None
+        self._open_segment()
+        self.pending = {}  # clé -> liste de DataFrame en attente d'écriture
+        self.last_timestamp = {}  # clé -> dernier timestamp enregistré
+        self.cursors = {}  # clé -> curseur de lecture du MyListener
+        self.devices = {}  # nom du bracelet dans le fichier -> infos
+        self.nb_sample = 0  # échantillons écrits sur le disque
+        self._last_flush = perf_counter()
+
+    def add(self, device, stream, timestamps, values, host_time=None):
+        """
+        ajout d'un bloc d'échantillons (timestamps (n,), values (n, k))
+
+        les échantillons déjà enregistrés sont ignorés, ce qui permet de
+        passer directement les files de MyListener
+        """
+        cle = stream_key(device, stream)
+        timestamps = np.asarray(timestamps, dtype=np.float64)
+        values = np.asarray(values, dtype=np.float64).reshape(
+            len(timestamps), len(MYO_STREAMS[stream]))
+        dernier = self.last_timestamp.get(cle)
+        if dernier is not None:
+            nouveau = timestamps > dernier
+            timestamps = timestamps[nouveau]
+            values = values[nouveau]
+            if host_time is not None:
+                host_time = np.asarray(host_time)[nouveau]
+        if len(timestamps) == 0:
+            return
+        self.last_timestamp[cle] = timestamps[-1]
+        bloc = pd.DataFrame(values, columns=MYO_STREAMS[stream])
+        bloc.insert(0, 'host_time',
+                    np.nan if host_time is None else host_time)
+        bloc.insert(0, 'timestamp', timestamps)
+        self.pending.setdefault(cle, []).append(bloc)
+        if perf_counter() - self._last_flush > self.flush_interval:
+            self.flush()
+
+    def add_listener(self, device, listener):
+        """
+        enregistrement des dernières données d'un MyListener
+        (lues avec les curseurs de l'enregistreur)
+        """
+        self.devices.setdefault(device, {'name': listener.device_name,
+                                         'firmware': listener.myo_firmware})
+        for stream, nom in LISTENER_STREAMS.items():
+            cle = stream_key(device, stream)
+            data, self.cursors[cle], _ = listener.read_stream(
+                nom, self.cursors.get(cle, 0))
+            if not data:
+                continue
+            timestamps = np.array([timestamp for timestamp, _ in data],
+                                  dtype=np.float64)
+            values = np.array([tuple(valeurs) for _, valeurs in data],
+                              dtype=np.float64)
+            horloge = 'emg' if stream == 'emg' else 'imu'
+            try:
+                host_time = listener.to_host_time(timestamps, horloge)
+            except RuntimeError:
+                host_time = None  # horloge pas encore calée
+            self.add(device, stream, timestamps, values, host_time)
+
+    def flush(self):
+        """
+        écriture sur le disque des blocs en attente
+        """
+        for cle, blocs in self.pending.items():
+            if not blocs:
+                continue
+            bloc = pd.concat(blocs, ignore_index=True)
+            self.store.append(cle, bloc, format='table', index=False,
+                              data_columns=['timestamp', 'host_time'])
+            self.nb_sample += len(bloc)
+            self._extend_segment(cle, bloc)
+        self.pending = {}
+        self._last_flush = perf_counter()
+        if self.segmented and self._segment_full():
+            self._close_segment()
+            self._open_segment()
+
+    @property
+    def segment_path(self):
+        """
+        chemin du fichier en cours d'écriture
+        """
+        if not self.segmented:
+            return self.path
+        racine, extension = os.path.splitext(self.path)
+        return f'{racine}_{len(self.segments):03d}{extension}'
+
+    def _open_segment(self):
+        self.store = pd.HDFStore(self.segment_path, mode='w')
+        self.segment = {'file': os.path.basename(self.segment_path),
+                        'streams': {}}
+        self._segment_start = perf_counter()
+
+    def _extend_segment(self, key, bloc):
+        """
+        bornes du tableau key dans le segment courant après l'ajout de bloc
+        """
+        timestamps = bloc['timestamp'].values
+        bornes = self.segment['streams'].setdefault(
+            key, {'start': float(timestamps[0]), 'rows': 0})
+        bornes['end'] = float(timestamps[-1])
+        bornes['rows'] += len(bloc)
+
+    def _segment_full(self):
+        if not self.segment['streams']:
+            return False  # pas de segment vide
+        if (self.segment_duration is not None and perf_counter()
+                - self._segment_start >= self.segment_duration):
+            return True
+        if self.segment_size is not None:
+            self.store.flush()
+            return (os.path.getsize(self.segment_path)
+                    >= self.segment_size * 1024 ** 2)
+        return False
+
+    def _close_segment(self):
+        """
+        fermeture du segment courant (avec la liste des bracelets pour qu'il
+        soit lisible seul) et mise à jour du manifeste
+        """
+        if self.devices:
+            self.store.put('devices',
+                           pd.DataFrame.from_dict(self.devices,
+                                                  orient='index'))
+        self.store.close()
+        if self.segmented:
+            self.segments.append(self.segment)
+            self.write_manifest()
+
+    def write_manifest(self):
+        """
+        écriture atomique du manifeste des segments terminés
+        """
+        chemin = manifest_path(self.path)
+        temporaire = f'{chemin}.{os.getpid()}.tmp'
+        with open(temporaire, 'w', encoding='utf-8') as fichier:
+            json.dump({'devices': self.devices, 'segments': self.segments},
+                      fichier, indent=1)
+        os.replace(temporaire, chemin)
+
+    def close(self):
+        """
+        écriture des dernières données, de la liste des bracelets
+        et fermeture du fichier
+        """
+        self.flush()
+        if self.segmented and not self.segment['streams']:
+            # segment ouvert par la dernière rotation resté vide ; sans
+            # rotation, le manifeste sans segment enregistre une session
+            # vide (review.SegmentedSessionReader.time_range -> None)
+            self.store.close()
+            os.remove(self.segment_path)
+            self.write_manifest()
+            return
+        self._close_segment()
@@ -0,0 +1,222 @@
+# -*- coding: utf-8 -*-
+"""
+Lecture paresseuse d'une session enregistrée pour la relecture
+
+Une session (cf. recorder) peut peser plusieurs gigaoctets : rien n'est
+chargé à l'ouverture. Les timestamps de chaque tableau étant croissants,
+la ligne correspondant à un instant est trouvée par dichotomie en ne
+lisant qu'une valeur de la colonne timestamp par étape (quelques dizaines
+de lectures pour des millions de lignes), puis seules les lignes de la
+fenêtre demandée sont lues (``HDFStore.select`` avec start et stop).
+
+``WindowCache`` précharge autour de la fenêtre affichée une marge de
+prefetch fois sa durée : la lecture en continu ou un petit déplacement du
+curseur ne font que découper le bloc déjà en mémoire, le disque n'est relu
+qu'en sortant du bloc.
+
+Une session segmentée (cf. recorder) est ouverte par son manifeste :
+``SegmentedSessionReader`` offre la même interface et n'ouvre que les
+segments dont les bornes, données par le manifeste, recoupent la fenêtre
+demandée ; ``open_session`` choisit le lecteur d'après le chemin.
+"""
+
+import os
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
+from module_myo.recorder import read_manifest, stream_key
+from module_myo.timeline import MYO_STREAMS
+
+
+class SessionReader(object):
+    """
+    accès en lecture seule à un fichier de session HDF5
+
+    path : chemin du fichier écrit par SessionRecorder
+    """
+    def __init__(self, path):
+        self.path = path
+        self.store = pd.HDFStore(path, mode='r')
+        self.keys = [cle for cle in self.store.keys() if cle != '/devices']
+        self._timestamps = {}  # (clé, ligne) -> timestamp déjà lu
+        self.nb_read = 0  # lectures sur le disque
+
+    def devices(self):
+        return sorted({cle.split('/')[1] for cle in self.keys})
+
+    def streams(self, device):
+        return [cle.split('/')[2] for cle in self.keys
+                if cle.split('/')[1] == device]
+
+    def nrows(self, key):
+        return self.store.get_storer(key).nrows
+
+    def timestamp_at(self, key, row):
+        """
+        timestamp de la ligne row (une seule valeur lue, gardée en cache)
+        """
+        if (key, row) not in self._timestamps:
+            self._timestamps[key, row] = float(self.store.select_column(
+                key, 'timestamp', start=row, stop=row + 1).iloc[0])
+            self.nb_read += 1
+        return self._timestamps[key, row]
+
+    def search(self, key, timestamp):
+        """
+        première ligne dont le timestamp est supérieur ou égal à timestamp
+        """
+        bas, haut = 0, self.nrows(key)
+        while bas < haut:
+            milieu = (bas + haut) // 2
+            if self.timestamp_at(key, milieu) < timestamp:
+                bas = milieu + 1
+            else:
+                haut = milieu
+        return bas
+
+    def time_range(self, device):
+        """
+        premier et dernier timestamps (µs) de tous les flux d'un bracelet,
+        None si aucun n'a d'échantillon
+        """
+        bornes = [(self.timestamp_at(cle, 0),
+                   self.timestamp_at(cle, self.nrows(cle) - 1))
+                  for cle in (stream_key(device, flux)
+                              for flux in self.streams(device))
+                  if self.nrows(cle)]
+        if not bornes:
+            return None
+        return min(b[0] for b in bornes), max(b[1] for b in bornes)
+
+    def read(self, key, start, stop):
+        """
+        lignes dont le timestamp est compris entre start et stop (exclu)
+        """
+        debut, fin = self.search(key, start), self.search(key, stop)
+        self.nb_read += 1
+        return self.store.select(key, start=debut, stop=fin)
+
+    def close(self):
+        self.store.close()
+
+
+class SegmentedSessionReader(object):
+    """
+    accès en lecture seule à une session segmentée
+
+    path : chemin du manifeste écrit par SessionRecorder
+    max_open : nombre de segments gardés ouverts
+    """
+    def __init__(self, path, max_open=4):
+        self.path = path
+        self.max_open = max_open
+        self.directory = os.path.dirname(path)
+        self.manifest = read_manifest(path)
+        self.segments = self.manifest['segments']
+        self.keys = sorted({cle for segment in self.segments
+                            for cle in segment['streams']})
+        # segments ouverts, le plus récemment lu à la fin
+        self.readers = OrderedDict()
+        self._nb_read = 0  # lectures des segments refermés
+
+    @property
+    def nb_read(self):
+        return self._nb_read + sum(lecteur.nb_read
+                                   for lecteur in self.readers.values())
+
+    def devices(self):
+        return sorted({cle.split('/')[1] for cle in self.keys})
+
+    def streams(self, device):
+        return [cle.split('/')[2] for cle in self.keys
+                if cle.split('/')[1] == device]
+
+    def time_range(self, device):
+        """
+        premier et dernier timestamps (µs) de tous les flux d'un bracelet,
+        lus dans le manifeste, None si aucun n'a d'échantillon (session
+        segmentée sans segment)
+        """
+        bornes = [bornes for segment in self.segments
+                  for cle, bornes in segment['streams'].items()
+                  if cle.split('/')[1] == device]
+        if not bornes:
+            return None
+        return (min(b['start'] for b in bornes),
+                max(b['end'] for b in bornes))
+
+    def _reader(self, fichier):
+        """
+        lecteur d'un segment, ouvert à la demande
+        """
+        if fichier in self.readers:
+            self.readers.move_to_end(fichier)
+        else:
+            self.readers[fichier] = SessionReader(
+                os.path.join(self.directory, fichier))
+            if len(self.readers) > self.max_open:
+                _, ancien = self.readers.popitem(last=False)
+                self._nb_read += ancien.nb_read
+                ancien.close()
+        return self.readers[fichier]
+
+    def read(self, key, start, stop):
+        """
+        lignes dont le timestamp est compris entre start et stop (exclu),
+        lues dans les seuls segments qui recoupent l'intervalle
+        """
+        blocs = [self._reader(segment['file']).read(key, start, stop)
+                 for segment in self.segments
+                 if key in segment['streams']
+                 and segment['streams'][key]['end'] >= start
+                 and segment['streams'][key]['start'] < stop]
+        if not blocs:
+            colonnes = ['timestamp', 'host_time'] + list(
+                MYO_STREAMS[key.split('/')[2]])
+            return pd.DataFrame(columns=colonnes, dtype=np.float64)
+        return pd.concat(blocs, ignore_index=True)
+
+    def close(self):
+        for lecteur in self.readers.values():
+            lecteur.close()
+        self.readers.clear()
+
+
+def open_session(path):
+    """
+    lecteur d'une session : manifeste (.json) d'une session segmentée ou
+    fichier HDF5 unique
+    """
+    if path.endswith('.json'):
+        return SegmentedSessionReader(path)
+    return SessionReader(path)
+
+
+class WindowCache(object):
+    """
+    bloc préchargé d'un flux autour de la fenêtre affichée
+
+    prefetch : marge lue de part et d'autre, en durées de fenêtre
+    """
+    def __init__(self, reader, key, prefetch=2.0):
+        self.reader = reader
+        self.key = key
+        self.prefetch = prefetch
+        self.start = self.stop = None
+        self.block = None
+        self.timestamps = None
+        self.nb_load = 0
+
+    def get(self, start, stop):
+        """
+        lignes de la fenêtre [start, stop[ (µs)
+        """
+        if (self.block is None or start < self.start
+                or stop > self.stop):
+            marge = self.prefetch * (stop - start)
+            self.start, self.stop = start - marge, stop + marge
+            self.block = self.reader.read(self.key, self.start, self.stop)
+            self.timestamps = self.block['timestamp'].values
+            self.nb_load += 1
+        debut, fin = np.searchsorted(self.timestamps, (start, stop))
+        return self.block.iloc[debut:fin]
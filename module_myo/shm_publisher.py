@@ -0,0 +1,173 @@
+# -*- coding: utf-8 -*-
+"""
+Publication des flux d'un MyListener en mémoire partagée
+
+Pour les consommateurs du même poste, la diffusion par socket (cf.
+net_server) coûte une sérialisation et des appels système par client. Ici
+chaque flux est écrit, dès le callback du SDK, dans un ``SharedRing`` nommé
+``{prefix}_{flux}`` (flux : emg, ori, acc ou gyro) dont l'en-tête publie
+l'indice d'écriture, la fréquence d'échantillonnage et la description des
+colonnes (timestamp du myo en µs, instant de réception perf_counter en s,
+puis les voies). N'importe quel processus local s'y attache en lecture
+seule avec ``ShmSubscriber`` sans connaître autre chose que le préfixe ;
+il n'interroge que l'indice d'écriture et ne copie que les lignes nouvelles.
+
+Lancé directement, ce module mesure la latence (réception dans le callback
+-> lecture par un autre processus) sur un bracelet simulé.
+"""
+
+import multiprocessing as mp
+from time import perf_counter
+import numpy as np
+from module_myo.fanout import ListenerFanout
+from module_myo.recorder import LISTENER_STREAMS
+from module_myo.shm_ring import SharedRing
+from module_myo.timeline import MYO_STREAMS
+
+FREQS = {'emg': 200.0, 'ori': 50.0, 'acc': 50.0, 'gyro': 50.0}
+
+
+def ring_name(prefix, stream):
+    """
+    nom du segment de mémoire partagée d'un flux
+    """
+    return f'{prefix}_{stream}'
+
+
+class ShmPublisher(object):
+    """
+    écriture des flux d'un MyListener dans des tampons partagés nommés
+
+    prefix : préfixe des noms des tampons (un préfixe par bracelet)
+    duration : durée (s) conservée dans chaque tampon
+    """
+    def __init__(self, listener, prefix='myo', duration=10.0):
+        self.listener = listener
+        self.prefix = prefix
+        self.fanout = ListenerFanout(listener)
+        self.rings = {}
+        # nom du flux du listener -> (flux, abonnement)
+        self.subscriptions = {}
+        for stream, nom in LISTENER_STREAMS.items():
+            colonnes = ('timestamp', 'host_time') + MYO_STREAMS[stream]
+            self.rings[stream] = SharedRing.create(
+                int(FREQS[stream] * duration), len(colonnes),
+                name=ring_name(prefix, stream), sample_rate=FREQS[stream],
+                layout={'stream': stream, 'columns': colonnes,
+                        'timestamp_unit': 'us', 'host_time_unit': 's'})
+            self.subscriptions[nom] = (stream, self.fanout.subscribe(nom))
+
+    def start(self):
+        self.listener.data_callbacks.append(self._on_data)
+
+    def _on_data(self, streams):
+        """
+        appelée par le callback du SDK : recopie immédiate des nouveaux
+        échantillons
+        """
+        reception = perf_counter()
+        for nom in streams:
+            stream, abonnement = self.subscriptions[nom]
+            ring = self.rings[stream]
+            for timestamp, valeurs in abonnement.read():
+                ring.write_row((timestamp, reception, *valeurs))
+
+    def close(self):
+        """
+        arrêt de la publication et suppression des tampons
+        """
+        if self._on_data in self.listener.data_callbacks:
+            self.listener.data_callbacks.remove(self._on_data)
+        for _, abonnement in self.subscriptions.values():
+            abonnement.close()
+        for ring in self.rings.values():
+            ring.close()
+
+
+class ShmSubscriber(object):
+    """
+    lecture des tampons d'un ShmPublisher depuis un autre processus
+
+    seuls les échantillons publiés après l'attachement sont lus
+    """
+    def __init__(self, prefix='myo', streams=tuple(MYO_STREAMS)):
+        self.rings = {stream: SharedRing.attach(ring_name(prefix, stream))
+                      for stream in streams}
+        self.cursors = {stream: ring.write_index
+                        for stream, ring in self.rings.items()}
+        self.lost = dict.fromkeys(self.rings, 0)
+
+    def columns(self, stream):
+        return tuple(self.rings[stream].layout['columns'])
+
+    def sample_rate(self, stream):
+        return self.rings[stream].sample_rate
+
+    def available(self, stream):
+        """
+        nombre de lignes publiées et pas encore lues
+        """
+        return self.rings[stream].write_index - self.cursors[stream]
+
+    def read(self, stream, max_row=None):
+        """
+        lignes (n, colonnes) publiées depuis la lecture précédente
+        """
+        lignes, self.cursors[stream], perdues = self.rings[stream].read(
+            self.cursors[stream], max_row)
+        self.lost[stream] += perdues
+        return lignes
+
+    def close(self):
+        for ring in self.rings.values():
+            ring.close()
+
+
+def _consommateur(prefix, duree, resultats):
+    """
+    processus lecteur : scrutation de l'indice d'écriture des EMG
+    """
+    abonne = ShmSubscriber(prefix, ('emg',))
+    latences = []
+    fin = perf_counter() + duree
+    while perf_counter() < fin:
+        if abonne.available('emg'):
+            lignes = abonne.read('emg')
+            latences.extend((perf_counter() - lignes[:, 1]).tolist())
+    abonne.close()
+    resultats.put(latences)
+
+
+def benchmark(duree=5.0, prefix='myo_benchmark'):
+    """
+    latence entre la réception d'un EMG dans le callback et sa lecture par
+    un processus qui scrute le tampon partagé
+    """
+    from threading import Thread
+    from module_myo.my_myo_arm_band import MyListener
+    from module_myo.simulation import SimulatedHub
+    listener = MyListener()
+    publication = ShmPublisher(listener, prefix)
+    publication.start()
+    resultats = mp.Queue()
+    lecteur = mp.Process(target=_consommateur,
+                         args=(prefix, duree, resultats))
+    lecteur.start()
+    hub = SimulatedHub()
+    thread = Thread(target=hub.run_forever, args=(listener.on_event, 20))
+    thread.start()
+    latences = np.array(resultats.get()) * 1e6
+    lecteur.join()
+    hub.stop()
+    thread.join()
+    publication.close()
+    return {'p50': np.percentile(latences, 50),
+            'p99': np.percentile(latences, 99),
+            'max': latences.max(), 'count': len(latences)}
+
+
+if __name__ == '__main__':
+    STATS = benchmark()
+    print(f"latence EMG : p50 {STATS['p50']:7.1f} µs  "
+          f"p99 {STATS['p99']:7.1f} µs  max {STATS['max']:7.1f} µs  "
+          f"({STATS['count']} échantillons)")
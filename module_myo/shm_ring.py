@@ -0,0 +1,213 @@
+# -*- coding: utf-8 -*-
+"""
+Tampons circulaires en mémoire partagée (``multiprocessing.shared_memory``)
+
+Un ``SharedRing`` contient un en-tête de quelques entiers (indice
+d'écriture, capacité, nombre de colonnes) suivi d'un tableau de
+``capacity`` lignes de flottants. Un seul processus écrit : il remplit les
+lignes puis incrémente l'indice d'écriture, qui ne fait que croître. Les
+lecteurs (éventuellement dans d'autres processus) gardent leur propre
+curseur, ne prennent aucun verrou et ne bloquent jamais l'écrivain ; après
+copie ils relisent l'indice d'écriture pour écarter les lignes écrasées
+pendant la lecture. La case qui suit la dernière ligne publiée (la plus
+ancienne) peut être en cours d'écriture : elle n'est jamais rendue, au plus
+capacity - 1 lignes sont lisibles.
+
+L'en-tête publie aussi la fréquence d'échantillonnage et la taille d'une
+description JSON (nom des colonnes...) rangée entre l'en-tête et les
+données : un lecteur qui ne connaît que le nom du segment sait l'interpréter.
+
+``multiprocessing.shared_memory`` n'existe qu'à partir de Python 3.8 : sur
+une version antérieure le module s'importe (l'interface démarre) mais
+``create`` et ``attach`` lèvent ImportError.
+
+Seul le créateur d'un tampon le libère. Jusqu'à Python 3.12, un processus
+qui s'attache à un segment l'inscrit auprès de son ``resource_tracker``,
+qui le supprime à la fin de ce processus, même si l'écrivain tourne
+encore : ``attach`` évite cette inscription.
+"""
+
+import json
+import sys
+import numpy as np
+
+try:
+    from multiprocessing import resource_tracker, shared_memory
+except ImportError:  # Python < 3.8
+    resource_tracker = shared_memory = None
+
+# position des champs dans l'en-tête (int64)
+WRITE_INDEX = 0
+CAPACITY = 1
+NB_COLUMN = 2
+SAMPLE_RATE = 3  # fréquence (Hz) rangée en float64, 0 si inconnue
+LAYOUT_SIZE = 4  # octets de la description JSON qui suit l'en-tête
+HEADER_SIZE = 8  # nombre d'entiers réservés pour l'en-tête
+
+
+def _layout_bytes(layout_size):
+    """
+    place réservée à la description (multiple de 8 pour aligner les données)
+    """
+    return -(-layout_size // 8) * 8
+
+
+def _check_shared_memory():
+    if shared_memory is None:
+        raise ImportError("les tampons en mémoire partagée nécessitent "
+                          "Python >= 3.8 (multiprocessing.shared_memory)")
+
+
+def _attach_untracked(name):
+    """
+    accès à un segment existant sans l'inscrire auprès du resource_tracker
+    de ce processus (qui le supprimerait à sa sortie)
+    """
+    if sys.version_info >= (3, 13):
+        return shared_memory.SharedMemory(name=name, track=False)
+    inscription = resource_tracker.register
+    resource_tracker.register = lambda *args, **kwargs: None
+    try:
+        return shared_memory.SharedMemory(name=name)
+    finally:
+        resource_tracker.register = inscription
+
+
+class SharedRing(object):
+    """
+    tampon circulaire de lignes de flottants en mémoire partagée
+
+    utiliser create() côté écrivain et attach() côté lecteur
+    """
+    def __init__(self, shm, owner, readonly):
+        self.shm = shm
+        self.owner = owner  # le créateur libère la mémoire à la fermeture
+        entete = np.ndarray((HEADER_SIZE,), dtype=np.int64, buffer=shm.buf)
+        self.capacity = int(entete[CAPACITY])
+        self.nb_column = int(entete[NB_COLUMN])
+        self.sample_rate = float(entete.view(np.float64)[SAMPLE_RATE])
+        taille = int(entete[LAYOUT_SIZE])
+        description = bytes(shm.buf[HEADER_SIZE * 8:HEADER_SIZE * 8 + taille])
+        self.layout = json.loads(description.decode('utf-8')) if taille else {}
+        self.header = entete
+        self.data = np.ndarray((self.capacity, self.nb_column),
+                               dtype=np.float64, buffer=shm.buf,
+                               offset=HEADER_SIZE * 8 + _layout_bytes(taille))
+        if readonly:
+            self.header.flags.writeable = False
+            self.data.flags.writeable = False
+
+    @classmethod
+    def create(cls, capacity, nb_column, name=None, sample_rate=0.0,
+               layout=None):
+        """
+        création du tampon (côté écrivain)
+
+        layout : description publiée avec le tampon (dictionnaire
+        sérialisable en JSON, par exemple {'columns': [...]})
+        """
+        _check_shared_memory()
+        description = json.dumps(layout).encode('utf-8') if layout else b''
+        taille = (HEADER_SIZE * 8 + _layout_bytes(len(description))
+                  + capacity * nb_column * 8)
+        shm = shared_memory.SharedMemory(name=name, create=True, size=taille)
+        entete = np.ndarray((HEADER_SIZE,), dtype=np.int64, buffer=shm.buf)
+        entete[:] = 0
+        entete[CAPACITY] = capacity
+        entete[NB_COLUMN] = nb_column
+        entete.view(np.float64)[SAMPLE_RATE] = sample_rate
+        entete[LAYOUT_SIZE] = len(description)
+        debut = HEADER_SIZE * 8
+        shm.buf[debut:debut + len(description)] = description
+        return cls(shm, owner=True, readonly=False)
+
+    @classmethod
+    def attach(cls, name, readonly=True):
+        """
+        accès à un tampon existant (côté lecteur, en lecture seule)
+        """
+        _check_shared_memory()
+        return cls(_attach_untracked(name), owner=False, readonly=readonly)
+
+    @property
+    def name(self):
+        """
+        nom système du segment de mémoire partagée
+        """
+        return self.shm.name
+
+    @property
+    def write_index(self):
+        """
+        nombre total de lignes écrites depuis la création
+        """
+        return int(self.header[WRITE_INDEX])
+
+    def write(self, rows):
+        """
+        écriture d'un bloc de lignes (n, nb_column) (un seul écrivain)
+        """
+        rows = np.asarray(rows, dtype=np.float64).reshape(-1, self.nb_column)
+        nb_row = len(rows)
+        if nb_row > self.capacity:
+            rows = rows[-self.capacity:]  # seules les dernières sont lisibles
+        debut = self.write_index
+        # les lignes retenues occupent les indices [debut + nb_row - len(rows),
+        # debut + nb_row[
+        position = (debut + nb_row - len(rows)) % self.capacity
+        premier = min(len(rows), self.capacity - position)
+        self.data[position:position + premier] = rows[:premier]
+        self.data[:len(rows) - premier] = rows[premier:]
+        # publication : l'indice n'avance qu'une fois les lignes écrites
+        self.header[WRITE_INDEX] = debut + nb_row
+
+    def write_row(self, row):
+        """
+        écriture d'une seule ligne, sans passer par un tableau intermédiaire
+        """
+        debut = self.write_index
+        self.data[debut % self.capacity] = row
+        self.header[WRITE_INDEX] = debut + 1
+
+    def read(self, cursor, max_row=None):
+        """
+        lecture des lignes écrites depuis cursor
+
+        retourne (lignes, nouveau curseur, nombre de lignes perdues parce
+        qu'écrasées avant d'être lues)
+        """
+        ecrit = self.write_index
+        # la case de l'indice ecrit (la plus ancienne) peut être en cours
+        # d'écriture : au plus capacity - 1 lignes sont lisibles
+        perdues = max(0, ecrit + 1 - self.capacity - cursor)
+        debut = cursor + perdues
+        fin = ecrit if max_row is None else min(ecrit, debut + max_row)
+        if fin <= debut:
+            return np.empty((0, self.nb_column)), fin, perdues
+        indices = np.arange(debut, fin) % self.capacity
+        lignes = self.data[indices]  # copie
+        # des lignes ont pu être écrasées pendant la copie, la suivante
+        # pouvant être en cours d'écriture
+        ecrasees = max(0, self.write_index + 1 - self.capacity - debut)
+        if ecrasees:
+            lignes = lignes[ecrasees:]
+            perdues += ecrasees
+        return lignes, fin, perdues
+
+    def latest(self, nb_row):
+        """
+        copie des nb_row dernières lignes
+        """
+        fin = self.write_index
+        lignes, _, _ = self.read(max(0, fin - nb_row))
+        return lignes
+
+    def close(self):
+        """
+        fermeture de l'accès (et libération pour le créateur)
+        """
+        self.header = None
+        self.data = None
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
@@ -0,0 +1,182 @@
+# -*- coding: utf-8 -*-
+"""
+Myo arm simulé pour tester et mesurer les performances sans bracelet
+
+``SimulatedHub`` remplace ``myo.Hub`` : sa méthode ``run(handler,
+duration_ms)`` appelle le handler avec des évènements synthétiques (EMG à
+200 Hz, centrale inertielle à 50 Hz, batterie, RSSI...) au rythme du temps
+réel multiplié par ``speed``. Les évènements ont les mêmes attributs que
+ceux de myo-python et passent donc par ``MyListener.on_event``.
+
+L'horloge du bracelet simulé est ``perf_counter`` (en µs) : en temps réel
+(``speed=1``) l'instant théorique de livraison d'un échantillon vaut
+``timestamp * 1e-6``, ce qui permet de mesurer la latence des callbacks, y
+compris d'un processus à l'autre. En accéléré, les timestamps restent
+espacés de la période nominale et seuls les instants de livraison sont
+rapprochés.
+"""
+
+from time import perf_counter, sleep
+from types import SimpleNamespace
+import numpy as np
+import myo
+
+FREQ_EMG = 200.0  # fréquence des EMG du myo arm
+FREQ_IMU = 50.0  # fréquence de la centrale inertielle
+
+
+class SimulatedDevice(object):
+    """
+    bracelet simulé : enregistre les commandes reçues
+    """
+    def __init__(self, handle=0, name='Simulated Myo'):
+        self.handle = handle  # identité du bracelet (cf. multi_listener)
+        self.name = name
+        self.commands = []  # commandes reçues (nom, argument)
+        self.rssi_requested = False
+
+    def vibrate(self, vibration_type):
+        self.commands.append(('vibrate', vibration_type))
+
+    def request_rssi(self):
+        self.rssi_requested = True
+
+    def request_battery_level(self):
+        self.commands.append(('request_battery_level', None))
+
+    def stream_emg(self, enabled):
+        self.commands.append(('stream_emg', enabled))
+
+    def lock(self):
+        self.commands.append(('lock', None))
+
+    def unlock(self, unlock_type=None):
+        self.commands.append(('unlock', unlock_type))
+
+
+class SimulatedHub(object):
+    """
+    remplaçant de myo.Hub produisant des évènements synthétiques
+
+    speed : facteur d'accélération par rapport au temps réel
+    nb_myo : nombre de bracelets simulés
+    burst : nombre d'échantillons EMG livrés ensemble (rafales bluetooth)
+    seed : graine du générateur aléatoire
+    """
+    def __init__(self, speed=1.0, nb_myo=1, burst=1, seed=0):
+        self.speed = speed
+        self.burst = burst
+        self.devices = [SimulatedDevice(handle=indice,
+                                        name=f'Simulated Myo {indice}')
+                        for indice in range(nb_myo)]
+        self.rng = np.random.RandomState(seed)
+        self.running = True
+        self.origin = None  # instant de départ (perf_counter)
+        self.nb_emg = 0  # échantillons EMG déjà émis
+        self.nb_imu = 0  # échantillons IMU déjà émis
+        self.nb_event = 0  # évènements émis
+
+    def _event(self, event_type, device, timestamp, **attributs):
+        self.nb_event += 1
+        adresse = f'00:00:00:00:00:{device.handle:02x}'
+        return SimpleNamespace(type=event_type, device=device,
+                               device_name=device.name, mac_address=adresse,
+                               timestamp=timestamp, **attributs)
+
+    def _connection_events(self):
+        timestamp = perf_counter() * 1e6
+        for device in self.devices:
+            for event_type in (myo.EventType.paired, myo.EventType.connected):
+                yield self._event(event_type, device, timestamp,
+                                  firmware_version=(1, 5, 1970, 2))
+            yield self._event(myo.EventType.battery_level, device, timestamp,
+                              battery_level=100)
+            yield self._event(myo.EventType.unlocked, device, timestamp)
+
+    def _emg(self, debut, fin):
+        """
+        évènements EMG d'indices debut à fin - 1
+        """
+        indices = np.arange(debut, fin)
+        # instants d'acquisition (µs, horloge perf_counter à speed=1)
+        timestamps = (self.origin + indices / FREQ_EMG) * 1e6
+        phase = 2.0 * np.pi * indices[:, None] / FREQ_EMG
+        emg = (40.0 * np.sin(phase * (1.0 + np.arange(8)))
+               + self.rng.normal(0.0, 10.0, (len(indices), 8)))
+        emg = np.clip(emg, -128, 127).astype(int).tolist()
+        for timestamp, valeurs in zip(timestamps.tolist(), emg):
+            for device in self.devices:
+                yield self._event(myo.EventType.emg, device, timestamp,
+                                  emg=valeurs)
+
+    def _imu(self, debut, fin):
+        """
+        évènements d'orientation d'indices debut à fin - 1
+        """
+        indices = np.arange(debut, fin)
+        timestamps = (self.origin + indices / FREQ_IMU) * 1e6
+        angle = 0.5 * np.sin(2.0 * np.pi * 0.2 * indices / FREQ_IMU)
+        for timestamp, theta in zip(timestamps.tolist(), angle.tolist()):
+            orientation = (np.sin(theta / 2), 0.0, 0.0, np.cos(theta / 2))
+            acceleration = (0.0, np.sin(theta), np.cos(theta))
+            gyroscope = (20.0 * np.cos(theta), 0.0, 0.0)
+            for device in self.devices:
+                yield self._event(myo.EventType.orientation, device, timestamp,
+                                  orientation=orientation,
+                                  acceleration=acceleration,
+                                  gyroscope=gyroscope)
+
+    def pending_events(self):
+        """
+        évènements dont l'instant de livraison est atteint
+        """
+        maintenant = perf_counter()
+        if self.origin is None:
+            self.origin = maintenant
+            yield from self._connection_events()
+        ecoule = (maintenant - self.origin) * self.speed
+        # les EMG arrivent par rafales de self.burst échantillons
+        nb_emg = int(ecoule * FREQ_EMG) // self.burst * self.burst
+        if nb_emg > self.nb_emg:
+            yield from self._emg(self.nb_emg, nb_emg)
+            self.nb_emg = nb_emg
+        nb_imu = int(ecoule * FREQ_IMU)
+        if nb_imu > self.nb_imu:
+            yield from self._imu(self.nb_imu, nb_imu)
+            self.nb_imu = nb_imu
+        for device in self.devices:
+            if device.rssi_requested:
+                device.rssi_requested = False
+                yield self._event(myo.EventType.rssi, device,
+                                  maintenant * 1e6,
+                                  rssi=int(self.rng.randint(-70, -50)))
+
+    def run(self, handler, duration_ms=1000):
+        """
+        livraison des évènements pendant duration_ms millisecondes
+        (même signature que myo.Hub.run)
+        """
+        fin = perf_counter() + duration_ms * 1e-3
+        while self.running:
+            for event in self.pending_events():
+                if handler(event) is False:
+                    self.running = False
+                    return
+            reste = fin - perf_counter()
+            if reste <= 0:
+                return
+            # pas de scrutation plus fine que nécessaire
+            sleep(min(reste, 1.0 / (FREQ_EMG * self.speed)))
+
+    def run_forever(self, handler, duration_ms=1000):
+        """
+        boucle jusqu'à l'appel de stop()
+        """
+        while self.running:
+            self.run(handler, duration_ms)
+
+    def stop(self):
+        """
+        arrêt de la production d'évènements
+        """
+        self.running = False
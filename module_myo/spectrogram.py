@@ -0,0 +1,168 @@
+# -*- coding: utf-8 -*-
+"""
+Spectrogramme et densité spectrale des EMG calculés au fil de l'eau
+
+``IncrementalStft`` calcule la transformée de Fourier à court terme des 8
+voies à la fois sur chaque nouveau bloc d'EMG : les échantillons qui ne
+remplissent pas encore une fenêtre complète sont gardés pour le bloc
+suivant, la fenêtre de Hann et les indices des trames sont calculés une
+fois pour toutes et toutes les trames d'un bloc passent dans un seul appel
+à ``np.fft.rfft``.
+
+Chaque trame devient une colonne d'une image (temps en abscisse, fréquence
+des 8 voies empilées en ordonnée) écrite dans un tampon circulaire : seules
+les nouvelles colonnes sont calculées et copiées, l'image défile en
+balayage comme un oscilloscope, un curseur vertical marquant la colonne la
+plus récente. ``SpectrogramView`` l'affiche en tuiles de quelques colonnes
+(un ``pg.ImageItem`` par tuile, ``ImageItem`` ne sachant remplacer que son
+image entière) : seules les tuiles contenant de nouvelles colonnes sont
+recolorées et renvoyées à l'affichage. Il trace à côté la densité spectrale
+moyenne de chaque voie (contact des électrodes, bruit du secteur à 50 Hz).
+"""
+
+import numpy as np
+import pyqtgraph as pg
+
+# dégradé de couleurs du spectrogramme (noir, violet, orange, jaune)
+COLORS = ((0, 0, 0, 255), (87, 16, 110, 255), (188, 55, 84, 255),
+          (249, 142, 9, 255), (252, 255, 164, 255))
+
+
+class IncrementalStft(object):
+    """
+    transformée de Fourier à court terme de nb_channel voies
+
+    nperseg : nombre d'échantillons d'une trame
+    hop : décalage entre deux trames (échantillons)
+    columns : nombre de trames conservées dans l'image
+    """
+    def __init__(self, nb_channel=8, nperseg=64, hop=16, freq=200.0,
+                 columns=200, floor_db=-20.0):
+        self.nb_channel = nb_channel
+        self.nperseg = nperseg
+        self.hop = hop
+        self.freq = freq
+        self.columns = columns
+        self.floor_db = floor_db
+        self.window = np.hanning(nperseg)[None, :, None]
+        # densité spectrale de puissance : |X|² / (fs × Σ fenêtre²)
+        self.scale = 1.0 / (freq * np.sum(self.window ** 2))
+        self.offsets = np.arange(nperseg)
+        self.frequencies = np.fft.rfftfreq(nperseg, 1.0 / freq)
+        self.nb_freq = len(self.frequencies)
+        self.pending = np.zeros((0, nb_channel))
+        # image : une colonne par trame, les voies empilées
+        self.image = np.full((columns, nb_channel * self.nb_freq), floor_db)
+        self.column = 0  # prochaine colonne écrite
+        self.nb_frame = 0  # trames calculées
+        self.modified = False
+        # colonnes écrites depuis le dernier affichage
+        self.dirty = np.zeros(columns, dtype=bool)
+
+    def update(self, values):
+        """
+        nouveaux échantillons values (n, nb_channel)
+
+        retourne la densité spectrale (dB) des trames complétées par ce
+        bloc, de forme (trames, nb_freq, nb_channel)
+        """
+        donnees = np.vstack((self.pending, np.asarray(
+            values, dtype=np.float64).reshape(-1, self.nb_channel)))
+        nb_trame = max(0, (len(donnees) - self.nperseg) // self.hop + 1)
+        self.pending = donnees[nb_trame * self.hop:]
+        if nb_trame == 0:
+            return np.zeros((0, self.nb_freq, self.nb_channel))
+        indices = (np.arange(nb_trame)[:, None] * self.hop + self.offsets)
+        trames = donnees[indices]  # (trames, nperseg, voies)
+        trames = trames - trames.mean(axis=1, keepdims=True)
+        spectre = np.fft.rfft(trames * self.window, axis=1)
+        puissance = 10 * np.log10(np.abs(spectre) ** 2 * self.scale + 1e-12)
+        self._write(puissance)
+        return puissance
+
+    def _write(self, puissance):
+        """
+        écriture des nouvelles colonnes dans le tampon circulaire
+        """
+        nombre = min(len(puissance), self.columns)
+        # seules les nombre dernières trames sont gardées : elles occupent
+        # les colonnes des trames len(puissance) - nombre et suivantes
+        debut = self.column + len(puissance) - nombre
+        colonnes = (debut + np.arange(nombre)) % self.columns
+        self.dirty[colonnes] = True
+        self.image[colonnes] = np.maximum(
+            puissance[-nombre:].transpose(0, 2, 1).reshape(nombre, -1),
+            self.floor_db)
+        self.column = (self.column + len(puissance)) % self.columns
+        self.nb_frame += len(puissance)
+        self.modified = True
+
+    def psd(self):
+        """
+        densité spectrale moyenne (dB) de chaque voie sur l'image,
+        de forme (nb_channel, nb_freq)
+        """
+        remplies = min(self.nb_frame, self.columns)
+        if remplies == 0:
+            return np.full((self.nb_channel, self.nb_freq), self.floor_db)
+        if remplies < self.columns:
+            image = self.image[:remplies]
+        else:
+            image = self.image
+        return image.reshape(remplies, self.nb_channel,
+                             self.nb_freq).mean(axis=0)
+
+
+class SpectrogramView(object):
+    """
+    affichage d'un IncrementalStft : spectrogramme et densité spectrale
+
+    image_widget, psd_widget : PlotWidget pyqtgraph hôtes
+    levels : bornes (dB) de l'échelle de couleurs
+    tile : nombre de colonnes d'une tuile
+    """
+    def __init__(self, stft, image_widget, psd_widget, levels=(-20.0, 40.0),
+                 tile=20):
+        self.stft = stft
+        self.tile = tile
+        self.levels = levels
+        positions = np.linspace(0.0, 1.0, len(COLORS))
+        table = pg.ColorMap(positions, np.array(
+            COLORS, dtype=np.ubyte)).getLookupTable(0.0, 1.0, 256)
+        self.tiles = []
+        for debut in range(0, stft.columns, tile):
+            tuile = pg.ImageItem()
+            tuile.setLookupTable(table)
+            tuile.setPos(debut, 0)
+            image_widget.addItem(tuile)
+            self.tiles.append(tuile)
+        self.stft.dirty[:] = True  # premier affichage complet
+        # une bande de nb_freq lignes par voie
+        image_widget.getAxis('left').setTicks([[
+            ((voie + 0.5) * stft.nb_freq, f'emg{voie + 1}')
+            for voie in range(stft.nb_channel)]])
+        image_widget.setLabel('bottom', 'trames')
+        self.cursor = pg.InfiniteLine(angle=90, pen=(255, 255, 255, 120))
+        image_widget.addItem(self.cursor)
+        psd_widget.setLabel('bottom', 'fréquence', units='Hz')
+        psd_widget.setLabel('left', 'DSP (dB)')
+        self.curves = [psd_widget.plot(pen=(voie, stft.nb_channel))
+                       for voie in range(stft.nb_channel)]
+
+    def refresh(self):
+        """
+        mise à jour de l'image et des densités spectrales si nécessaire
+        """
+        if not self.stft.modified:
+            return
+        for indice in np.unique(np.flatnonzero(self.stft.dirty)
+                                // self.tile):
+            debut = indice * self.tile
+            self.tiles[indice].setImage(
+                self.stft.image[debut:debut + self.tile], autoLevels=False,
+                levels=self.levels)
+        self.stft.dirty[:] = False
+        self.cursor.setValue(self.stft.column)
+        for courbe, densite in zip(self.curves, self.stft.psd()):
+            courbe.setData(self.stft.frequencies, densite)
+        self.stft.modified = False
@@ -0,0 +1,206 @@
+# -*- coding: utf-8 -*-
+"""
+Tampon circulaire un producteur / un consommateur sans verrou
+
+Chaque flux de MyListener possède son propre ``SpscRing`` : le callback du
+SDK (producteur) range l'échantillon dans la case ``write_index % capacity``
+puis incrémente ``write_index``, qui ne fait que croître. Le lecteur garde
+son propre curseur et copie les cases comprises entre son curseur et
+l'indice d'écriture ; il ne prend aucun verrou et ne bloque donc jamais le
+producteur. Avec le GIL, l'affectation d'une case de liste et celle d'un
+attribut sont atomiques et ordonnées : une case n'est visible qu'une fois
+écrite. Le producteur peut toutefois être interrompu entre l'écriture de la
+case et l'incrément de l'indice : la case qui suit le dernier élément publié
+(la plus ancienne) contient peut-être déjà l'élément suivant, elle n'est
+jamais rendue et au plus capacity - 1 éléments sont lisibles.
+
+Lancé directement, ce module vérifie ce cas puis compare la durée des callbacks (EMG à 200 Hz
+et IMU à 50 Hz) avec un verrou commun aux quatre flux et avec des tampons
+sans verrou, pendant qu'un lecteur interroge les données en continu.
+"""
+
+
+class SpscRing(object):
+    """
+    tampon circulaire d'objets python, un seul écrivain
+
+    capacity : nombre d'éléments conservés
+    """
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.maxlen = capacity  # même nom que collections.deque
+        self.items = [None] * capacity
+        self.write_index = 0  # nombre total d'éléments écrits
+
+    def append(self, item):
+        """
+        ajout d'un élément (producteur uniquement)
+        """
+        indice = self.write_index
+        self.items[indice % self.capacity] = item
+        # publication : l'indice n'avance qu'une fois la case écrite
+        self.write_index = indice + 1
+
+    def read(self, cursor):
+        """
+        éléments écrits depuis cursor
+
+        retourne (liste, nouveau curseur, nombre d'éléments perdus parce
+        qu'écrasés avant d'être lus)
+        """
+        fin = self.write_index
+        # la case de l'indice fin peut être en cours d'écriture
+        perdus = max(0, fin + 1 - self.capacity - cursor)
+        debut = cursor + perdus
+        if fin == debut:
+            return [], fin, perdus
+        capacite = self.capacity
+        premier, dernier = debut % capacite, fin % capacite
+        if premier < dernier:
+            elements = self.items[premier:dernier]
+        else:
+            elements = self.items[premier:] + self.items[:dernier]
+        # le producteur a pu écraser des cases pendant la copie, la suivante
+        # pouvant être en cours d'écriture
+        ecrases = self.write_index + 1 - capacite - debut
+        if ecrases > 0:
+            del elements[:ecrases]
+            perdus += ecrases
+        return elements, fin, perdus
+
+    def latest(self, nb_item=None):
+        """
+        copie des nb_item derniers éléments (tous par défaut)
+        """
+        if nb_item is None:
+            nb_item = self.capacity
+        elements, _, _ = self.read(max(0, self.write_index - nb_item))
+        return elements
+
+    def __len__(self):
+        return min(self.write_index, self.capacity - 1)
+
+    def __iter__(self):
+        return iter(self.latest())
+
+
+class _LockedQueues(object):
+    """
+    ancienne conception : un verrou commun protège les quatre files
+    """
+    def __init__(self, queue_size):
+        from collections import deque
+        from threading import Lock
+        self.lock = Lock()
+        self.queues = {nom: deque(maxlen=queue_size)
+                       for nom in ('emg', 'ori', 'acc', 'gyro')}
+
+    def push(self, streams, item):
+        with self.lock:
+            for nom in streams:
+                self.queues[nom].append(item)
+
+    def read_all(self):
+        with self.lock:
+            return [list(queue) for queue in self.queues.values()]
+
+
+class _SpscQueues(object):
+    """
+    nouvelle conception : un tampon sans verrou par flux
+    """
+    def __init__(self, queue_size):
+        self.rings = {nom: SpscRing(queue_size)
+                      for nom in ('emg', 'ori', 'acc', 'gyro')}
+        self.cursors = dict.fromkeys(self.rings, 0)
+
+    def push(self, streams, item):
+        for nom in streams:
+            self.rings[nom].append(item)
+
+    def read_all(self):
+        lectures = []
+        for nom, ring in self.rings.items():
+            elements, self.cursors[nom], _ = ring.read(self.cursors[nom])
+            lectures.append(elements)
+        return lectures
+
+
+def _check_inflight(capacity=4):
+    """
+    producteur interrompu entre l'écriture d'une case et la publication de
+    l'indice : le lecteur ne doit pas recevoir l'élément en cours d'écriture
+    comme le plus ancien
+    """
+    ring = SpscRing(capacity)
+    for indice in range(2 * capacity):
+        ring.append(indice)
+    suivant = ring.write_index
+    # première moitié de append : case écrite, indice pas encore publié
+    ring.items[suivant % capacity] = suivant
+    elements, curseur, perdus = ring.read(suivant - capacity)
+    assert suivant not in elements, elements
+    assert elements == sorted(elements), elements
+    assert curseur == suivant and perdus == 1, (curseur, perdus)
+    # lecteur à jour pendant que la case est en cours d'écriture
+    elements, _, _ = ring.read(suivant - 1)
+    assert elements == [suivant - 1], elements
+    return elements
+
+
+def benchmark(duree=3.0, queue_size=256):
+    """
+    durée des callbacks du producteur (µs) pendant qu'un lecteur lit les
+    quatre flux en continu
+    """
+    from threading import Thread
+    from time import perf_counter, sleep
+    import numpy as np
+    resultats = {}
+    for nom, conception in (('lock', _LockedQueues),
+                            ('spsc', _SpscQueues)):
+        files = conception(queue_size)
+        durees = []
+        actif = [True]
+
+        def producteur():
+            # EMG à 200 Hz, IMU (3 flux) un échantillon sur quatre
+            debut = perf_counter()
+            indice = 0
+            while perf_counter() - debut < duree:
+                echeance = debut + indice / 200.0
+                attente = echeance - perf_counter()
+                if attente > 0:
+                    sleep(attente)
+                element = (indice, (0,) * 8)
+                top = perf_counter()
+                files.push(('emg',), element)
+                if indice % 4 == 0:
+                    files.push(('ori', 'acc', 'gyro'), element)
+                durees.append(perf_counter() - top)
+                indice += 1
+            actif[0] = False
+
+        def consommateur():
+            while actif[0]:
+                files.read_all()
+                sleep(0)
+
+        threads = [Thread(target=producteur), Thread(target=consommateur)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        durees = np.array(durees) * 1e6
+        resultats[nom] = {'p50': np.percentile(durees, 50),
+                          'p99': np.percentile(durees, 99),
+                          'max': durees.max(), 'count': len(durees)}
+    return resultats
+
+
+if __name__ == '__main__':
+    _check_inflight()
+    for NOM, STATS in benchmark().items():
+        print(f"{NOM:<5} : callback p50 {STATS['p50']:8.1f} µs  "
+              f"p99 {STATS['p99']:8.1f} µs  max {STATS['max']:8.1f} µs  "
+              f"({STATS['count']} callbacks)")
@@ -0,0 +1,86 @@
+# -*- coding: utf-8 -*-
+"""
+Détection des pertes de données sur les flux du myo arm
+
+Deux sources de pertes sont comptées pour chaque flux :
+
+    a) les paquets perdus par le bluetooth, détectés par une discontinuité
+       des timestamps (écart supérieur à une période et demie)
+    b) les échantillons écrasés dans les anneaux ``SpscRing`` de MyListener
+       avant d'avoir été lus (débordement) : nombre de lignes perdues
+       renvoyé par ``SpscRing.read()`` pour le curseur du lecteur
+
+Les échantillons dont le timestamp n'est pas postérieur au précédent sont
+comptés comme en retard.
+"""
+
+
+class StreamCounter(object):
+    """
+    compteurs d'un flux : reçus, perdus, en retard, débordés
+
+    freq : fréquence nominale du flux (Hz)
+    """
+    def __init__(self, freq):
+        self.period = 1e6 / freq  # période nominale en µs
+        self.received = 0  # échantillons reçus
+        self.dropped = 0  # échantillons manquants (trous de timestamps)
+        self.gaps = 0  # nombre de trous détectés
+        self.late = 0  # échantillons reçus en retard ou en double
+        self.overflow = 0  # échantillons écrasés avant lecture
+        self.last_timestamp = None
+
+    def on_sample(self, timestamp):
+        """
+        mise à jour des compteurs à la réception d'un échantillon
+        """
+        self.received += 1
+        precedent = self.last_timestamp
+        if precedent is not None:
+            ecart = timestamp - precedent
+            if ecart <= 0:
+                self.late += 1
+                return
+            if ecart > 1.5 * self.period:
+                self.gaps += 1
+                self.dropped += int(round(ecart / self.period)) - 1
+        self.last_timestamp = timestamp
+
+    def on_overflow(self, nb_sample=1):
+        """
+        échantillon(s) écrasé(s) dans la file avant lecture
+        """
+        self.overflow += nb_sample
+
+    def reset(self):
+        """
+        remise à zéro des compteurs
+        """
+        self.__init__(1e6 / self.period)
+
+    def snapshot(self):
+        """
+        copie des compteurs sous forme de dictionnaire
+        """
+        attendus = self.received + self.dropped
+        return {'received': self.received,
+                'dropped': self.dropped,
+                'gaps': self.gaps,
+                'late': self.late,
+                'overflow': self.overflow,
+                'loss_percent': (100.0 * self.dropped / attendus
+                                 if attendus else 0.0)}
+
+
+def format_stats(stats):
+    """
+    mise en forme texte des compteurs pour le panneau de l'interface
+    """
+    lignes = [f"{'flux':<13}{'reçus':>9}{'perdus':>8}{'retard':>8}"
+              f"{'débord.':>9}{'perte':>8}"]
+    for nom, valeurs in stats.items():
+        lignes.append(f"{nom:<13}{valeurs['received']:>9}"
+                      f"{valeurs['dropped']:>8}{valeurs['late']:>8}"
+                      f"{valeurs['overflow']:>9}"
+                      f"{valeurs['loss_percent']:>7.2f}%")
+    return '\n'.join(lignes)
@@ -0,0 +1,283 @@
+# -*- coding: utf-8 -*-
+"""
+Alignement des flux du myo arm sur une base de temps commune
+
+Les EMG (200 Hz) et la centrale inertielle (50 Hz) arrivent avec leurs
+propres timestamps. Le ``TimelineAligner`` reçoit les flux par paquets,
+les rééchantillonne sur une grille régulière (plus proche voisin,
+interpolation linéaire ou bloqueur d'ordre zéro) à l'aide de recherches
+vectorisées ``np.searchsorted`` et ne conserve en mémoire que les
+échantillons encore nécessaires : il fonctionne donc aussi bien en direct
+que sur des fichiers de plusieurs heures lus par morceaux.
+
+Un flux terminé (``finish``, source épuisée) ne retient plus les autres :
+l'alignement continue sur les flux encore actifs et ses colonnes valent NaN
+après son dernier échantillon. Lancé directement, ce module vérifie qu'un
+flux vide ne fait pas accumuler les autres en mémoire.
+"""
+
+import numpy as np
+import pandas as pd
+
+# méthodes de rééchantillonnage disponibles
+METHODS = ('nearest', 'linear', 'zoh')
+
+# colonnes des flux du myo arm (identiques aux DataFrame de MainWindow)
+MYO_STREAMS = {'emg': ('emg1', 'emg2', 'emg3', 'emg4',
+                       'emg5', 'emg6', 'emg7', 'emg8'),
+               'acc': ('acc1', 'acc2', 'acc3'),
+               'gyro': ('gyro1', 'gyro2', 'gyro3'),
+               'ori': ('orix', 'oriy', 'oriz', 'oriw')}
+
+
+def resample(timestamps, values, grid, method='linear'):
+    """
+    rééchantillonnage vectorisé de values (n, k) aux instants de grid
+
+    les instants de grid situés avant le premier échantillon valent NaN
+    """
+    timestamps = np.asarray(timestamps, dtype=np.float64)
+    values = np.asarray(values, dtype=np.float64)
+    if values.ndim != 2:  # (n,) : une seule colonne
+        values = values.reshape(len(timestamps), -1)
+    grid = np.asarray(grid, dtype=np.float64)
+    sortie = np.full((len(grid), values.shape[1]), np.nan)
+    if len(timestamps) == 0:
+        return sortie
+    # indice du dernier échantillon antérieur ou égal à chaque instant
+    gauche = np.searchsorted(timestamps, grid, side='right') - 1
+    defini = gauche >= 0
+    gauche = np.clip(gauche, 0, len(timestamps) - 1)
+    if method == 'zoh':
+        sortie[defini] = values[gauche[defini]]
+        return sortie
+    droite = np.minimum(gauche + 1, len(timestamps) - 1)
+    if method == 'nearest':
+        plus_proche = np.where(np.abs(timestamps[droite] - grid)
+                               < np.abs(grid - timestamps[gauche]),
+                               droite, gauche)
+        sortie[defini] = values[plus_proche[defini]]
+        return sortie
+    if method == 'linear':
+        ecart = timestamps[droite] - timestamps[gauche]
+        poids = np.where(ecart > 0,
+                         (grid - timestamps[gauche]) / np.where(ecart > 0,
+                                                                ecart, 1.0),
+                         0.0)
+        sortie[defini] = (values[gauche] + poids[:, None]
+                          * (values[droite] - values[gauche]))[defini]
+        return sortie
+    raise ValueError(f'méthode inconnue : {method} (choix : {METHODS})')
+
+
+class _Stream(object):
+    """
+    tampon d'un flux en attente d'alignement
+    """
+    def __init__(self, columns, method):
+        self.columns = tuple(columns)
+        self.method = method
+        self.timestamps = np.empty(0)
+        self.values = np.empty((0, len(self.columns)))
+        self.last_timestamp = -np.inf  # dernier timestamp reçu
+        self.finished = False  # plus aucun échantillon à attendre
+
+    def add(self, timestamps, values):
+        """
+        ajout d'un paquet, les échantillons déjà reçus sont ignorés
+        (MyListener renvoie les dernières valeurs de sa file à chaque lecture)
+        """
+        timestamps = np.asarray(timestamps, dtype=np.float64)
+        values = np.asarray(values, dtype=np.float64).reshape(
+            len(timestamps), len(self.columns))
+        nouveau = timestamps > self.last_timestamp
+        if not nouveau.all():
+            timestamps = timestamps[nouveau]
+            values = values[nouveau]
+        if len(timestamps) == 0:
+            return
+        self.timestamps = np.concatenate((self.timestamps, timestamps))
+        self.values = np.concatenate((self.values, values))
+        self.last_timestamp = timestamps[-1]
+
+    def trim(self, timestamp):
+        """
+        suppression des échantillons qui ne serviront plus
+        (on garde le dernier échantillon antérieur à timestamp)
+        """
+        debut = np.searchsorted(self.timestamps, timestamp, side='right') - 1
+        if debut > 0:
+            self.timestamps = self.timestamps[debut:]
+            self.values = self.values[debut:]
+
+
+class TimelineAligner(object):
+    """
+    alignement en continu de plusieurs flux sur une grille régulière
+
+    freq : fréquence de la grille commune (Hz)
+    method : méthode par défaut ('nearest', 'linear' ou 'zoh')
+    origin : premier instant de la grille (µs), par défaut le premier
+    timestamp reçu
+    """
+    def __init__(self, freq=200.0, method='linear', origin=None):
+        if method not in METHODS:
+            raise ValueError(f'méthode inconnue : {method} '
+                             f'(choix : {METHODS})')
+        self.period = 1e6 / freq  # pas de la grille en µs
+        self.method = method
+        self.origin = origin
+        self.next_index = 0  # indice du prochain instant de grille à émettre
+        self.streams = {}
+
+    def add_stream(self, name, columns, method=None):
+        """
+        déclaration d'un flux et de ses colonnes
+        """
+        self.streams[name] = _Stream(columns, method or self.method)
+
+    def add(self, name, timestamps, values):
+        """
+        ajout d'un paquet de données au flux name
+        """
+        if len(timestamps) and self.origin is None:
+            self.origin = float(timestamps[0])
+        self.streams[name].add(timestamps, values)
+
+    def add_listener_data(self, name, data):
+        """
+        ajout d'une liste [(timestamp, valeurs), ...] issue de MyListener
+        """
+        if not data:
+            return
+        timestamps = np.fromiter((timestamp for timestamp, _ in data),
+                                 dtype=np.float64, count=len(data))
+        values = np.array([tuple(valeurs) for _, valeurs in data],
+                          dtype=np.float64)
+        self.add(name, timestamps, values)
+
+    def finish(self, name):
+        """
+        fin du flux name : l'horizon ne l'attend plus
+        """
+        self.streams[name].finished = True
+
+    @property
+    def nb_buffered(self):
+        """
+        nombre d'échantillons en attente d'alignement (tous flux confondus)
+        """
+        return sum(len(stream.timestamps) for stream in self.streams.values())
+
+    def horizon(self):
+        """
+        dernier instant pour lequel tous les flux encore actifs sont connus
+        (le dernier timestamp reçu une fois tous les flux terminés)
+        """
+        if self.origin is None or not self.streams:
+            return None
+        actifs = [stream.last_timestamp for stream in self.streams.values()
+                  if not stream.finished]
+        if actifs:
+            return min(actifs)
+        return max(stream.last_timestamp for stream in self.streams.values())
+
+    def pop_aligned(self):
+        """
+        renvoie un DataFrame des instants de grille devenus calculables
+        (colonne 'timestamp' puis les colonnes de chaque flux)
+        """
+        horizon = self.horizon()
+        colonnes = ['timestamp'] + [colonne
+                                    for stream in self.streams.values()
+                                    for colonne in stream.columns]
+        if horizon is None or not np.isfinite(horizon):
+            return pd.DataFrame(columns=colonnes)
+        dernier = int(np.floor((horizon - self.origin) / self.period))
+        if dernier < self.next_index:
+            return pd.DataFrame(columns=colonnes)
+        grid = self.origin + self.period * np.arange(self.next_index,
+                                                     dernier + 1)
+        blocs = [grid[:, None]]
+        for stream in self.streams.values():
+            valeurs = resample(stream.timestamps, stream.values, grid,
+                               stream.method)
+            if stream.finished:
+                valeurs[grid > stream.last_timestamp] = np.nan
+            blocs.append(valeurs)
+            stream.trim(grid[-1])
+        self.next_index = dernier + 1
+        return pd.DataFrame(np.hstack(blocs), columns=colonnes)
+
+
+def myo_aligner(freq=200.0, method='linear', streams=None):
+    """
+    aligneur préconfiguré pour les flux du myo arm
+    (emg, acc, gyro, ori avec les noms de colonnes de MainWindow)
+    """
+    aligner = TimelineAligner(freq, method)
+    for name in streams or MYO_STREAMS:
+        aligner.add_stream(name, MYO_STREAMS[name])
+    return aligner
+
+
+def iter_aligned(sources, aligner):
+    """
+    alignement d'enregistrements lus par morceaux
+
+    sources : dictionnaire {nom du flux: itérable de (timestamps, valeurs)}
+    aligner : TimelineAligner dont les flux sont déclarés
+
+    le flux le plus en retard est lu en priorité pour ne garder en mémoire
+    qu'un morceau par flux ; un flux épuisé est terminé (``finish``) pour
+    ne pas bloquer les autres ; les DataFrame alignés sont produits au fil
+    de l'eau
+    """
+    iterateurs = {name: iter(source) for name, source in sources.items()}
+    while iterateurs:
+        name = min(iterateurs,
+                   key=lambda nom: aligner.streams[nom].last_timestamp)
+        try:
+            timestamps, values = next(iterateurs[name])
+        except StopIteration:
+            del iterateurs[name]
+            aligner.finish(name)
+        else:
+            aligner.add(name, timestamps, values)
+        bloc = aligner.pop_aligned()
+        if len(bloc):
+            yield bloc
+
+
+def _check_empty_stream(nb_chunk=500, chunk=200):
+    """
+    alignement d'une heure d'EMG simulée avec des flux IMU vides ou
+    interrompus : retourne (lignes alignées, maximum d'échantillons en
+    attente)
+    """
+    aligner = myo_aligner(streams=('emg', 'acc', 'gyro'))
+
+    def emg():
+        for indice in range(nb_chunk):
+            timestamps = (indice * chunk + np.arange(chunk)) * 5000.0
+            yield timestamps, np.zeros((chunk, 8))
+
+    def acc():  # interrompu après 10 morceaux
+        for indice in range(10):
+            timestamps = (indice * 50 + np.arange(50)) * 20000.0
+            yield timestamps, np.zeros((50, 3))
+
+    nb_ligne = maximum = 0
+    for bloc in iter_aligned({'emg': emg(), 'acc': acc(), 'gyro': ()},
+                             aligner):
+        nb_ligne += len(bloc)
+        maximum = max(maximum, aligner.nb_buffered)
+    return nb_ligne, maximum
+
+
+if __name__ == '__main__':
+    NB_LIGNE, MAXIMUM = _check_empty_stream()
+    print(f'{NB_LIGNE} lignes alignées, au plus {MAXIMUM} échantillons '
+          f'en attente')
+    assert NB_LIGNE == 500 * 200
+    assert MAXIMUM <= 2 * 200, 'un flux vide bloque l\'alignement'
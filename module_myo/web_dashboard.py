@@ -0,0 +1,203 @@
+# -*- coding: utf-8 -*-
+"""
+Tableau de bord WebSocket pour suivre les bracelets depuis un navigateur
+
+Dépendance optionnelle : ``websockets`` (``pip install websockets``), le
+reste du paquet fonctionne sans.
+
+À chaque période (rate messages par seconde), un seul message JSON est
+construit pour tous les bracelets puis envoyé tel quel à tous les clients :
+
+    {"time": instant perf_counter (s),
+     "myo": [{"slot", "name", "connected", "locked", "battery", "rssi",
+              "pose", "emg_envelope" (RMS de chaque voie depuis le message
+              précédent), "orientation" (dernier quaternion x, y, z, w),
+              "lost" (EMG perdus par le tableau de bord)}, ...]}
+
+Un client qui n'a pas fini de recevoir le message précédent ne reçoit pas
+le suivant : un client lent ne ralentit pas les autres. La page
+``dashboard.html`` de ce répertoire affiche ces messages.
+
+Le serveur tourne dans un thread avec sa propre boucle asyncio et ne lit
+les flux qu'au travers d'abonnements (cf. fanout).
+"""
+
+import asyncio
+import json
+from threading import Thread
+from time import perf_counter
+import numpy as np
+from module_myo.fanout import ListenerFanout
+
+try:
+    import websockets
+except ImportError:  # dépendance optionnelle
+    websockets = None
+
+
+class DashboardState(object):
+    """
+    construction des messages du tableau de bord
+
+    listeners : liste des MyListener (un par bracelet)
+    """
+    def __init__(self, listeners):
+        self.listeners = listeners
+        self.fanouts = [ListenerFanout(listener) for listener in listeners]
+        self.emg = [fanout.subscribe('emg') for fanout in self.fanouts]
+        self.orientation = [fanout.subscribe('orientation', 'sample')
+                            for fanout in self.fanouts]
+        self.last_orientation = [None] * len(listeners)
+
+    def snapshot(self):
+        """
+        état de tous les bracelets depuis l'appel précédent
+        """
+        bracelets = []
+        for indice, listener in enumerate(self.listeners):
+            emg = self.emg[indice].read()
+            if emg:
+                valeurs = np.array([tuple(v) for _, v in emg], dtype=float)
+                enveloppe = np.sqrt(np.mean(valeurs ** 2, axis=0))
+                enveloppe = np.round(enveloppe, 1).tolist()
+            else:
+                enveloppe = None
+            orientation = self.orientation[indice].read()
+            if orientation:
+                self.last_orientation[indice] = [
+                    round(float(valeur), 4) for valeur in orientation[-1][1]]
+            rssi = listener.rssi_data_queue
+            pose = listener.pose
+            bracelets.append({
+                'slot': indice,
+                'name': listener.device_name,
+                'connected': bool(listener.connected),
+                'locked': bool(listener.locked),
+                'battery': listener.battery_level,
+                'rssi': rssi[-1] if rssi else None,
+                'pose': getattr(pose, 'name', str(pose)),
+                'emg_envelope': enveloppe,
+                'orientation': self.last_orientation[indice],
+                'lost': self.emg[indice].lost})
+        return {'time': perf_counter(), 'myo': bracelets}
+
+    def close(self):
+        for abonnement in self.emg + self.orientation:
+            abonnement.close()
+
+
+class WebDashboard(object):
+    """
+    serveur WebSocket du tableau de bord, dans son propre thread
+
+    host : interface d'écoute, le poste local seul par défaut ('0.0.0.0'
+    pour toutes les interfaces)
+    rate : nombre de messages par seconde (modifiable avec set_rate)
+    """
+    def __init__(self, listeners, host='127.0.0.1', port=8765, rate=10.0):
+        if websockets is None:
+            raise ImportError("le tableau de bord web nécessite le paquet "
+                              "'websockets' (pip install websockets)")
+        self.state = DashboardState(listeners)
+        self.host = host
+        self.port = port
+        self.rate = None
+        self.set_rate(rate)
+        self.clients = {}  # connexion -> envoi en cours (ou None)
+        self.nb_message = 0
+        self.nb_skipped = 0  # messages non envoyés à un client lent
+        self.running = False
+        self.loop = asyncio.new_event_loop()
+        self.thread = Thread(target=self._run, daemon=True)
+
+    def set_rate(self, rate):
+        if rate <= 0:
+            raise ValueError(f'fréquence des messages invalide : {rate} '
+                             f'(strictement positive)')
+        self.rate = rate
+
+    def start(self):
+        self.running = True
+        self.thread.start()
+
+    def stop(self):
+        """
+        arrêt du serveur et fermeture des connexions
+        """
+        self.running = False
+        if self.thread.is_alive():
+            self.thread.join()
+        self.state.close()
+
+    async def _handler(self, connexion, path=None):
+        """
+        une connexion par client ; les messages reçus sont ignorés
+        """
+        self.clients[connexion] = None
+        try:
+            async for _ in connexion:
+                pass
+        except websockets.ConnectionClosed:
+            pass
+        finally:
+            self.clients.pop(connexion, None)
+
+    async def _send(self, connexion, message):
+        try:
+            await connexion.send(message)
+        except websockets.ConnectionClosed:
+            self.clients.pop(connexion, None)
+
+    def _broadcast(self, message):
+        for connexion, envoi in list(self.clients.items()):
+            if envoi is not None and not envoi.done():
+                self.nb_skipped += 1
+                continue
+            self.clients[connexion] = self.loop.create_task(
+                self._send(connexion, message))
+
+    async def _main(self):
+        serveur = await websockets.serve(self._handler, self.host, self.port)
+        echeance = perf_counter()
+        while self.running:
+            echeance += 1.0 / self.rate
+            if self.clients:
+                # construit une seule fois pour tous les clients
+                message = json.dumps(self.state.snapshot())
+                self._broadcast(message)
+                self.nb_message += 1
+            else:
+                self.state.snapshot()  # vide les abonnements
+            await asyncio.sleep(max(0.0, echeance - perf_counter()))
+        serveur.close()
+        await serveur.wait_closed()
+
+    def _run(self):
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_until_complete(self._main())
+        self.loop.close()
+
+
+if __name__ == '__main__':
+    import argparse
+    from module_myo.multi_listener import MultiListener
+    from module_myo.simulation import SimulatedHub
+    PARSER = argparse.ArgumentParser(
+        description='tableau de bord web sur des bracelets simulés')
+    PARSER.add_argument('--nb-myo', type=int, default=2)
+    PARSER.add_argument('--port', type=int, default=8765)
+    PARSER.add_argument('--rate', type=float, default=10.0)
+    ARGS = PARSER.parse_args()
+    LISTENER = MultiListener(ARGS.nb_myo)
+    HUB = SimulatedHub(nb_myo=ARGS.nb_myo)
+    DASHBOARD = WebDashboard(LISTENER.listeners, port=ARGS.port,
+                             rate=ARGS.rate)
+    DASHBOARD.start()
+    print(f'ws://localhost:{ARGS.port} (ouvrir dashboard.html)')
+    try:
+        while True:
+            HUB.run(LISTENER.on_event, 20)
+            LISTENER.request_rssi()
+    except KeyboardInterrupt:
+        HUB.stop()
+        DASHBOARD.stop()